@@ -0,0 +1,124 @@
+"""Admission control for the HTTP ingest endpoints.
+
+At most `max_in_flight` ingest requests are processed at once; up to
+`max_queue` more wait for a slot, and anything beyond that is shed
+immediately so the caller can retry later (HTTP 429 + Retry-After) instead of
+piling up Mongo round-trips and scoring work behind the broadcast loop.
+
+Readings flagged critical are admitted ahead of queued normal ones, and when
+the queue is full a critical request takes the place of the newest normal
+waiter, which is shed instead.
+"""
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float, retry_after: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._critical: Deque[asyncio.Future] = deque()
+        self._normal: Deque[asyncio.Future] = deque()
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "shed_queue_full": 0,
+            "shed_timeout": 0,
+            "preempted": 0,
+            "critical_admitted": 0,
+            "max_queue_depth": 0,
+        }
+
+    def queue_depth(self) -> int:
+        return len(self._critical) + len(self._normal)
+
+    @asynccontextmanager
+    async def admit(self, critical: bool = False):
+        """Hold an ingest slot for the duration of the block; raises AdmissionRejected when shed."""
+        await self.acquire(critical)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, critical: bool = False):
+        if self.in_flight < self.max_in_flight and not self.queue_depth():
+            self._admitted(critical)
+            return
+
+        if self.queue_depth() >= self.max_queue:
+            if not (critical and self._normal):
+                self.stats["shed_queue_full"] += 1
+                raise AdmissionRejected("Ingest queue full", self.retry_after)
+            # Make room by shedding the newest normal waiter
+            self._normal.pop().set_exception(AdmissionRejected("Preempted by a critical reading", self.retry_after))
+            self.stats["preempted"] += 1
+
+        waiter = asyncio.get_running_loop().create_future()
+        (self._critical if critical else self._normal).append(waiter)
+        self.stats["queued"] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue_depth())
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.exception():
+                # Granted a slot just as the wait timed out; hand it on
+                self.release()
+            else:
+                self._discard(waiter)
+            self.stats["shed_timeout"] += 1
+            raise AdmissionRejected("Timed out waiting for an ingest slot", self.retry_after)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and not waiter.exception():
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+        self._admitted(critical, counted=True)
+
+    def _admitted(self, critical: bool, counted: bool = False):
+        if not counted:
+            self.in_flight += 1
+        self.stats["admitted"] += 1
+        if critical:
+            self.stats["critical_admitted"] += 1
+
+    def _discard(self, waiter: asyncio.Future):
+        for queue in (self._critical, self._normal):
+            if waiter in queue:
+                queue.remove(waiter)
+        if not waiter.done():
+            waiter.cancel()
+
+    def release(self):
+        """Give the slot to the next waiter (critical first) or free it."""
+        for queue in (self._critical, self._normal):
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    # The slot passes over directly, so in_flight is unchanged
+                    waiter.set_result(None)
+                    return
+        self.in_flight -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth(),
+            "queue_depth_critical": len(self._critical),
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+        }
@@ -0,0 +1,100 @@
+"""
+Broadcast frame benchmark: full-frame vs delta-frame protocol on the CSV replay.
+
+Replays the bundled CSV through the same code path as the CSV broadcast loop and
+reports bytes per tick and client-side parse cost (json.loads + merging into the
+client's patient map) for both protocols.
+
+    python benchmarks/bench_broadcast_frames.py --adaptive --json frames.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from broadcast_cadence import AdaptiveCadence
+from delta_frames import DeltaEncoder, apply_frame
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(sizes, parse_times):
+    return {
+        "bytes_total": sum(sizes),
+        "bytes_per_tick_mean": round(statistics.mean(sizes), 1),
+        "bytes_per_tick_p95": percentile(sizes, 95),
+        "parse_us_mean": round(statistics.mean(parse_times) * 1e6, 2),
+        "parse_us_p95": round(percentile(parse_times, 95) * 1e6, 2),
+    }
+
+
+def run(ticks: int, adaptive: bool, keyframe_interval: int):
+    # The replay prints a line per missing patient per window; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.load_and_prepare_data()
+        main.ensure_model_loaded()
+
+    cadence = AdaptiveCadence(main.STABLE_PATIENT_INTERVAL_SECONDS, main.VITAL_DEADBANDS, main.AI_RISK_THRESHOLD)
+    encoder = DeltaEncoder(keyframe_interval)
+    full_client, delta_client = {}, {}
+    full_sizes, full_parse, delta_sizes, delta_parse = [], [], [], []
+
+    for tick in range(ticks):
+        window = tick % (main.max_window + 1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            patients = main.get_data_for_window(window)
+        # Simulated clock so the stable interval means the same as on a live server
+        now = tick * main.BROADCAST_INTERVAL_SECONDS
+        outgoing = cadence.select(patients, now=now) if adaptive else patients
+
+        full_message = json.dumps(outgoing)
+        delta_message = json.dumps(encoder.encode(outgoing, [p["patient_id"] for p in patients]))
+        full_sizes.append(len(full_message.encode("utf-8")))
+        delta_sizes.append(len(delta_message.encode("utf-8")))
+
+        start = time.perf_counter()
+        for patient in json.loads(full_message):
+            full_client[patient["patient_id"]] = patient
+        full_parse.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        delta_client = apply_frame(delta_client, json.loads(delta_message))
+        delta_parse.append(time.perf_counter() - start)
+
+    full, delta = summarize(full_sizes, full_parse), summarize(delta_sizes, delta_parse)
+    return {
+        "ticks": ticks,
+        "patients": len(main.TARGET_PATIENTS),
+        "adaptive_cadence": adaptive,
+        "keyframe_interval": keyframe_interval,
+        "full": full,
+        "delta": delta,
+        "delta_bytes_ratio": round(delta["bytes_total"] / full["bytes_total"], 3),
+        "clients_in_sync": full_client == delta_client,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=600, help="number of broadcast ticks to replay")
+    parser.add_argument("--adaptive", action="store_true", help="apply the adaptive cadence before encoding")
+    parser.add_argument("--keyframe-interval", type=int, default=main.DELTA_KEYFRAME_INTERVAL)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = run(args.ticks, args.adaptive, args.keyframe_interval)
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
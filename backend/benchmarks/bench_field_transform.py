@@ -0,0 +1,115 @@
+"""
+Microbenchmark: compiled field transformers vs. the interpreted transform_data.
+
+`legacy_transform_data` / `legacy_parse_vital_value` are the implementations
+UniversalMonitorProcessor used before field_transform.py; both paths run over
+the same generated readings and their outputs are checked to agree.
+
+    python benchmarks/bench_field_transform.py --readings 200000
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from field_transform import TransformerCache
+
+MODEL_FEATURES = ["hr_mean", "sbp_mean", "dbp_mean", "spo2_mean"]
+FIELD_MAPPINGS = {"HR": "hr_mean", "SpO2": "spo2_mean", "NBP_SYS": "sbp_mean", "NBP_DIA": "dbp_mean", "RESP": "rr_mean"}
+
+
+def legacy_parse_vital_value(value):
+    if value is None or value == "":
+        return None
+    try:
+        if isinstance(value, str):
+            cleaned = re.sub(r'[^\d.-]', '', value.strip())
+            if cleaned:
+                return float(cleaned)
+            return None
+        elif isinstance(value, (int, float)):
+            return float(value)
+        else:
+            return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def legacy_transform_data(raw_data, field_mappings, model_features):
+    transformed = {}
+    for raw_field, model_field in field_mappings.items():
+        if raw_field in raw_data:
+            transformed[model_field] = legacy_parse_vital_value(raw_data[raw_field])
+    for feature in model_features:
+        if feature not in transformed:
+            transformed[feature] = None
+    return transformed
+
+
+def make_readings(count: int, style: str):
+    readings = []
+    for _ in range(count):
+        if style == "strings" or (style == "mixed" and random.random() < 0.5):
+            reading = {
+                "HR": f"{random.randint(50, 140)} bpm",
+                "SpO2": f"{random.randint(85, 100)}%",
+                "NBP_SYS": f"{random.randint(90, 160)} mmHg",
+                "NBP_DIA": str(random.randint(50, 100)),
+                "RESP": f"{random.randint(10, 30)}/min",
+            }
+        else:
+            reading = {
+                "HR": round(random.gauss(85, 12), 1),
+                "SpO2": random.randint(85, 100),
+                "NBP_SYS": random.randint(90, 160),
+                "NBP_DIA": random.randint(50, 100),
+            }
+        readings.append(reading)
+    return readings
+
+
+def timed(fn, readings):
+    started = time.perf_counter()
+    for reading in readings:
+        fn(reading)
+    return time.perf_counter() - started
+
+
+def run(count: int, style: str):
+    readings = make_readings(count, style)
+    cache = TransformerCache()
+
+    def compiled(reading):
+        return cache.get("bench", FIELD_MAPPINGS, MODEL_FEATURES)(reading)
+
+    for reading in readings[:1000]:
+        assert compiled(reading) == legacy_transform_data(reading, FIELD_MAPPINGS, MODEL_FEATURES), reading
+
+    legacy_s = timed(lambda r: legacy_transform_data(r, FIELD_MAPPINGS, MODEL_FEATURES), readings)
+    compiled_s = timed(compiled, readings)
+    return {
+        "style": style,
+        "readings": count,
+        "legacy_us_per_reading": round(legacy_s / count * 1e6, 3),
+        "compiled_us_per_reading": round(compiled_s / count * 1e6, 3),
+        "speedup": round(legacy_s / compiled_s, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readings", type=int, default=200000)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = [run(args.readings, style) for style in ("numeric", "strings", "mixed")]
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
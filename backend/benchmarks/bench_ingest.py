@@ -0,0 +1,163 @@
+"""
+Ingest throughput benchmark for POST /monitor-data/ingest and /ingest-batch.
+
+Drives the monitor-data router in-process through a minimal ASGI client, so the
+numbers include routing, Pydantic validation, the processor and JSON response
+encoding, but no network. Without MONGO_URI the processor takes its
+no-database path (transform + scoring).
+
+    python benchmarks/bench_ingest.py --requests 500                # app-scoped processor
+    python benchmarks/bench_ingest.py --requests 50 --per-request   # old behaviour: new processor per request
+    python benchmarks/bench_ingest.py --requests 20 --batch 200     # /ingest-batch, 200 records per request
+    python benchmarks/bench_ingest.py --requests 20 --batch 200 --ndjson
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+
+import routers.monitor_data as monitor_data
+from monitor_processor import UniversalMonitorProcessor
+
+
+async def asgi_request(app, method: str, path: str, body: bytes = b"", content_type: str = "application/json"):
+    """Send one HTTP request straight into an ASGI app; returns (status, body)."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 80),
+    }
+    sent = False
+    response = {"status": None, "body": []}
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return response["status"], b"".join(response["body"])
+
+
+def make_reading(device_id: str) -> dict:
+    """A Philips-style reading as sent by bedside monitors."""
+    return {
+        "device_id": device_id,
+        "device_type": "philips",
+        "data": {
+            "HR": round(random.gauss(85, 12), 1),
+            "SpO2": f"{random.randint(90, 100)}%",
+            "NBP_SYS": random.randint(95, 150),
+            "NBP_DIA": random.randint(55, 95),
+            "RESP": random.randint(12, 24),
+        },
+    }
+
+
+def build_app(per_request: bool) -> FastAPI:
+    app = FastAPI()
+    app.include_router(monitor_data.router)
+    if per_request:
+        app.dependency_overrides[monitor_data.get_monitor_processor] = UniversalMonitorProcessor
+    else:
+        app.state.monitor_processor = UniversalMonitorProcessor()
+        app.state.monitor_processor.ensure_model_loaded()
+    return app
+
+
+def make_body(start: int, batch: int, devices: int, ndjson: bool) -> bytes:
+    readings = [make_reading(f"bench_bed_{(start + i) % devices:03d}") for i in range(batch)]
+    if ndjson:
+        return "\n".join(json.dumps(r) for r in readings).encode()
+    return json.dumps(readings).encode()
+
+
+async def run(requests: int, concurrency: int, devices: int, per_request: bool, batch: int = 0, ndjson: bool = False):
+    app = build_app(per_request)
+    if batch:
+        path = "/monitor-data/ingest-batch"
+        content_type = "application/x-ndjson" if ndjson else "application/json"
+        bodies = [make_body(i * batch, batch, devices, ndjson) for i in range(requests)]
+    else:
+        path, content_type = "/monitor-data/ingest", "application/json"
+        bodies = [json.dumps(make_reading(f"bench_bed_{i % devices:03d}")).encode() for i in range(requests)]
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for body in bodies:
+        queue.put_nowait(body)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            body = queue.get_nowait()
+            start = time.perf_counter()
+            status, _ = await asgi_request(app, "POST", path, body, content_type)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    records = requests * (batch or 1)
+    return {
+        "mode": "per_request_processor" if per_request else "app_scoped_processor",
+        "endpoint": path,
+        "batch_size": batch or 1,
+        "format": ("ndjson" if ndjson else "json_array") if batch else "json",
+        "requests": requests,
+        "records": records,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "records_per_s": round(records / elapsed, 1),
+        "latency_ms_p50": round(latencies[len(latencies) // 2] * 1000, 3),
+        "latency_ms_p95": round(latencies[int(len(latencies) * 0.95)] * 1000, 3),
+        "latency_ms_mean": round(statistics.mean(latencies) * 1000, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--devices", type=int, default=16)
+    parser.add_argument("--per-request", action="store_true", help="build a new processor per request (pre-refactor behaviour)")
+    parser.add_argument("--batch", type=int, default=0, help="records per request to /ingest-batch (0 = single-record /ingest)")
+    parser.add_argument("--ndjson", action="store_true", help="send batches as NDJSON instead of a JSON array")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.requests, args.concurrency, args.devices, args.per_request, args.batch, args.ndjson))
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
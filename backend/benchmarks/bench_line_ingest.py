@@ -0,0 +1,100 @@
+"""
+Throughput benchmark for the TCP line-protocol ingest listener (line_ingest.py).
+
+Starts the listener on a loopback port in-process, streams key=value lines
+into it over one or more connections and reports lines per second once every
+line has been processed. Without MONGO_URI the processor takes its
+no-database path (transform + scoring).
+
+    python benchmarks/bench_line_ingest.py --lines 200000                 # full pipeline
+    python benchmarks/bench_line_ingest.py --lines 500000 --parse-only    # listener + parser only
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import line_ingest
+from line_ingest import start_line_ingest
+from monitor_processor import UniversalMonitorProcessor
+
+
+class DiscardingProcessor:
+    """Accepts batches without processing them, to measure the listener alone."""
+
+    async def process_monitor_batch(self, raw_items):
+        return [{"status": "success"} for _ in raw_items]
+
+
+def make_lines(count: int, devices: int) -> bytes:
+    lines = []
+    for i in range(count):
+        lines.append(
+            f"device_id=bench_bed_{i % devices:03d} type=philips "
+            f"HR={random.gauss(85, 12):.1f} SpO2={random.randint(90, 100)}% "
+            f"NBP_SYS={random.randint(95, 150)} NBP_DIA={random.randint(55, 95)} RESP={random.randint(12, 24)}\n"
+        )
+    return "".join(lines).encode()
+
+
+async def send(port: int, payload: bytes, chunk_size: int):
+    _, writer = await asyncio.open_connection("127.0.0.1", port)
+    for offset in range(0, len(payload), chunk_size):
+        writer.write(payload[offset:offset + chunk_size])
+        await writer.drain()  # waits while the server has stopped reading
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run(lines: int, connections: int, devices: int, batch_size: int, max_pending: int, parse_only: bool):
+    if parse_only:
+        processor = DiscardingProcessor()
+    else:
+        processor = UniversalMonitorProcessor()
+        processor.ensure_model_loaded()
+    server = await start_line_ingest(processor, "127.0.0.1", 0, batch_size, max_pending)
+    port = server.sockets[0].getsockname()[1]
+    per_connection = lines // connections
+    payloads = [make_lines(per_connection, devices) for _ in range(connections)]
+    total = per_connection * connections
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(port, payload, 64 * 1024) for payload in payloads))
+    while line_ingest.line_stats["lines"] + line_ingest.line_stats["rejected_lines"] < total:
+        await asyncio.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    server.close()
+
+    return {
+        "mode": "parse_only" if parse_only else "full_pipeline",
+        "lines": total,
+        "connections": connections,
+        "batch_size": batch_size,
+        "elapsed_s": round(elapsed, 3),
+        "lines_per_s": round(total / elapsed, 1),
+        "stats": dict(line_ingest.line_stats),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--devices", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--max-pending", type=int, default=4096)
+    parser.add_argument("--parse-only", action="store_true", help="discard parsed readings instead of processing them")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.lines, args.connections, args.devices, args.batch_size, args.max_pending, args.parse_only))
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,217 @@
+"""
+Round-trips and latency of the service-layer mutations behind the PUT routes.
+
+Seeds one hospital, user, department and appointment plus --patients patients
+into benchmarks/memory_motor.py (each call costs --db-latency-ms, like a
+network round-trip to Mongo), then runs every update/admit/discharge/assign
+mutation and create_patient --iterations times and reports the database
+round-trips per call and the call latency.
+
+Two modes, reported side by side with --mode both (the default):
+
+    repository  the service functions as they are: one find_one_and_update per
+                mutation, patient numbers from the atomic counter
+    legacy      what the services did before repository.py and counters.py:
+                find_one -> update_one -> find_one (or update_one -> find_one),
+                and a patient number found by scanning every existing IRN- ID
+                for the highest one
+
+    python benchmarks/bench_mutations.py
+    python benchmarks/bench_mutations.py --mode legacy --db-latency-ms 1 --iterations 500 --json mutations.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+
+import mongo_config
+import appointment_service
+import counters
+import department_service
+import hospital_service
+import patient_service
+import user_service
+from benchmarks.memory_motor import MemoryDatabase
+from models import PatientCreate
+
+MODES = ("repository", "legacy")
+
+
+async def seed(db, patients: int):
+    patient_id, department_id, appointment_id = ObjectId(), ObjectId(), ObjectId()
+    await db.hospitals.insert_one({"id": "HOSP001", "name": "Bench Hospital", "admin_uid": "bench_admin"})
+    await db.users.insert_one({"firebase_uid": "bench_user", "email": "bench@example.com", "role": "nurse",
+                               "hospital_id": "HOSP001", "is_active": True})
+    await db.departments.insert_one({"_id": department_id, "name": "ICU", "hospital_id": "HOSP001"})
+    await db.patients.insert_one({"_id": patient_id, "id": "IRN-00001", "hospital_id": "HOSP001",
+                                  "first_name": "Bench", "last_name": "Patient", "is_active": True})
+    await db.patients.insert_many([{"id": counters.format_patient_id(number), "hospital_id": "HOSP001",
+                                    "first_name": "Other", "last_name": "Patient", "is_active": True}
+                                   for number in range(2, patients + 1)])
+    # The counter exists already, as after startup seeding
+    await db[counters.COUNTERS_COLLECTION].insert_one({"_id": counters.PATIENT_NUMBER, "value": patients})
+    await db.appointments.insert_one({"_id": appointment_id, "hospital_id": "HOSP001", "patient_id": str(patient_id),
+                                      "appointment_date": datetime.utcnow(), "status": "scheduled"})
+    return str(patient_id), str(department_id), str(appointment_id)
+
+
+def new_patient(i: int) -> PatientCreate:
+    return PatientCreate(hospital_id="HOSP001", first_name=f"New{i}", last_name="Patient", date_of_birth=datetime(1980, 1, 1))
+
+
+def mutations(patient_id: str, department_id: str, appointment_id: str):
+    """name -> factory for one call of that mutation; `i` varies the written values."""
+    return {
+        "update_patient": lambda i: patient_service.update_patient(patient_id, {"room_number": f"R{i}"}),
+        "admit_patient": lambda i: patient_service.admit_patient(patient_id),
+        "discharge_patient": lambda i: patient_service.discharge_patient(patient_id),
+        "assign_patient_to_department": lambda i: patient_service.assign_patient_to_department(patient_id, department_id),
+        "assign_patient_room": lambda i: patient_service.assign_patient_room(patient_id, f"R{i}", str(i % 4)),
+        "update_user": lambda i: user_service.update_user("bench_user", {"phone": str(i)}),
+        "assign_user_to_department": lambda i: user_service.assign_user_to_department("bench_user", department_id),
+        "deactivate_user": lambda i: user_service.deactivate_user("bench_user"),
+        "update_hospital": lambda i: hospital_service.update_hospital("HOSP001", {"phone": str(i)}),
+        "update_department": lambda i: department_service.update_department(department_id, {"description": str(i)}),
+        "assign_department_head": lambda i: department_service.assign_department_head(department_id, f"head_{i}"),
+        "update_appointment": lambda i: appointment_service.update_appointment(appointment_id, {"notes": str(i)}),
+        "update_appointment_status": lambda i: appointment_service.update_appointment_status(appointment_id, "confirmed"),
+        "create_patient": lambda i: patient_service.create_patient(new_patient(i)),
+    }
+
+
+async def legacy_check_update(collection, filter, changes):
+    """find_one -> update_one -> find_one, as the update_* functions did."""
+    if not await collection.find_one(filter):
+        return None
+    await collection.update_one(filter, {"$set": {**changes, "updated_at": datetime.utcnow()}})
+    document = await collection.find_one(filter)
+    if document:
+        document["_id"] = str(document["_id"])
+    return document
+
+
+async def legacy_update_then_read(collection, filter, changes):
+    """update_one -> find_one, as the admit/discharge/assign functions did."""
+    await collection.update_one(filter, {"$set": {**changes, "updated_at": datetime.utcnow()}})
+    document = await collection.find_one(filter)
+    if document:
+        document["_id"] = str(document["_id"])
+    return document
+
+
+async def legacy_create_patient(db, i: int):
+    """Highest IRN- number + 1 from a scan of every patient, then insert_one -> find_one.
+
+    The old code ran an aggregate over every IRN- ID; the in-memory database has
+    no aggregate, so one find over the same IDs stands in for it.
+    """
+    existing = await db.patients.find({}, {"id": 1}).to_list(length=None)
+    highest = max((int(p["id"][4:]) for p in existing if str(p.get("id", "")).startswith("IRN-")), default=0)
+    document = patient_service.build_patient_document(new_patient(i), counters.format_patient_id(highest + 1))
+    result = await db.patients.insert_one(document)
+    inserted = await db.patients.find_one({"_id": result.inserted_id})
+    inserted["_id"] = str(inserted["_id"])
+    return inserted
+
+
+def legacy_mutations(db, patient_id: str, department_id: str, appointment_id: str):
+    """The same mutations with the round-trips of the services before repository.py."""
+    patient = {"_id": ObjectId(patient_id)}
+    department = {"_id": ObjectId(department_id)}
+    appointment = {"_id": ObjectId(appointment_id)}
+    user = {"firebase_uid": "bench_user"}
+    return {
+        "update_patient": lambda i: legacy_check_update(db.patients, patient, {"room_number": f"R{i}"}),
+        "admit_patient": lambda i: legacy_update_then_read(db.patients, patient, {
+            "admission_date": datetime.utcnow(), "discharge_date": None, "is_active": True}),
+        "discharge_patient": lambda i: legacy_update_then_read(db.patients, patient, {
+            "discharge_date": datetime.utcnow(), "is_active": False}),
+        "assign_patient_to_department": lambda i: legacy_update_then_read(db.patients, patient, {"department_id": department_id}),
+        "assign_patient_room": lambda i: legacy_update_then_read(db.patients, patient, {
+            "room_number": f"R{i}", "bed_number": str(i % 4)}),
+        "update_user": lambda i: legacy_check_update(db.users, user, {"phone": str(i)}),
+        "assign_user_to_department": lambda i: legacy_update_then_read(db.users, user, {"department_id": department_id}),
+        # deactivate_user also checked first and re-read afterwards to log the result
+        "deactivate_user": lambda i: legacy_check_update(db.users, user, {"is_active": False}),
+        "update_hospital": lambda i: legacy_check_update(db.hospitals, {"id": "HOSP001"}, {"phone": str(i)}),
+        "update_department": lambda i: legacy_check_update(db.departments, department, {"description": str(i)}),
+        "assign_department_head": lambda i: legacy_update_then_read(db.departments, department, {"head_uid": f"head_{i}"}),
+        "update_appointment": lambda i: legacy_check_update(db.appointments, appointment, {"notes": str(i)}),
+        "update_appointment_status": lambda i: legacy_update_then_read(db.appointments, appointment, {"status": "confirmed"}),
+        "create_patient": lambda i: legacy_create_patient(db, i),
+    }
+
+
+async def run_mode(mode: str, iterations: int, db_latency_ms: float, patients: int):
+    db = MemoryDatabase(db_latency_ms)
+    mongo_config.database = db
+    ids = await seed(db, patients)
+    calls = legacy_mutations(db, *ids) if mode == "legacy" else mutations(*ids)
+
+    report = {}
+    for name, call in calls.items():
+        before = sum(db.round_trips.values())
+        durations = []
+        for i in range(iterations):
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):  # services log some mutations
+                result = await call(i)
+            durations.append(time.perf_counter() - started)
+            if not result:
+                raise RuntimeError(f"{mode} {name} returned {result!r}")
+        durations.sort()
+        report[name] = {
+            "round_trips_per_call": (sum(db.round_trips.values()) - before) / iterations,
+            "mean_ms": round(sum(durations) / len(durations) * 1000, 3),
+            "p50_ms": round(durations[len(durations) // 2] * 1000, 3),
+            "p95_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000, 3),
+        }
+    return {"mutations": report, "db_round_trips_by_op": dict(db.round_trips)}
+
+
+async def run(modes, iterations: int, db_latency_ms: float, patients: int):
+    return {
+        "config": {"iterations": iterations, "db_latency_ms": db_latency_ms, "patients": patients},
+        "modes": {mode: await run_mode(mode, iterations, db_latency_ms, patients) for mode in modes},
+    }
+
+
+def print_summary(report):
+    modes = list(report["modes"])
+    header = f"{'mutation':<30}"
+    for mode in modes:
+        header += f"{mode + ' trips':>18}{'mean ms':>10}{'p95 ms':>10}"
+    print(header)
+    for name in report["modes"][modes[0]]["mutations"]:
+        line = f"{name:<30}"
+        for mode in modes:
+            stats = report["modes"][mode]["mutations"][name]
+            line += f"{stats['round_trips_per_call']:>18}{stats['mean_ms']:>10}{stats['p95_ms']:>10}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=MODES + ("both",), default="both")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--db-latency-ms", type=float, default=0.5, help="simulated round-trip per database call")
+    parser.add_argument("--patients", type=int, default=1000, help="patients seeded before measuring")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    modes = MODES if args.mode == "both" else (args.mode,)
+    report = asyncio.run(run(modes, args.iterations, args.db_latency_ms, args.patients))
+    print_summary(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,311 @@
+"""
+Per-stage benchmark of the monitor ingest pipeline.
+
+Drives UniversalMonitorProcessor directly (no HTTP) against seeded device
+assignments, mappings and patients, and times every stage of each reading:
+
+    mapping_lookup  resolve_device_route (routing table, Mongo on a miss)
+    transform       transform_data (compiled field mapping)
+    window          accept_reading (stale check + rolling-window features)
+    scoring         score_vitals (model call; one per batch on the batch path)
+    store           store_real_time_* (write-behind enqueue)
+    flush           realtime/history bulk writes, timed per flush
+    end_to_end      submit -> result, per reading
+
+Runs offline by default against benchmarks/memory_motor.py, an in-memory
+Motor stand-in (--db-latency-ms adds a simulated round-trip per call); pass
+--mongo-uri to use a local mongod instead (a scratch database is created and
+dropped).
+
+    python benchmarks/bench_pipeline.py --devices 200 --readings 20000
+    python benchmarks/bench_pipeline.py --formats philips,ge,mindray --rate 2000
+    python benchmarks/bench_pipeline.py --path batch --batch-size 256 --db-latency-ms 0.5
+    python benchmarks/bench_pipeline.py --mongo-uri mongodb://localhost:27017 --json pipeline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+
+from monitor_processor import UniversalMonitorProcessor
+from benchmarks.device_simulator import FORMATS
+from benchmarks.memory_motor import MemoryDatabase
+
+# Mean and spread of each standardized vital for generated readings
+VITALS = {"hr_mean": (85, 12), "spo2_mean": (96, 2), "sbp_mean": (120, 15), "dbp_mean": (75, 10), "rr_mean": (18, 4)}
+
+
+class Stage:
+    """Durations of one pipeline stage."""
+
+    def __init__(self):
+        self.durations = []
+        self.records = 0
+
+    def record(self, elapsed: float, records: int = 1):
+        self.durations.append(elapsed)
+        self.records += records
+
+    def report(self):
+        if not self.durations:
+            return {"calls": 0}
+        durations = sorted(self.durations)
+        total = sum(durations)
+
+        def pct(p):
+            return round(durations[min(len(durations) - 1, int(len(durations) * p))] * 1000, 4)
+
+        return {
+            "calls": len(durations),
+            "records": self.records,
+            "records_per_s": round(self.records / total, 1) if total else None,
+            "total_ms": round(total * 1000, 2),
+            "mean_ms": round(total / len(durations) * 1000, 4),
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(durations[-1] * 1000, 4),
+        }
+
+
+def timed(stage: Stage, func, records=lambda args: 1):
+    """Wrap a sync or async method so each call is recorded in `stage`."""
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                stage.record(time.perf_counter() - started, records(args))
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stage.record(time.perf_counter() - started, records(args))
+    return wrapper
+
+
+def instrument(processor: UniversalMonitorProcessor):
+    stages = {name: Stage() for name in ("mapping_lookup", "transform", "window", "scoring", "store", "flush", "end_to_end")}
+    processor.resolve_device_route = timed(stages["mapping_lookup"], processor.resolve_device_route)
+    processor.transform_data = timed(stages["transform"], processor.transform_data)
+    processor.accept_reading = timed(stages["window"], processor.accept_reading)
+    processor.score_vitals = timed(stages["scoring"], processor.score_vitals, lambda args: len(args[0]))
+    processor.store_real_time_data = timed(stages["store"], processor.store_real_time_data)
+    processor.store_real_time_batch = timed(stages["store"], processor.store_real_time_batch, lambda args: len(args[0]))
+    for writer in (processor.realtime_writer, processor.history_writer):
+        writer._write_batch = timed(stages["flush"], writer._write_batch, lambda args: len(args[1]))
+    return stages
+
+
+async def seed(db, devices: int, formats):
+    """One patient, assignment and mapping per device; mappings shared per format."""
+    mapping_ids = {}
+    for name in formats:
+        result = await db.device_mappings.insert_one({
+            "device_type": name,
+            "field_mappings": FORMATS[name]["field_mappings"],
+            "is_active": True,
+        })
+        mapping_ids[name] = result.inserted_id
+
+    device_formats = {}
+    patients, assignments = [], []
+    for i in range(devices):
+        device_id = f"bench_bed_{i:04d}"
+        device_format = formats[i % len(formats)]
+        device_formats[device_id] = device_format
+        patient_id = ObjectId()
+        patients.append({
+            "_id": patient_id,
+            "first_name": "Bench",
+            "last_name": f"Patient {i}",
+            "room_number": f"R{i // 4:03d}",
+            "bed_number": str(i % 4 + 1),
+        })
+        assignments.append({
+            "device_id": device_id,
+            "patient_id": str(patient_id),
+            "mapping_id": str(mapping_ids[device_format]),
+            "is_active": True,
+        })
+    await db.patients.insert_many(patients)
+    await db.device_assignments.insert_many(assignments)
+    return device_formats
+
+
+def make_readings(device_formats, count: int, rng: random.Random):
+    """Round-robin readings with per-device random-walk vitals and increasing timestamps."""
+    devices = list(device_formats)
+    state = {device_id: {field: rng.gauss(mean, spread / 2) for field, (mean, spread) in VITALS.items()} for device_id in devices}
+    started = datetime.now(timezone.utc) - timedelta(seconds=count // len(devices) + 1)
+    readings = []
+    for i in range(count):
+        device_id = devices[i % len(devices)]
+        spec = FORMATS[device_formats[device_id]]
+        vitals = state[device_id]
+        data = {}
+        for raw_field, field in spec["field_mappings"].items():
+            mean, spread = VITALS[field]
+            # Random walk pulled back towards the mean
+            vitals[field] += rng.gauss(0, spread / 10) + (mean - vitals[field]) * 0.05
+            data[raw_field] = spec["render"](raw_field, vitals[field])
+        readings.append({
+            "device_id": device_id,
+            "device_type": device_formats[device_id],
+            "data": data,
+            "timestamp": started + timedelta(seconds=i // len(devices)),
+        })
+    return readings
+
+
+async def run(devices: int, readings: int, formats, path: str, batch_size: int, rate: float,
+              concurrency: int, db_latency_ms: float, mongo_uri: str = None, seed_value: int = 0):
+    rng = random.Random(seed_value)
+    client = None
+    if mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(mongo_uri)
+        db_name = f"bench_pipeline_{os.getpid()}"
+        db = client[db_name]
+    else:
+        db = MemoryDatabase(db_latency_ms)
+
+    processor = UniversalMonitorProcessor()
+    processor.mongo_client = db
+    processor.ensure_model_loaded()
+    stages = instrument(processor)
+
+    device_formats = await seed(db, devices, formats)
+    items = make_readings(device_formats, readings, rng)
+    round_trips_before = sum(db.round_trips.values()) if not mongo_uri else None
+
+    if path == "batch":
+        units = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        process = processor.process_monitor_batch
+    else:
+        units = items
+        process = processor.submit_monitor_data
+
+    statuses = {}
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    per_unit = batch_size if path == "batch" else 1
+
+    async def handle(unit):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            results = await process(unit)
+        except Exception:
+            errors += 1
+            return
+        finally:
+            semaphore.release()
+        stages["end_to_end"].record(time.perf_counter() - started, len(unit) if path == "batch" else 1)
+        for result in results if path == "batch" else [results]:
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+
+    tasks = []
+    started = time.perf_counter()
+    for i, unit in enumerate(units):
+        if rate:
+            # Open loop: unit i is due at i * per_unit / rate seconds
+            delay = started + i * per_unit / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await semaphore.acquire()
+        tasks.append(asyncio.create_task(handle(unit)))
+    await asyncio.gather(*tasks)
+    processed_s = time.perf_counter() - started
+    # Drain the write-behind buffers so every reading's store cost is counted
+    await processor.realtime_writer.stop()
+    await processor.history_writer.stop()
+    elapsed = time.perf_counter() - started
+    await processor.ordered.stop()
+
+    report = {
+        "config": {
+            "devices": devices,
+            "readings": readings,
+            "formats": formats,
+            "path": path,
+            "batch_size": per_unit,
+            "target_rate_per_s": rate or None,
+            "concurrency": concurrency,
+            "database": "mongod" if mongo_uri else "memory",
+            "db_latency_ms": None if mongo_uri else db_latency_ms,
+            "model_loaded": processor.model is not None,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "records_per_s": round(readings / processed_s, 1),
+        "records_per_s_including_drain": round(readings / elapsed, 1),
+        "errors": errors,
+        "statuses": statuses,
+        "stages": {name: stage.report() for name, stage in stages.items()},
+        "routing_cache": dict(processor.routes.stats),
+        "field_transformers": dict(processor.transformers.stats),
+        "realtime_writer": processor.realtime_writer.metrics(),
+        "history_writer": processor.history_writer.metrics(),
+    }
+    if mongo_uri:
+        await client.drop_database(db_name)
+        client.close()
+    else:
+        report["db_round_trips"] = sum(db.round_trips.values()) - round_trips_before
+        report["db_round_trips_by_op"] = dict(db.round_trips)
+    return report
+
+
+def print_summary(report):
+    print(f"{report['records_per_s']} records/s ({report['config']['path']} path, {report['config']['database']} db)")
+    print(f"{'stage':<16}{'calls':>8}{'records/s':>14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stage in report["stages"].items():
+        if stage["calls"]:
+            print(f"{name:<16}{stage['calls']:>8}{stage['records_per_s'] or 0:>14}{stage['p50_ms']:>10}{stage['p95_ms']:>10}{stage['p99_ms']:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--readings", type=int, default=10000)
+    parser.add_argument("--formats", default="philips,ge,mindray", help=f"comma-separated device formats ({', '.join(FORMATS)}), assigned round-robin")
+    parser.add_argument("--path", choices=("single", "batch"), default="single", help="submit_monitor_data per reading, or process_monitor_batch")
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--rate", type=float, default=0, help="offered readings/s (0 = as fast as possible)")
+    parser.add_argument("--concurrency", type=int, help="readings (or batches) in flight; default 64 readings or 1 batch, like one gateway connection")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="simulated round-trip per call to the in-memory database")
+    parser.add_argument("--mongo-uri", help="use a local mongod instead of the in-memory stand-in")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    formats = [name.strip() for name in args.formats.split(",") if name.strip()]
+    unknown = [name for name in formats if name not in FORMATS]
+    if unknown or not formats:
+        parser.error(f"unknown formats: {', '.join(unknown) or '(none)'}")
+
+    concurrency = args.concurrency or (1 if args.path == "batch" else 64)
+    report = asyncio.run(run(args.devices, args.readings, formats, args.path, args.batch_size, args.rate,
+                             concurrency, args.db_latency_ms, args.mongo_uri, args.seed))
+    print_summary(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
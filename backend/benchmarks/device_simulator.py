@@ -0,0 +1,386 @@
+"""
+Simulated bedside monitors for load-testing monitor ingest.
+
+Spawns N devices that produce random-walk vitals drawn from the patient windows
+in data/summary_features_added_data.csv and push them to a running backend in
+a vendor format, at a configurable per-device rate with jitter. Each device
+starts from one CSV window's means, steps by a fraction of that window's
+standard deviations, is pulled back towards its baseline and stays inside the
+dataset's 1st-99th percentile range for each vital.
+
+Transports:
+    http    POST /monitor-data/ingest, one reading per request, keep-alive per device
+    ws      /monitor-data/stream, one persistent WebSocket per device (acks requested)
+    line    raw TCP line protocol (LINE_INGEST_PORT); fire-and-forget
+
+A server without MongoDB maps readings with the Philips field names only, so
+--formats philips (the default) is what test mode understands; other formats
+need a device mapping and assignment per device.
+
+    python benchmarks/device_simulator.py --devices 200 --rate 1 --duration 60
+    python benchmarks/device_simulator.py --transport ws --devices 500 --rate 2 --jitter 0.3
+    python benchmarks/device_simulator.py --transport line --line-port 9100 --devices 1000 --rate 5
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_FILE = os.path.join(BACKEND_DIR, "data", "summary_features_added_data.csv")
+
+# Standardized vital -> CSV column prefix
+CSV_VITALS = {"hr_mean": "HR", "spo2_mean": "SPO2", "sbp_mean": "SBP", "dbp_mean": "DBP", "rr_mean": "RR"}
+MINDRAY_UNITS = {"PR": "bpm", "SPO2": "%", "NIBP-S": "mmHg", "NIBP-D": "mmHg", "RR": "/min"}
+
+# Vendor field names -> standardized fields, and how each vendor formats a value
+FORMATS = {
+    "philips": {
+        "field_mappings": {"HR": "hr_mean", "SpO2": "spo2_mean", "NBP_SYS": "sbp_mean", "NBP_DIA": "dbp_mean", "RESP": "rr_mean"},
+        "render": lambda name, value: f"{round(value)}%" if name == "SpO2" else round(value, 1),
+    },
+    "ge": {
+        "field_mappings": {"heart_rate": "hr_mean", "spo2": "spo2_mean", "nibp_systolic": "sbp_mean", "nibp_diastolic": "dbp_mean", "resp_rate": "rr_mean"},
+        "render": lambda name, value: round(value, 1),
+    },
+    "mindray": {
+        "field_mappings": {"PR": "hr_mean", "SPO2": "spo2_mean", "NIBP-S": "sbp_mean", "NIBP-D": "dbp_mean", "RR": "rr_mean"},
+        "render": lambda name, value: f"{round(value)} {MINDRAY_UNITS[name]}",
+    },
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def render(device_format: str, vitals):
+    """Standardized vitals -> the vendor's raw data dict."""
+    spec = FORMATS[device_format]
+    return {raw_field: spec["render"](raw_field, vitals[field]) for raw_field, field in spec["field_mappings"].items()}
+
+
+class VitalsModel:
+    """Baselines, step sizes and bounds taken from the CSV windows."""
+
+    def __init__(self, path: str = DATA_FILE):
+        windows, bounds = [], {}
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        for field, prefix in CSV_VITALS.items():
+            lows = [float(row[f"{prefix}_min"]) for row in rows if row[f"{prefix}_min"]]
+            highs = [float(row[f"{prefix}_max"]) for row in rows if row[f"{prefix}_max"]]
+            bounds[field] = (percentile(lows, 1), percentile(highs, 99))
+        for row in rows:
+            try:
+                window = {field: (float(row[f"{prefix}_mean"]), float(row[f"{prefix}_std"])) for field, prefix in CSV_VITALS.items()}
+            except ValueError:
+                continue
+            # Skip windows whose means fall outside the plausible range (sensor dropouts in the data)
+            if all(bounds[field][0] <= mean <= bounds[field][1] for field, (mean, _) in window.items()):
+                windows.append(window)
+        if not windows:
+            raise ValueError(f"No usable vitals windows in {path}")
+        self.windows = windows
+        self.bounds = bounds
+
+    def device(self, rng: random.Random) -> "VitalsWalk":
+        return VitalsWalk(rng.choice(self.windows), self.bounds, rng)
+
+
+class VitalsWalk:
+    """One device's vitals: a mean-reverting random walk around a CSV window."""
+
+    STEP = 0.15  # step sd as a fraction of the window's sd
+    PULL = 0.05  # fraction of the distance to the baseline recovered per step
+
+    def __init__(self, window, bounds, rng: random.Random):
+        self.window = window
+        self.bounds = bounds
+        self.rng = rng
+        self.values = {field: mean for field, (mean, _) in window.items()}
+
+    def step(self):
+        for field, (mean, std) in self.window.items():
+            low, high = self.bounds[field]
+            value = self.values[field] + self.rng.gauss(0, max(std, 0.5) * self.STEP) + (mean - self.values[field]) * self.PULL
+            self.values[field] = min(max(value, low), high)
+        # Diastolic stays below systolic
+        self.values["dbp_mean"] = min(self.values["dbp_mean"], self.values["sbp_mean"] - 10)
+        return self.values
+
+
+class Stats:
+    def __init__(self):
+        self.sent = 0
+        self.accepted = 0
+        self.send_errors = 0
+        self.connect_errors = 0
+        self.http_status = {}
+        self.result_status = {}
+        self.error_frames = 0
+        self.latencies = []
+
+    def count(self, table, key):
+        table[key] = table.get(key, 0) + 1
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client, one request in flight at a time."""
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.reader = self.writer = None
+
+    async def post_json(self, path: str, payload) -> tuple:
+        body = json.dumps(payload).encode()
+        for attempt in range(2):
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                self.writer.write(
+                    f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                await self.writer.drain()
+                return await self._read_response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Server closed the idle keep-alive connection; retry once on a fresh one
+                await self.close()
+                if attempt:
+                    raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readuntil(b"\r\n")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, body
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        self.reader = self.writer = None
+
+
+def schedule(rate: float, jitter: float, rng: random.Random, stop_at: float):
+    """Send times for one device: every 1/rate seconds, each shifted by up to +-jitter of the interval."""
+    interval = 1 / rate
+    tick = time.monotonic() + rng.uniform(0, interval)  # stagger device start times
+    while tick < stop_at:
+        yield tick + rng.uniform(-jitter, jitter) * interval
+        tick += interval
+
+
+async def wait_until(when: float):
+    delay = when - time.monotonic()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+def reading(device_id: str, device_format: str, walk: VitalsWalk):
+    return {
+        "device_id": device_id,
+        "device_type": device_format,
+        "data": render(device_format, walk.step()),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def run_http_device(device_id, device_format, walk, args, rng, stop_at, stats: Stats):
+    connection = HttpConnection(args.url)
+    try:
+        for when in schedule(args.rate, args.jitter, rng, stop_at):
+            await wait_until(when)
+            started = time.monotonic()
+            try:
+                status, body = await connection.post_json("/monitor-data/ingest", reading(device_id, device_format, walk))
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                stats.send_errors += 1
+                continue
+            stats.sent += 1
+            stats.latencies.append(time.monotonic() - started)
+            stats.count(stats.http_status, status)
+            if status == 200:
+                stats.count(stats.result_status, json.loads(body).get("status", "unknown"))
+                stats.accepted += 1
+    finally:
+        await connection.close()
+
+
+async def run_ws_device(device_id, device_format, walk, args, rng, stop_at, stats: Stats):
+    import websockets
+
+    url = args.url.replace("http", "ws", 1).rstrip("/") + "/monitor-data/stream"
+    try:
+        websocket = await websockets.connect(url)
+    except (OSError, websockets.WebSocketException):
+        stats.connect_errors += 1
+        return
+    sent_at = {}
+
+    async def read_acks():
+        async for message in websocket:
+            frame = json.loads(message)
+            if frame.get("type") == "ack":
+                started = sent_at.pop(frame.get("seq"), None)
+                if started is not None:
+                    stats.latencies.append(time.monotonic() - started)
+                stats.count(stats.result_status, frame.get("status", "unknown"))
+                stats.accepted += 1
+            elif frame.get("type") == "error":
+                sent_at.pop(frame.get("seq"), None)
+                stats.error_frames += 1
+
+    try:
+        hello = {"type": "hello", "device_id": device_id, "device_type": device_format, "ack": True}
+        if args.token:
+            hello["token"] = args.token
+        await websocket.send(json.dumps(hello))
+        ready = json.loads(await websocket.recv())
+        if ready.get("type") != "ready":
+            stats.connect_errors += 1
+            return
+        acks = asyncio.create_task(read_acks())
+        seq = 0
+        for when in schedule(args.rate, args.jitter, rng, stop_at):
+            await wait_until(when)
+            seq += 1
+            frame = reading(device_id, device_format, walk)
+            sent_at[seq] = time.monotonic()
+            await websocket.send(json.dumps({"seq": seq, "data": frame["data"], "timestamp": frame["timestamp"]}))
+            stats.sent += 1
+        # Give outstanding acks a moment before closing
+        deadline = time.monotonic() + 2
+        while sent_at and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        acks.cancel()
+    except (OSError, websockets.WebSocketException):
+        stats.send_errors += 1
+    finally:
+        await websocket.close()
+
+
+async def run_line_device(device_id, device_format, walk, args, rng, stop_at, stats: Stats):
+    host = urlsplit(args.url).hostname
+    try:
+        _, writer = await asyncio.open_connection(host, args.line_port)
+    except OSError:
+        stats.connect_errors += 1
+        return
+    try:
+        for when in schedule(args.rate, args.jitter, rng, stop_at):
+            await wait_until(when)
+            data = render(device_format, walk.step())
+            fields = " ".join(f"{name}={str(value).replace(' ', '')}" for name, value in data.items())
+            writer.write(f"device_id={device_id} type={device_format} ts={time.time():.3f} {fields}\n".encode())
+            # drain() waits while the server has stopped reading (backpressure)
+            await writer.drain()
+            stats.sent += 1
+    except OSError:
+        stats.send_errors += 1
+    finally:
+        writer.close()
+
+
+TRANSPORTS = {"http": run_http_device, "ws": run_ws_device, "line": run_line_device}
+
+
+def summarize(stats: Stats, args, elapsed: float):
+    target = args.devices * args.rate
+    return {
+        "transport": args.transport,
+        "devices": args.devices,
+        "formats": args.formats,
+        "duration_s": round(elapsed, 2),
+        "target_rate_per_s": round(target, 1),
+        "achieved_rate_per_s": round(stats.sent / elapsed, 1) if elapsed else None,
+        "achieved_fraction": round(stats.sent / elapsed / target, 3) if elapsed and target else None,
+        "sent": stats.sent,
+        "acknowledged": stats.accepted if args.transport != "line" else None,
+        "http_status": {str(status): count for status, count in sorted(stats.http_status.items())},
+        "result_status": stats.result_status,
+        "server_errors": sum(count for status, count in stats.http_status.items() if status >= 500) + stats.error_frames,
+        "shed": stats.http_status.get(429, 0),
+        "error_frames": stats.error_frames,
+        "send_errors": stats.send_errors,
+        "connect_errors": stats.connect_errors,
+        "latency_ms_p50": round(percentile(stats.latencies, 50) * 1000, 2) if stats.latencies else None,
+        "latency_ms_p95": round(percentile(stats.latencies, 95) * 1000, 2) if stats.latencies else None,
+        "latency_ms_p99": round(percentile(stats.latencies, 99) * 1000, 2) if stats.latencies else None,
+        "latency_ms_mean": round(statistics.mean(stats.latencies) * 1000, 2) if stats.latencies else None,
+    }
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    model = VitalsModel(args.data)
+    stats = Stats()
+    stop_at = time.monotonic() + args.duration
+    device = TRANSPORTS[args.transport]
+    tasks = []
+    for i in range(args.devices):
+        device_format = args.formats[i % len(args.formats)]
+        device_id = f"{args.prefix}_{device_format}_{i:04d}"
+        device_rng = random.Random(rng.random())
+        tasks.append(device(device_id, device_format, model.device(device_rng), args, device_rng, stop_at, stats))
+
+    started = time.monotonic()
+    await asyncio.gather(*tasks)
+    return summarize(stats, args, min(time.monotonic(), stop_at) - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="backend base URL")
+    parser.add_argument("--transport", choices=sorted(TRANSPORTS), default="http")
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=1.0, help="readings per second per device")
+    parser.add_argument("--jitter", type=float, default=0.2, help="send-time jitter as a fraction of the interval (0-0.5)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--formats", default="philips", help=f"comma-separated vendor formats ({', '.join(FORMATS)}), assigned round-robin")
+    parser.add_argument("--prefix", default="sim", help="device_id prefix")
+    parser.add_argument("--token", default=os.environ.get("INGEST_DEVICE_TOKEN", ""), help="device token for the ws hello frame")
+    parser.add_argument("--line-port", type=int, default=int(os.environ.get("LINE_INGEST_PORT") or 9100))
+    parser.add_argument("--data", default=DATA_FILE, help="CSV with *_mean/*_std/*_min/*_max vitals windows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the summary to this file")
+    args = parser.parse_args()
+
+    args.formats = [name.strip() for name in args.formats.split(",") if name.strip()]
+    unknown = [name for name in args.formats if name not in FORMATS]
+    if unknown or not args.formats:
+        parser.error(f"unknown formats: {', '.join(unknown) or '(none)'}")
+    if args.rate <= 0:
+        parser.error("--rate must be positive")
+    args.jitter = min(max(args.jitter, 0.0), 0.5)
+
+    summary = asyncio.run(main(args))
+    print(json.dumps(summary, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
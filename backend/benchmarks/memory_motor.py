@@ -0,0 +1,366 @@
+"""
+In-memory stand-in for the parts of Motor's API the backend uses.
+
+Lets benchmarks drive the real services and processor offline. Every call
+yields to the event loop (optionally after `latency_ms`, to model a network
+round-trip) and is counted in `MemoryDatabase.round_trips`, so a benchmark
+can report how many database round-trips a code path makes.
+
+Only what the backend needs is implemented: equality filters plus $in, $ne,
+$exists and range operators; $set/$unset/$inc/$push(+$each)/$min/$max/
+$setOnInsert updates; find/sort/skip/limit/batch_size cursors; bulk_write with
+InsertOne/ReplaceOne/UpdateOne; find_one_and_update. Indexes are accepted and
+ignored.
+"""
+
+import asyncio
+import copy
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import InsertOne, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+_MISSING = object()
+
+
+def _get(doc: Dict[str, Any], path: str):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _match_condition(value, condition) -> bool:
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        for op, operand in condition.items():
+            if op == "$in":
+                if value is _MISSING or value not in operand:
+                    return False
+            elif op == "$nin":
+                if value is not _MISSING and value in operand:
+                    return False
+            elif op == "$ne":
+                if value is not _MISSING and value == operand:
+                    return False
+            elif op == "$exists":
+                if (value is not _MISSING) != bool(operand):
+                    return False
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is _MISSING or value is None:
+                    return False
+                if op == "$gt" and not value > operand:
+                    return False
+                if op == "$gte" and not value >= operand:
+                    return False
+                if op == "$lt" and not value < operand:
+                    return False
+                if op == "$lte" and not value <= operand:
+                    return False
+            else:
+                raise NotImplementedError(f"query operator {op}")
+        return True
+    if isinstance(value, list) and not isinstance(condition, list):
+        return condition in value
+    return value is not _MISSING and value == condition
+
+
+def matches(doc: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    for key, condition in (filter or {}).items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif not _match_condition(_get(doc, key), condition):
+            return False
+    return True
+
+
+def _set_path(doc: Dict[str, Any], path: str, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[last] = value
+
+
+def apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool):
+    for op, fields in update.items():
+        for path, value in fields.items():
+            current = _get(doc, path)
+            if op == "$set":
+                _set_path(doc, path, copy.deepcopy(value))
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set_path(doc, path, copy.deepcopy(value))
+            elif op == "$unset":
+                *parents, last = path.split(".")
+                target = doc
+                for part in parents:
+                    target = target.get(part, {})
+                target.pop(last, None)
+            elif op == "$inc":
+                _set_path(doc, path, (0 if current is _MISSING else current) + value)
+            elif op == "$push":
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                _set_path(doc, path, ([] if current is _MISSING else current) + copy.deepcopy(items))
+            elif op == "$min":
+                _set_path(doc, path, value if current is _MISSING or value < current else current)
+            elif op == "$max":
+                _set_path(doc, path, value if current is _MISSING or value > current else current)
+            else:
+                raise NotImplementedError(f"update operator {op}")
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]):
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    included = [key for key, flag in projection.items() if flag and key != "_id"]
+    if included:
+        projected = {key: doc[key] for key in included if key in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            projected["_id"] = doc["_id"]
+        return projected
+    for key, flag in projection.items():
+        if not flag:
+            doc.pop(key, None)
+    return doc
+
+
+class MemoryCursor:
+    def __init__(self, collection: "MemoryCollection", filter, projection):
+        self._collection = collection
+        self._filter = filter
+        self._projection = projection
+        self._sort: List[tuple] = []
+        self._skip = 0
+        self._limit = 0
+        self._results = None
+
+    def sort(self, key, direction=1):
+        self._sort = list(key) if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def batch_size(self, count: int):
+        # Everything is in memory; kept for API compatibility
+        return self
+
+    async def _load(self):
+        await self._collection.database._round_trip("find")
+        docs = [doc for doc in self._collection.docs if matches(doc, self._filter)]
+        for key, direction in reversed(self._sort):
+            present = [doc for doc in docs if _get(doc, key) is not _MISSING]
+            absent = [doc for doc in docs if _get(doc, key) is _MISSING]
+            present.sort(key=lambda doc: _get(doc, key), reverse=direction == -1)
+            # Missing fields sort first ascending, like MongoDB
+            docs = absent + present if direction == 1 else present + absent
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(doc, self._projection) for doc in docs]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._results is None:
+            self._results = await self._load()
+        if not self._results:
+            raise StopAsyncIteration
+        return self._results.pop(0)
+
+    async def to_list(self, length=None):
+        results = await self._load()
+        return results if length is None else results[:length]
+
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.docs: List[Dict[str, Any]] = []
+
+    def _find(self, filter):
+        for doc in self.docs:
+            if matches(doc, filter):
+                return doc
+        return None
+
+    def _insert(self, document: Dict[str, Any]):
+        document.setdefault("_id", ObjectId())
+        if any(doc["_id"] == document["_id"] for doc in self.docs):
+            raise ValueError(f"duplicate _id {document['_id']}")
+        self.docs.append(copy.deepcopy(document))
+        return document["_id"]
+
+    def _upsert_doc(self, filter: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: copy.deepcopy(value) for key, value in (filter or {}).items() if not key.startswith("$") and not isinstance(value, dict)}
+
+    def _update(self, filter, update, upsert: bool, many: bool = False):
+        matched = [doc for doc in self.docs if matches(doc, filter)]
+        if not many:
+            matched = matched[:1]
+        for doc in matched:
+            apply_update(doc, update, inserting=False)
+        if matched or not upsert:
+            return len(matched), None
+        doc = self._upsert_doc(filter)
+        apply_update(doc, update, inserting=True)
+        return 0, self._insert(doc)
+
+    def _replace(self, filter, replacement, upsert: bool):
+        doc = self._find(filter)
+        if doc is not None:
+            _id = doc["_id"]
+            doc.clear()
+            doc.update(copy.deepcopy(replacement))
+            doc["_id"] = _id
+            return 1, None
+        if not upsert:
+            return 0, None
+        new_doc = {**self._upsert_doc(filter), **copy.deepcopy(replacement)}
+        return 0, self._insert(new_doc)
+
+    async def find_one(self, filter=None, projection=None, sort=None):
+        await self.database._round_trip("find_one")
+        if sort:
+            docs = await MemoryCursor(self, filter, projection).sort(sort).limit(1)._load()
+            return docs[0] if docs else None
+        doc = self._find(filter)
+        return None if doc is None else _project(doc, projection)
+
+    def find(self, filter=None, projection=None):
+        return MemoryCursor(self, filter, projection)
+
+    async def count_documents(self, filter=None):
+        await self.database._round_trip("count_documents")
+        return sum(1 for doc in self.docs if matches(doc, filter))
+
+    async def insert_one(self, document):
+        await self.database._round_trip("insert_one")
+        return InsertOneResult(self._insert(document), True)
+
+    async def insert_many(self, documents, ordered=True):
+        await self.database._round_trip("insert_many")
+        return InsertManyResult([self._insert(document) for document in documents], True)
+
+    async def update_one(self, filter, update, upsert=False):
+        await self.database._round_trip("update_one")
+        matched, upserted_id = self._update(filter, update, upsert)
+        return UpdateResult({"n": matched or int(upserted_id is not None), "nModified": matched, "upserted": upserted_id}, True)
+
+    async def update_many(self, filter, update, upsert=False):
+        await self.database._round_trip("update_many")
+        matched, upserted_id = self._update(filter, update, upsert, many=True)
+        return UpdateResult({"n": matched, "nModified": matched, "upserted": upserted_id}, True)
+
+    async def replace_one(self, filter, replacement, upsert=False):
+        await self.database._round_trip("replace_one")
+        matched, upserted_id = self._replace(filter, replacement, upsert)
+        return UpdateResult({"n": matched, "nModified": matched, "upserted": upserted_id}, True)
+
+    async def find_one_and_update(self, filter, update, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE, sort=None):
+        await self.database._round_trip("find_one_and_update")
+        doc = self._find(filter)
+        before = copy.deepcopy(doc)
+        if doc is not None:
+            apply_update(doc, update, inserting=False)
+        elif upsert:
+            doc = self._upsert_doc(filter)
+            apply_update(doc, update, inserting=True)
+            self._insert(doc)
+            doc = self._find({"_id": doc["_id"]})
+        else:
+            return None
+        result = doc if return_document == ReturnDocument.AFTER else before
+        return None if result is None else _project(result, projection)
+
+    async def delete_one(self, filter):
+        await self.database._round_trip("delete_one")
+        doc = self._find(filter)
+        if doc is not None:
+            self.docs.remove(doc)
+        return DeleteResult({"n": int(doc is not None)}, True)
+
+    async def delete_many(self, filter):
+        await self.database._round_trip("delete_many")
+        before = len(self.docs)
+        self.docs = [doc for doc in self.docs if not matches(doc, filter)]
+        return DeleteResult({"n": before - len(self.docs)}, True)
+
+    async def bulk_write(self, requests, ordered=True):
+        await self.database._round_trip("bulk_write")
+        counts = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nUpserted": 0, "nRemoved": 0, "upserted": [], "writeErrors": [], "writeConcernErrors": []}
+        for index, request in enumerate(requests):
+            if isinstance(request, InsertOne):
+                self._insert(request._doc)
+                counts["nInserted"] += 1
+                continue
+            if isinstance(request, ReplaceOne):
+                matched, upserted_id = self._replace(request._filter, request._doc, request._upsert)
+            elif isinstance(request, UpdateOne):
+                matched, upserted_id = self._update(request._filter, request._doc, request._upsert)
+            else:
+                raise NotImplementedError(type(request).__name__)
+            counts["nMatched"] += matched
+            counts["nModified"] += matched
+            if upserted_id is not None:
+                counts["nUpserted"] += 1
+                counts["upserted"].append({"index": index, "_id": upserted_id})
+        return BulkWriteResult(counts, True)
+
+    async def create_index(self, keys, **kwargs):
+        await self.database._round_trip("create_index")
+        return kwargs.get("name", str(keys))
+
+    def aggregate(self, pipeline):
+        raise NotImplementedError("aggregate")
+
+
+class MemoryDatabase:
+    """Attribute and item access return collections, like a Motor database."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.round_trips: Counter = Counter()
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    async def _round_trip(self, op: str):
+        self.round_trips[op] += 1
+        await asyncio.sleep(self.latency)
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def create_collection(self, name: str, **kwargs):
+        await self._round_trip("create_collection")
+        return self[name]
+
+    async def command(self, *args, **kwargs):
+        await self._round_trip("command")
+        return {"ok": 1}
+
+    async def list_collection_names(self):
+        await self._round_trip("list_collection_names")
+        return list(self._collections)
@@ -0,0 +1,278 @@
+"""
+WebSocket fan-out load test for the /ws broadcast.
+
+Opens N dashboard connections against one backend and records, per client,
+tick arrival latency, missed frames (gaps in delta-frame `seq`) and reconnects,
+while sampling the server's CPU and RSS from /proc. With --spawn it starts a
+local uvicorn in CSV mock mode itself, so no MongoDB or monitors are needed.
+
+    python benchmarks/ws_loadtest.py --spawn --clients 200 --slow 20 --reconnecting 20 \\
+        --duration 60 --json ws_report.json
+
+Client profiles:
+    normal        reads every frame as soon as it arrives
+    slow          sleeps --slow-delay seconds after each frame (slow dashboard / bad link)
+    reconnecting  drops and re-opens its connection every --reconnect-every seconds
+
+Latency is measured against the `ts` the server stamps on delta frames, so it is
+only reported for --protocol delta (the default) and assumes client and server
+share a clock, which holds for a local run.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+import websockets
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class ClientStats:
+    def __init__(self, client_id: int, profile: str):
+        self.client_id = client_id
+        self.profile = profile
+        self.frames = 0
+        self.missed = 0
+        self.keyframes = 0
+        self.reconnects = 0
+        self.errors = 0
+        self.latencies = []
+        self.bytes = 0
+
+
+async def run_client(url: str, stats: ClientStats, stop_at: float, args):
+    """Keep one dashboard connected until `stop_at`, following its profile."""
+    while time.monotonic() < stop_at:
+        connection_deadline = stop_at
+        if stats.profile == "reconnecting":
+            connection_deadline = min(stop_at, time.monotonic() + args.reconnect_every)
+
+        last_seq = None
+        try:
+            async with websockets.connect(url, max_queue=args.max_queue) as ws:
+                while True:
+                    remaining = connection_deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        message = await asyncio.wait_for(ws.recv(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+
+                    arrived = time.time()
+                    stats.frames += 1
+                    stats.bytes += len(message)
+                    if args.protocol == "delta":
+                        frame = json.loads(message)
+                        seq = frame["seq"]
+                        if last_seq is not None:
+                            if seq > last_seq + 1:
+                                stats.missed += seq - last_seq - 1
+                            # the connect-time keyframe is a snapshot, not a tick
+                            stats.latencies.append(arrived - datetime.fromisoformat(frame["ts"]).timestamp())
+                        if frame["type"] == "keyframe":
+                            stats.keyframes += 1
+                        last_seq = seq
+                    else:
+                        json.loads(message)
+
+                    if stats.profile == "slow":
+                        await asyncio.sleep(args.slow_delay)
+        except Exception:
+            stats.errors += 1
+            await asyncio.sleep(0.5)
+
+        if time.monotonic() < stop_at:
+            stats.reconnects += 1
+
+
+class ServerSampler:
+    """Samples CPU% and RSS of a process from /proc (Linux only)."""
+
+    def __init__(self, pid: int, interval: float = 1.0):
+        self.pid = pid
+        self.interval = interval
+        self.cpu_percent = []
+        self.rss_mb = []
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+
+    def _cpu_seconds(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # utime and stime are fields 14 and 15 of /proc/<pid>/stat
+        return (int(fields[11]) + int(fields[12])) / self.clock_ticks
+
+    def _rss_mb(self):
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return None
+
+    async def run(self, stop_at: float):
+        try:
+            last_cpu, last_wall = self._cpu_seconds(), time.monotonic()
+            while time.monotonic() < stop_at:
+                await asyncio.sleep(self.interval)
+                cpu, wall = self._cpu_seconds(), time.monotonic()
+                self.cpu_percent.append(100 * (cpu - last_cpu) / (wall - last_wall))
+                self.rss_mb.append(self._rss_mb())
+                last_cpu, last_wall = cpu, wall
+        except (FileNotFoundError, ProcessLookupError, ValueError):
+            print(f"[WARN] Cannot sample server process {self.pid}; CPU/RSS omitted")
+
+    def report(self):
+        if not self.cpu_percent:
+            return None
+        return {
+            "pid": self.pid,
+            "cpu_percent_mean": round(statistics.mean(self.cpu_percent), 1),
+            "cpu_percent_max": round(max(self.cpu_percent), 1),
+            "rss_mb_start": round(self.rss_mb[0], 1),
+            "rss_mb_max": round(max(self.rss_mb), 1),
+        }
+
+
+def spawn_server(port: int, tick: float):
+    env = dict(os.environ, USE_REAL_MONITOR_DATA="false", BROADCAST_INTERVAL_SECONDS=str(tick))
+    env.pop("MONGO_URI", None)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("uvicorn did not become healthy within 60s")
+
+
+def aggregate(clients, duration):
+    profiles = {}
+    for profile in ("normal", "slow", "reconnecting"):
+        group = [c for c in clients if c.profile == profile]
+        if not group:
+            continue
+        latencies = [l for c in group for l in c.latencies]
+        profiles[profile] = {
+            "clients": len(group),
+            "frames": sum(c.frames for c in group),
+            "frames_per_client_per_s": round(sum(c.frames for c in group) / len(group) / duration, 3),
+            "missed_frames": sum(c.missed for c in group),
+            "keyframes": sum(c.keyframes for c in group),
+            "reconnects": sum(c.reconnects for c in group),
+            "errors": sum(c.errors for c in group),
+            "bytes": sum(c.bytes for c in group),
+            "latency_ms_p50": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+            "latency_ms_p95": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+            "latency_ms_p99": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+            "latency_ms_max": round(max(latencies) * 1000, 2) if latencies else None,
+        }
+    return profiles
+
+
+async def main(args):
+    server = None
+    server_pid = args.server_pid
+    url = args.url
+    if args.spawn:
+        server = spawn_server(args.port, args.tick)
+        server_pid = server.pid
+        url = f"ws://127.0.0.1:{args.port}/ws"
+    if args.protocol == "delta":
+        url += "?mode=delta"
+
+    profiles = ["normal"] * (args.clients - args.slow - args.reconnecting) + ["slow"] * args.slow + ["reconnecting"] * args.reconnecting
+    clients = [ClientStats(i, profile) for i, profile in enumerate(profiles)]
+
+    try:
+        started = time.monotonic()
+        stop_at = started + args.duration
+        tasks = []
+        for stats in clients:
+            tasks.append(asyncio.create_task(run_client(url, stats, stop_at, args)))
+            # ramp up so the connect storm isn't what we measure
+            await asyncio.sleep(args.ramp / max(1, len(clients)))
+
+        sampler = ServerSampler(server_pid) if server_pid else None
+        if sampler:
+            tasks.append(asyncio.create_task(sampler.run(stop_at)))
+        await asyncio.gather(*tasks)
+        duration = time.monotonic() - started
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    return {
+        "started_at": datetime.now().isoformat(),
+        "url": url,
+        "protocol": args.protocol,
+        "duration_s": round(duration, 1),
+        "clients": args.clients,
+        "profiles": aggregate(clients, duration),
+        "server": sampler.report() if sampler else None,
+        "per_client": [
+            {
+                "client_id": c.client_id,
+                "profile": c.profile,
+                "frames": c.frames,
+                "missed": c.missed,
+                "reconnects": c.reconnects,
+                "errors": c.errors,
+                "latency_ms_p95": round(percentile(c.latencies, 95) * 1000, 2) if c.latencies else None,
+            }
+            for c in clients
+        ] if args.per_client else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws", help="WebSocket URL when not using --spawn")
+    parser.add_argument("--server-pid", type=int, help="pid of an already running server to sample")
+    parser.add_argument("--spawn", action="store_true", help="start a local uvicorn in CSV mode")
+    parser.add_argument("--port", type=int, default=8765, help="port for --spawn")
+    parser.add_argument("--tick", type=float, default=2.0, help="BROADCAST_INTERVAL_SECONDS for --spawn")
+    parser.add_argument("--protocol", choices=["delta", "full"], default="delta")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--slow", type=int, default=0, help="how many clients use the slow profile")
+    parser.add_argument("--slow-delay", type=float, default=5.0)
+    parser.add_argument("--reconnecting", type=int, default=0, help="how many clients use the reconnecting profile")
+    parser.add_argument("--reconnect-every", type=float, default=10.0)
+    parser.add_argument("--max-queue", type=int, default=16, help="client-side frame buffer before TCP backpressure")
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which to open connections")
+    parser.add_argument("--per-client", action="store_true", help="include per-client rows in the report")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    if args.slow + args.reconnecting > args.clients:
+        parser.error("--slow + --reconnecting cannot exceed --clients")
+
+    report = asyncio.run(main(args))
+    print(json.dumps({k: v for k, v in report.items() if k != "per_client"}, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
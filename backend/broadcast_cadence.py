@@ -0,0 +1,90 @@
+"""Acuity-driven update cadence for the dashboard broadcast loop."""
+import time
+from typing import Dict, Any, List, Optional, Iterable
+
+
+class AdaptiveCadence:
+    """Decides which patient objects go out on each broadcast tick.
+
+    Acute patients (any active alarm, or an AI risk score above the risk
+    threshold) are sent on every tick. Stable patients are only re-sent once
+    `stable_interval` seconds have passed since their last push, or earlier if
+    one of their vitals moves by more than its deadband.
+    """
+
+    def __init__(self, stable_interval: float, deadbands: Dict[str, float], risk_threshold: float):
+        self.stable_interval = stable_interval
+        self.deadbands = deadbands
+        self.risk_threshold = risk_threshold
+        # patient_id -> {"at": monotonic time, "values": {vital: float}, "acute": bool}
+        self._last_sent: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"ticks": 0, "sent": 0, "suppressed": 0}
+
+    def is_acute(self, patient_obj: Dict[str, Any]) -> bool:
+        """A patient is acute if they have an alarm or a high AI risk score."""
+        if patient_obj.get("alarms"):
+            return True
+        ai_prediction = patient_obj.get("ai_prediction") or {}
+        if ai_prediction.get("is_at_risk"):
+            return True
+        risk_score = ai_prediction.get("risk_score_percent")
+        return isinstance(risk_score, (int, float)) and risk_score > self.risk_threshold
+
+    def _vital_values(self, patient_obj: Dict[str, Any]) -> Dict[str, Optional[float]]:
+        values = {}
+        for name, vital in (patient_obj.get("vitals") or {}).items():
+            try:
+                values[name] = float(vital.get("value"))
+            except (TypeError, ValueError, AttributeError):
+                values[name] = None
+        return values
+
+    def _moved(self, previous: Dict[str, Optional[float]], current: Dict[str, Optional[float]]) -> bool:
+        """True if any vital appeared, disappeared or moved past its deadband."""
+        for name in previous.keys() | current.keys():
+            old, new = previous.get(name), current.get(name)
+            if old is None or new is None:
+                if old is not new:
+                    return True
+                continue
+            if abs(new - old) > self.deadbands.get(name, 0.0):
+                return True
+        return False
+
+    def select(self, patient_objs: Iterable[Dict[str, Any]], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Return the subset of `patient_objs` that is due on this tick."""
+        if now is None:
+            now = time.monotonic()
+
+        self.stats["ticks"] += 1
+        selected = []
+        for patient_obj in patient_objs:
+            patient_id = patient_obj["patient_id"]
+            values = self._vital_values(patient_obj)
+            acute = self.is_acute(patient_obj)
+            last = self._last_sent.get(patient_id)
+
+            due = (
+                last is None
+                or acute
+                # push once more on the way out of acute so the UI clears the alarm
+                or last["acute"]
+                or now - last["at"] >= self.stable_interval
+                or self._moved(last["values"], values)
+            )
+
+            if due:
+                self._last_sent[patient_id] = {"at": now, "values": values, "acute": acute}
+                selected.append(patient_obj)
+                self.stats["sent"] += 1
+            else:
+                self.stats["suppressed"] += 1
+
+        return selected
+
+    def prune(self, active_patient_ids: Iterable[str]):
+        """Drop state for patients that are no longer monitored."""
+        active = set(active_patient_ids)
+        for patient_id in list(self._last_sent):
+            if patient_id not in active:
+                del self._last_sent[patient_id]
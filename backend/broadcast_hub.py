@@ -0,0 +1,99 @@
+"""Fan-out of encoded broadcast frames to WebSocket and SSE subscribers.
+
+Each tick is JSON-encoded exactly once into a `Frame`; subscribers only ever
+receive references to those strings. Every subscriber has a bounded queue, so a
+slow dashboard never holds up the broadcast loop: when its queue overflows the
+backlog is dropped and it is told to resync from a fresh snapshot instead.
+"""
+import asyncio
+from collections import deque
+from typing import Deque, List, Optional
+
+PROTOCOLS = ("full", "delta")
+
+# Queued in place of frames when a subscriber fell too far behind
+RESYNC = object()
+
+
+class Frame:
+    """One broadcast tick, encoded once per protocol."""
+
+    __slots__ = ("seq", "full", "delta", "_sse")
+
+    def __init__(self, seq: int, full: Optional[str], delta: str):
+        self.seq = seq
+        self.full = full  # None when no patient was due this tick
+        self.delta = delta
+        self._sse = {}
+
+    def payload(self, protocol: str) -> Optional[str]:
+        return self.delta if protocol == "delta" else self.full
+
+    def sse(self, protocol: str) -> Optional[str]:
+        """The Server-Sent Events wire form, built on first use and then shared."""
+        if protocol not in self._sse:
+            payload = self.payload(protocol)
+            self._sse[protocol] = None if payload is None else sse_event(payload, self.seq)
+        return self._sse[protocol]
+
+
+def sse_event(data: str, event_id: int) -> str:
+    return f"id: {event_id}\ndata: {data}\n\n"
+
+
+class Subscriber:
+    def __init__(self, protocol: str, queue_size: int):
+        self.protocol = protocol
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def offer(self, frame: Frame) -> bool:
+        """Queue a frame without blocking; on overflow replace the backlog with RESYNC."""
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            return False
+
+
+class BroadcastHub:
+    """Manages all WebSocket and SSE subscribers of the patient broadcast."""
+
+    def __init__(self, history_size: int, queue_size: int):
+        self.subscribers: List[Subscriber] = []
+        self.history: Deque[Frame] = deque(maxlen=history_size)
+        self.queue_size = queue_size
+        self.stats = {"frames": 0, "resyncs": 0}
+
+    def subscribe(self, protocol: str = "full") -> Subscriber:
+        subscriber = Subscriber(protocol, self.queue_size)
+        self.subscribers.append(subscriber)
+        print(f"Client connected ({protocol}). Total clients: {len(self.subscribers)}")
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        if subscriber in self.subscribers:
+            self.subscribers.remove(subscriber)
+        print(f"Client disconnected. Total clients: {len(self.subscribers)}")
+
+    def publish(self, frame: Frame):
+        """Hand a frame to every subscriber; never awaits."""
+        self.history.append(frame)
+        self.stats["frames"] += 1
+        for subscriber in self.subscribers:
+            if not subscriber.offer(frame):
+                self.stats["resyncs"] += 1
+
+    def frames_since(self, seq: int) -> Optional[List[Frame]]:
+        """Frames after `seq`, or None if `seq` is not covered by the history.
+
+        A `seq` ahead of the newest frame means the server restarted since the
+        client's last event, so it needs a snapshot as well.
+        """
+        if not self.history:
+            return [] if seq == 0 else None
+        if seq < self.history[0].seq - 1 or seq > self.history[-1].seq:
+            return None
+        return [frame for frame in self.history if frame.seq > seq]
@@ -0,0 +1,133 @@
+"""Atomic sequence counters for the human-readable IDs.
+
+Patient numbers (IRN-00001) and hospital IDs (HOSP001) come from a
+`counters` collection holding one `{_id: name, value: n}` document per
+sequence. A single `find_one_and_update` with `$inc` hands out the next value,
+so an ID costs one indexed round-trip however many records exist, and
+concurrent creates can never get the same number. `allocate_block` reserves a
+contiguous range in one round-trip for bulk imports.
+
+Counters start from the existing data: `seed_counters` finds the highest
+number already in use and raises the counter to it with `$max`, so it is safe
+to run repeatedly and never moves a counter backwards. It runs at startup for
+counters that don't exist yet, and again whenever an ID is requested from a
+counter that is still missing. Unique indexes on patients.id and hospitals.id
+(db_indexes.py) reject a duplicate if one slips through anyway. Run it by hand
+after importing records with their own IDs:
+
+    python counters.py
+"""
+import asyncio
+from typing import Dict
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+COUNTERS_COLLECTION = "counters"
+
+PATIENT_NUMBER = "patient_number"
+HOSPITAL_NUMBER = "hospital_number"
+
+# Counter name -> (collection, ID prefix) the existing numbers are read from
+SEQUENCES = {
+    PATIENT_NUMBER: ("patients", "IRN-"),
+    HOSPITAL_NUMBER: ("hospitals", "HOSP"),
+}
+
+
+def format_patient_id(number: int) -> str:
+    return f"IRN-{number:05d}"
+
+
+def format_hospital_id(number: int) -> str:
+    return f"HOSP{number:03d}"
+
+
+async def _increment(db, name: str, by: int) -> int:
+    """Add `by` to counter `name` and return the new value.
+
+    A missing counter is seeded from the highest ID in use first, never
+    started from 0, so IDs already handed out (or imported) are not reused
+    when startup seeding failed or ran before the data was there.
+    """
+    counters = db[COUNTERS_COLLECTION]
+    counter = await counters.find_one_and_update(
+        {"_id": name}, {"$inc": {"value": by}}, return_document=ReturnDocument.AFTER
+    )
+    if counter is None:
+        await seed_counter(db, name)
+        counter = await counters.find_one_and_update(
+            {"_id": name}, {"$inc": {"value": by}}, return_document=ReturnDocument.AFTER
+        )
+    return counter["value"]
+
+
+async def next_value(db, name: str) -> int:
+    """Next number of sequence `name`, starting after the highest in use."""
+    return await _increment(db, name, 1)
+
+
+async def allocate_block(db, name: str, size: int) -> range:
+    """Reserve `size` consecutive numbers of sequence `name` in one round-trip."""
+    if size < 1:
+        raise ValueError("Block size must be at least 1")
+    value = await _increment(db, name, size)
+    return range(value - size + 1, value + 1)
+
+
+async def highest_in_use(db, name: str) -> int:
+    """Highest number already used by the IDs of sequence `name` (0 if none)."""
+    collection_name, prefix = SEQUENCES[name]
+    pipeline = [
+        {"$match": {"id": {"$regex": f"^{prefix}[0-9]+$"}}},
+        # The regex guarantees digits after the prefix; 18 of them still fit in a long
+        {"$group": {"_id": None, "highest": {"$max": {"$toLong": {"$substr": ["$id", len(prefix), 18]}}}}},
+    ]
+    result = await db[collection_name].aggregate(pipeline).to_list(length=1)
+    return result[0]["highest"] if result and result[0]["highest"] is not None else 0
+
+
+async def seed_counter(db, name: str) -> int:
+    """Raise counter `name` to the highest number in use; returns the counter value."""
+    highest = await highest_in_use(db, name)
+    try:
+        counter = await db[COUNTERS_COLLECTION].find_one_and_update(
+            {"_id": name},
+            {"$max": {"value": highest}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Another instance created the counter at the same time; $max again on the existing one
+        counter = await db[COUNTERS_COLLECTION].find_one_and_update(
+            {"_id": name},
+            {"$max": {"value": highest}},
+            return_document=ReturnDocument.AFTER,
+        )
+    return counter["value"]
+
+
+async def seed_counters(db, only_missing: bool = False) -> Dict[str, int]:
+    """Raise each counter to the highest number in use; returns name -> counter value."""
+    seeded = {}
+    for name in SEQUENCES:
+        if only_missing and await db[COUNTERS_COLLECTION].find_one({"_id": name}) is not None:
+            continue
+        seeded[name] = await seed_counter(db, name)
+    return seeded
+
+
+async def main():
+    import mongo_config
+
+    await mongo_config.connect_to_mongo()
+    try:
+        seeded = await seed_counters(mongo_config.get_database())
+    finally:
+        await mongo_config.close_mongo_connection()
+    for name, value in seeded.items():
+        print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,181 @@
+"""MongoDB indexes for the service-layer collections, and a COLLSCAN report.
+
+`INDEXES` declares, per collection, the indexes the user/patient/hospital/
+department/appointment services and the device lookups rely on.
+`ensure_indexes` creates them at startup; create_index is a no-op for an index
+that already exists with the same spec, so it is safe to run on every boot.
+Indexes whose queries always filter on `is_active: true` are partial, so
+inactive documents don't take up index space.
+
+The ingest collections (vitals_history, unassigned_device_*) manage their own
+indexes next to the code that writes them (see vitals_history.py and
+unassigned_devices.py).
+
+`REPORT_QUERIES` mirrors the services' queries; `collscan_report` explains each
+one and flags those whose winning plan still scans the whole collection:
+
+    python db_indexes.py            # report only
+    python db_indexes.py --ensure   # create indexes first, then report
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+ACTIVE = {"partialFilterExpression": {"is_active": True}}
+# Generated IDs are unique; documents without one (e.g. quick-admit patients) are left out
+HAS_ID = {"unique": True, "partialFilterExpression": {"id": {"$type": "string"}}}
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("firebase_uid", ASCENDING)], name="firebase_uid"),
+        IndexModel([("email", ASCENDING)], name="email"),
+        # get_users_by_hospital_and_role, get_hospital_staff, get_hospital_users; _id is the page order
+        IndexModel([("hospital_id", ASCENDING), ("role", ASCENDING), ("_id", ASCENDING)], name="hospital_role_active", **ACTIVE),
+        IndexModel([("hospital_id", ASCENDING), ("_id", ASCENDING)], name="hospital_active", **ACTIVE),
+        IndexModel([("department_id", ASCENDING), ("_id", ASCENDING)], name="department_active", **ACTIVE),
+    ],
+    "patients": [
+        # get_patients_by_hospital pages active first; also serves get_hospital_patients
+        IndexModel([("hospital_id", ASCENDING), ("is_active", DESCENDING), ("_id", ASCENDING)], name="hospital_active_first"),
+        IndexModel([("department_id", ASCENDING), ("_id", ASCENDING)], name="department_active", **ACTIVE),
+        # IRN- patient numbers (counters.py)
+        IndexModel([("id", ASCENDING)], name="patient_number", **HAS_ID),
+    ],
+    "hospitals": [
+        IndexModel([("id", ASCENDING)], name="hospital_id", **HAS_ID),
+        IndexModel([("admin_uid", ASCENDING)], name="admin_uid"),
+    ],
+    "departments": [
+        IndexModel([("hospital_id", ASCENDING), ("_id", ASCENDING)], name="hospital"),
+    ],
+    "appointments": [
+        # Listings and date-range queries, paged by (appointment_date, _id)
+        IndexModel([("hospital_id", ASCENDING), ("appointment_date", ASCENDING), ("_id", ASCENDING)], name="hospital_date"),
+        IndexModel([("patient_id", ASCENDING), ("appointment_date", ASCENDING), ("_id", ASCENDING)], name="patient_date"),
+        IndexModel([("user_id", ASCENDING), ("appointment_date", ASCENDING), ("_id", ASCENDING)], name="user_date"),
+    ],
+    "device_assignments": [
+        # Routing lookups by device, assignment checks by patient, admin listing newest first
+        IndexModel([("device_id", ASCENDING)], name="device_active", **ACTIVE),
+        IndexModel([("patient_id", ASCENDING)], name="patient_active", **ACTIVE),
+        IndexModel([("created_at", DESCENDING)], name="created_active", **ACTIVE),
+    ],
+    "device_mappings": [
+        IndexModel([("device_type", ASCENDING)], name="device_type_active", **ACTIVE),
+    ],
+    "realtime_vitals": [
+        # One document per patient, upserted by the realtime writer
+        IndexModel([("patient_id", ASCENDING)], name="patient", unique=True),
+    ],
+}
+
+# (label, collection, filter, sort) shaped like the services' queries, in their list order
+REPORT_QUERIES = [
+    ("user_service.get_user_by_firebase_uid", "users", {"firebase_uid": "uid"}, None),
+    ("user_service.get_user_by_email", "users", {"email": "user@example.com"}, None),
+    ("user_service.get_users_by_hospital_and_role", "users", {"hospital_id": "HOSP", "role": "doctor", "is_active": True}, [("_id", ASCENDING)]),
+    ("user_service.get_hospital_staff", "users", {"hospital_id": "HOSP", "role": {"$in": ["doctor", "nurse"]}, "is_active": True}, [("_id", ASCENDING)]),
+    ("hospital_service.get_hospital_users", "users", {"hospital_id": "HOSP", "is_active": True}, [("_id", ASCENDING)]),
+    ("department_service.get_department_users", "users", {"department_id": "dept", "is_active": True}, [("_id", ASCENDING)]),
+    ("patient_service.get_patients_by_hospital", "patients", {"hospital_id": "HOSP"}, [("is_active", DESCENDING), ("_id", ASCENDING)]),
+    ("hospital_service.get_hospital_patients", "patients", {"hospital_id": "HOSP", "is_active": True}, [("_id", ASCENDING)]),
+    ("patient_service.get_patients_by_department", "patients", {"department_id": "dept", "is_active": True}, [("_id", ASCENDING)]),
+    ("counters.seed_counters (IRN- numbers)", "patients", {"id": {"$regex": "^IRN-"}}, None),
+    ("hospital_service.get_hospital_by_id", "hospitals", {"id": "HOSP"}, None),
+    ("hospital_service.get_hospital_by_admin_uid", "hospitals", {"admin_uid": "uid"}, None),
+    ("department_service.get_departments_by_hospital", "departments", {"hospital_id": "HOSP"}, [("_id", ASCENDING)]),
+    ("appointment_service.get_appointments_by_hospital", "appointments", {"hospital_id": "HOSP"}, [("appointment_date", ASCENDING), ("_id", ASCENDING)]),
+    ("appointment_service.get_appointments_by_date_range", "appointments",
+     {"hospital_id": "HOSP", "appointment_date": {"$gte": datetime(2024, 1, 1), "$lte": datetime(2024, 2, 1)}}, [("appointment_date", ASCENDING), ("_id", ASCENDING)]),
+    ("appointment_service.get_appointments_by_patient", "appointments", {"patient_id": "patient"}, [("appointment_date", ASCENDING), ("_id", ASCENDING)]),
+    ("appointment_service.get_appointments_by_user", "appointments", {"user_id": "user"}, [("appointment_date", ASCENDING), ("_id", ASCENDING)]),
+    ("monitor_processor.load_device_route", "device_assignments", {"device_id": "device", "is_active": True}, None),
+    ("admin recent assignments", "device_assignments", {"is_active": True}, [("created_at", DESCENDING)]),
+    ("monitor_processor.get_latest_patient_vitals", "realtime_vitals", {"patient_id": "patient"}, None),
+]
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create every declared index; returns collection -> index names created or confirmed.
+
+    Each index is created on its own, so one that conflicts with an existing
+    index (same name or keys, different options) or with the data (a unique
+    index over duplicates) is reported and skipped without blocking the others.
+    """
+    ensured: Dict[str, List[str]] = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        for index in indexes:
+            spec = index.document
+            options = {key: value for key, value in spec.items() if key != "key"}
+            try:
+                await collection.create_index(list(spec["key"].items()), **options)
+                ensured.setdefault(collection_name, []).append(spec["name"])
+            except OperationFailure as e:
+                print(f"⚠️ Index {collection_name}.{spec['name']} not created: {e}")
+    return ensured
+
+
+def plan_stages(plan: Any) -> List[str]:
+    """All stage names in an explain plan tree."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(plan_stages(value))
+    return stages
+
+
+async def collscan_report(db) -> List[Dict[str, Any]]:
+    """Explain each report query; `collscan` is True when the winning plan scans the collection."""
+    report = []
+    for label, collection_name, filter, sort in REPORT_QUERIES:
+        cursor = db[collection_name].find(filter)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        report.append({
+            "query": label,
+            "collection": collection_name,
+            "collscan": "COLLSCAN" in stages,
+            "stages": stages,
+        })
+    return report
+
+
+async def main(ensure: bool):
+    import mongo_config
+
+    await mongo_config.connect_to_mongo()
+    db = mongo_config.get_database()
+    try:
+        if ensure:
+            for collection_name, names in (await ensure_indexes(db)).items():
+                print(f"{collection_name}: {', '.join(names)}")
+        report = await collscan_report(db)
+    finally:
+        await mongo_config.close_mongo_connection()
+
+    for entry in report:
+        flag = "COLLSCAN" if entry["collscan"] else "ok"
+        print(f"{flag:<9}{entry['query']:<55}{' > '.join(entry['stages'])}")
+    scans = sum(entry["collscan"] for entry in report)
+    print(f"{scans} of {len(report)} queries scan their collection")
+    return scans
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Report service queries that fall back to a collection scan")
+    parser.add_argument("--ensure", action="store_true", help="create the declared indexes before reporting")
+    args = parser.parse_args()
+    raise SystemExit(1 if asyncio.run(main(args.ensure)) else 0)
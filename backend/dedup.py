@@ -0,0 +1,58 @@
+"""Duplicate-reading suppression for ingest.
+
+Gateways retry on timeout, so the same (device_id, timestamp) reading can
+arrive several times. `DedupIndex` remembers recently seen keys in two
+generations of sets: new keys go into the current generation, lookups check
+both, and every `window_seconds` the older generation is dropped. A key is
+therefore remembered for between one and two windows.
+
+Each generation holds at most `max_entries` keys; a flood rotates early
+instead of growing, so memory stays flat however many devices are sending
+(at the cost of a shorter window while the flood lasts).
+
+The processor records a key when a reading arrives, so retries racing the
+original are caught, and `forget`s it again if the reading is not accepted,
+so a retry of a reading that failed is processed rather than dropped.
+"""
+import time
+from typing import Hashable, Set
+
+
+class DedupIndex:
+    def __init__(self, window_seconds: float, max_entries: int):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._current: Set[Hashable] = set()
+        self._previous: Set[Hashable] = set()
+        self._rotated_at = time.monotonic()
+        self.stats = {"checked": 0, "duplicates": 0, "rotations": 0, "early_rotations": 0}
+
+    def seen(self, key: Hashable) -> bool:
+        """True if `key` was seen within the window; otherwise record it and return False."""
+        self.stats["checked"] += 1
+        now = time.monotonic()
+        if now - self._rotated_at >= self.window_seconds:
+            self._rotate(now)
+        elif len(self._current) >= self.max_entries:
+            self.stats["early_rotations"] += 1
+            self._rotate(now)
+
+        if key in self._current or key in self._previous:
+            self.stats["duplicates"] += 1
+            return True
+        self._current.add(key)
+        return False
+
+    def forget(self, key: Hashable):
+        """Stop treating `key` as seen, e.g. when the reading that recorded it failed."""
+        self._current.discard(key)
+        self._previous.discard(key)
+
+    def _rotate(self, now: float):
+        self._previous = self._current
+        self._current = set()
+        self._rotated_at = now
+        self.stats["rotations"] += 1
+
+    def __len__(self):
+        return len(self._current) + len(self._previous)
@@ -0,0 +1,131 @@
+"""Delta-encoded broadcast frames for the /ws?mode=delta protocol.
+
+Frame layout (one JSON object per message):
+
+    {"type": "keyframe", "seq": 12, "ts": "...", "patients": [<full patient objects>]}
+    {"type": "delta", "seq": 13, "ts": "...", "patients": [<changed fields only>], "removed": ["7"]}
+
+Delta patient entries always carry `patient_id`; `vitals` only lists the vitals
+that changed. Fields that disappeared are listed in the entry's
+`removed_fields`, as top-level keys or `vitals.<name>`, never sent as null:
+
+    {"patient_id": "7", "vitals": {"HR": {...}}, "removed_fields": ["vitals.SpO₂", "alarms"]}
+
+A delta is sent every tick (possibly with no patients) so clients
+can spot gaps in `seq` and wait for the next keyframe.
+"""
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Iterable
+
+
+def diff_patient(previous: Dict[str, Any], current: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return only the fields of `current` that differ from `previous`, or None."""
+    changes = {}
+    removed = []
+    for key in previous.keys() | current.keys():
+        if key == "patient_id":
+            continue
+        if key not in current:
+            removed.append(key)
+            continue
+        old, new = previous.get(key), current[key]
+        if key in previous and old == new:
+            continue
+        if key == "vitals" and isinstance(old, dict) and isinstance(new, dict):
+            changed = {name: value for name, value in new.items() if old.get(name) != value or name not in old}
+            if changed:
+                changes[key] = changed
+            removed.extend(f"vitals.{name}" for name in old.keys() - new.keys())
+        else:
+            changes[key] = new
+    if not changes and not removed:
+        return None
+    if removed:
+        changes["removed_fields"] = sorted(removed)
+    changes["patient_id"] = current["patient_id"]
+    return changes
+
+
+def apply_frame(state: Dict[str, Dict[str, Any]], frame: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Reference client: fold a keyframe or delta into a patient_id -> object map."""
+    if frame["type"] == "keyframe":
+        return {p["patient_id"]: p for p in frame["patients"]}
+
+    for change in frame["patients"]:
+        patient = dict(state.get(change["patient_id"], {}))
+        for key, value in change.items():
+            if key == "removed_fields":
+                continue
+            if key == "vitals" and isinstance(patient.get("vitals"), dict):
+                patient["vitals"] = {**patient["vitals"], **value}
+            else:
+                patient[key] = value
+        for field in change.get("removed_fields", []):
+            if field.startswith("vitals.") and isinstance(patient.get("vitals"), dict):
+                patient["vitals"] = {name: value for name, value in patient["vitals"].items() if name != field[len("vitals."):]}
+            else:
+                patient.pop(field, None)
+        state[change["patient_id"]] = patient
+    for patient_id in frame.get("removed", []):
+        state.pop(patient_id, None)
+    return state
+
+
+class DeltaEncoder:
+    """Tracks what delta clients have been sent and builds the next frame.
+
+    One encoder is shared by every delta client: each tick produces a single
+    frame, and clients that join late start from `keyframe()`.
+    """
+
+    def __init__(self, keyframe_interval: int):
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._frames_since_keyframe = 0
+
+    def _envelope(self, frame_type: str, patients: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "type": frame_type,
+            "seq": self.seq,
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "patients": patients,
+        }
+
+    def keyframe(self) -> Dict[str, Any]:
+        """Full state as of the current `seq`, for clients that just connected."""
+        return self._envelope("keyframe", list(self._state.values()))
+
+    def encode(self, patient_objs: Iterable[Dict[str, Any]], active_patient_ids: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Fold this tick's patients into the state and return the next frame.
+
+        `active_patient_ids` lists every patient still monitored; anyone else
+        is reported in `removed`. Omit it when the set of patients is fixed.
+        """
+        self.seq += 1
+
+        changes = []
+        for patient_obj in patient_objs:
+            patient_id = patient_obj["patient_id"]
+            previous = self._state.get(patient_id)
+            change = patient_obj if previous is None else diff_patient(previous, patient_obj)
+            self._state[patient_id] = patient_obj
+            if change is not None:
+                changes.append(change)
+
+        removed = []
+        if active_patient_ids is not None:
+            active = set(active_patient_ids)
+            removed = [patient_id for patient_id in self._state if patient_id not in active]
+            for patient_id in removed:
+                del self._state[patient_id]
+
+        self._frames_since_keyframe += 1
+        if self._frames_since_keyframe >= self.keyframe_interval:
+            self._frames_since_keyframe = 0
+            return self.keyframe()
+
+        frame = self._envelope("delta", changes)
+        if removed:
+            frame["removed"] = removed
+        return frame
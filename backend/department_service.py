@@ -1,19 +1,26 @@
-from motor.motor_asyncio import AsyncIOMotorCollection
-import mongo_config
 from models import Department, DepartmentCreate
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from bson import ObjectId
+from pagination import Page, PageRequest
+from repository import Repository
+from lookup_cache import LookupCache
 
-async def get_departments_collection() -> AsyncIOMotorCollection:
-    """Get departments collection"""
-    db = mongo_config.get_database()
-    return db.departments
+# List order; unique so it can be paged by keyset (indexed in db_indexes.py)
+DEPARTMENT_SORT = [("_id", 1)]
+
+department_repository = Repository("departments")
+# Whole (unpaged, unprojected) department list per hospital_id, invalidated by the writes below
+departments_cache = LookupCache("departments_by_hospital")
+
+def invalidate_department(department_id: str, hospital_id: Optional[str]):
+    """Drop cached lists holding the department, and the list of the hospital it now belongs to"""
+    departments_cache.invalidate_where(lambda page: any(d["_id"] == department_id for d in page.items))
+    if hospital_id is not None:
+        departments_cache.invalidate(hospital_id)
 
 async def create_department(department: DepartmentCreate) -> Dict[str, Any]:
     """Create a new department"""
-    collection = await get_departments_collection()
-
     department_data = {
         'name': department.name,
         'description': department.description,
@@ -24,84 +31,46 @@ async def create_department(department: DepartmentCreate) -> Dict[str, Any]:
     }
 
     # Insert department document
-    result = await collection.insert_one(department_data)
-    department_data['_id'] = result.inserted_id
-
-    return department_data
+    created_department = await department_repository.insert(department_data)
+    departments_cache.invalidate(department.hospital_id)
+    return created_department
 
 async def get_department_by_id(department_id: str) -> Optional[Dict[str, Any]]:
     """Get department by MongoDB document ID"""
-    collection = await get_departments_collection()
-    department = await collection.find_one({"_id": ObjectId(department_id)})
-    return department
+    return await department_repository.find_one({"_id": ObjectId(department_id)})
 
-async def get_departments_by_hospital(hospital_id: str) -> List[Dict[str, Any]]:
+async def get_departments_by_hospital(hospital_id: str, page: Optional[PageRequest] = None, fields: Optional[List[str]] = None) -> Page:
     """Get all departments for a hospital"""
-    collection = await get_departments_collection()
-    cursor = collection.find({"hospital_id": hospital_id})
-    departments = await cursor.to_list(length=None)
-    # Convert ObjectId to string for JSON serialization
-    for department in departments:
-        department['_id'] = str(department['_id'])
-    return departments
+    if page is None and fields is None:
+        return await departments_cache.get(
+            hospital_id, lambda: department_repository.find_page({"hospital_id": hospital_id}, DEPARTMENT_SORT))
+    return await department_repository.find_page({"hospital_id": hospital_id}, DEPARTMENT_SORT, page, fields)
 
 async def update_department(department_id: str, department_update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Update department information"""
-    collection = await get_departments_collection()
-
-    # Check if department exists
-    existing_department = await collection.find_one({"_id": ObjectId(department_id)})
-    if not existing_department:
-        return None
-
-    # Update data
     update_data = {k: v for k, v in department_update.items() if v is not None}
-    update_data['updated_at'] = datetime.utcnow()
-
-    await collection.update_one(
-        {"_id": ObjectId(department_id)},
-        {"$set": update_data}
-    )
-
-    # Return updated document
-    updated_department = await collection.find_one({"_id": ObjectId(department_id)})
+    updated_department = await department_repository.update({"_id": ObjectId(department_id)}, update_data)
+    invalidate_department(department_id, updated_department and updated_department.get("hospital_id"))
     return updated_department
 
 async def assign_department_head(department_id: str, head_uid: str) -> Optional[Dict[str, Any]]:
     """Assign a department head"""
-    collection = await get_departments_collection()
-
-    result = await collection.update_one(
-        {"_id": ObjectId(department_id)},
-        {"$set": {
-            "head_uid": head_uid,
-            "updated_at": datetime.utcnow()
-        }}
-    )
-
-    if result.modified_count > 0:
-        # Return updated document
-        updated_department = await collection.find_one({"_id": ObjectId(department_id)})
-        return updated_department
-
-    return None
+    updated_department = await department_repository.update({"_id": ObjectId(department_id)}, {"head_uid": head_uid})
+    invalidate_department(department_id, updated_department and updated_department.get("hospital_id"))
+    return updated_department
 
-async def get_department_users(department_id: str) -> List[Dict[str, Any]]:
+async def get_department_users(department_id: str, page: Optional[PageRequest] = None, fields: Optional[List[str]] = None) -> Page:
     """Get all users assigned to a department"""
-    from user_service import get_users_collection
-    collection = await get_users_collection()
-    cursor = collection.find({
+    from user_service import user_repository, USER_SORT
+    return await user_repository.find_page({
         "department_id": department_id,
         "is_active": True
-    })
-    return await cursor.to_list(length=None)
+    }, USER_SORT, page, fields)
 
-async def get_department_patients(department_id: str) -> List[Dict[str, Any]]:
+async def get_department_patients(department_id: str, page: Optional[PageRequest] = None, fields: Optional[List[str]] = None) -> Page:
     """Get all patients assigned to a department"""
-    from patient_service import get_patients_collection
-    collection = await get_patients_collection()
-    cursor = collection.find({
+    from patient_service import patient_repository, PATIENT_SORT
+    return await patient_repository.find_page({
         "department_id": department_id,
         "is_active": True
-    })
-    return await cursor.to_list(length=None)
+    }, PATIENT_SORT, page, fields)
@@ -0,0 +1,52 @@
+"""In-memory device routing table for the ingest hot path.
+
+Resolves device_id -> patient, field mapping and display info once, so steady
+state ingest does no Mongo reads. Entries are dropped explicitly when
+assignments or mappings are written, and expire after a TTL as a safety net for
+writes that happen elsewhere (patient renames, room moves, other instances).
+"""
+import time
+from typing import Dict, Any, Optional, Tuple
+
+
+class DeviceRoutingTable:
+    """device_id -> resolved route, with per-entry expiry.
+
+    A route is a dict with a `status` of "assigned", "unassigned" or
+    "no_mapping"; negative results are cached too so a chatty unassigned
+    device doesn't cost a lookup per reading.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._routes: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, device_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._routes.get(device_id)
+        if entry is None or entry[0] <= time.monotonic():
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def put(self, device_id: str, route: Dict[str, Any]):
+        self._routes[device_id] = (time.monotonic() + self.ttl_seconds, route)
+
+    def invalidate(self, device_id: Optional[str] = None):
+        """Forget one device, or everything when no device_id is given."""
+        if device_id is None:
+            self._routes.clear()
+        else:
+            self._routes.pop(device_id, None)
+        self.stats["invalidations"] += 1
+
+    def invalidate_mapping(self, mapping_id: str):
+        """Forget routes using `mapping_id`, and those still waiting for a mapping."""
+        for device_id, (_, route) in list(self._routes.items()):
+            if route.get("mapping_id") == mapping_id or route["status"] == "no_mapping":
+                del self._routes[device_id]
+        self.stats["invalidations"] += 1
+
+    def __len__(self):
+        return len(self._routes)
@@ -0,0 +1,113 @@
+"""Compiled device field-mapping transformers.
+
+A device_mappings document ({"HR": "hr_mean", "SpO2": "spo2_mean", ...}) is
+compiled once into a `FieldTransformer`: the mapping becomes a tuple of
+(raw_field, model_field) pairs and the default-fill for the model features a
+prebuilt dict, so transforming a reading is one dict copy plus one lookup and
+parse per mapped field.
+"""
+import math
+import re
+from typing import Any, Dict, Optional, Sequence
+
+# Fallback unit stripping: keep digits, '.' and '-'
+NON_NUMERIC = re.compile(r'[^\d.-]')
+# Trailing unit characters ("97%", "88 bpm", "120 mmHg", "16/min") removed before the regex fallback
+UNIT_SUFFIX_CHARS = " \t%/abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+_MISSING = object()
+
+
+def parse_vital_value(value: Any) -> Optional[float]:
+    """Parse vital sign value, handling different formats and units"""
+    value_type = type(value)
+    if value_type is float:
+        return value
+    if value_type is int:
+        return float(value)
+    if value is None or value == "":
+        return None
+
+    if value_type is str:
+        # Fast path: plain numbers, then numbers with a trailing unit
+        try:
+            number = float(value.rstrip(UNIT_SUFFIX_CHARS))
+            if math.isfinite(number):
+                return number
+        except ValueError:
+            pass
+        # Remove common units: bpm, %, mmHg, /min, etc.
+        cleaned = NON_NUMERIC.sub('', value.strip())
+        if cleaned:
+            try:
+                return float(cleaned)
+            except ValueError:
+                return None
+        return None
+
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+class FieldTransformer:
+    """One field mapping compiled against the model's feature list."""
+
+    __slots__ = ("field_mappings", "model_features", "pairs", "defaults")
+
+    def __init__(self, field_mappings: Dict[str, str], model_features: Sequence[str]):
+        self.field_mappings = field_mappings
+        self.model_features = model_features
+        self.pairs = tuple(field_mappings.items())
+        # Every model feature exists in the output, None unless the reading has it
+        self.defaults = dict.fromkeys(model_features)
+
+    def __call__(self, raw_data: Dict[str, Any]) -> Dict[str, Any]:
+        transformed = self.defaults.copy()
+        for raw_field, model_field in self.pairs:
+            value = raw_data.get(raw_field, _MISSING)
+            if value is not _MISSING:
+                transformed[model_field] = parse_vital_value(value)
+        return transformed
+
+    def matches(self, field_mappings: Dict[str, str], model_features: Sequence[str]) -> bool:
+        return (
+            (self.field_mappings is field_mappings or self.field_mappings == field_mappings)
+            and (self.model_features is model_features or list(self.model_features) == list(model_features))
+        )
+
+
+class TransformerCache:
+    """mapping_id -> FieldTransformer.
+
+    A cached transformer is reused only while the mapping and feature list it
+    was compiled from are unchanged, so an edited mapping or a newly loaded
+    model recompiles on next use even without an explicit invalidate().
+    """
+
+    def __init__(self):
+        self._transformers: Dict[str, FieldTransformer] = {}
+        self.stats = {"compiled": 0, "reused": 0, "invalidations": 0}
+
+    def get(self, mapping_id: Optional[str], field_mappings: Dict[str, str], model_features: Sequence[str]) -> FieldTransformer:
+        transformer = self._transformers.get(mapping_id) if mapping_id is not None else None
+        if transformer is not None and transformer.matches(field_mappings, model_features):
+            self.stats["reused"] += 1
+            return transformer
+        transformer = FieldTransformer(field_mappings, model_features)
+        self.stats["compiled"] += 1
+        if mapping_id is not None:
+            self._transformers[mapping_id] = transformer
+        return transformer
+
+    def invalidate(self, mapping_id: Optional[str] = None):
+        """Forget one mapping's transformer, or all of them."""
+        if mapping_id is None:
+            self._transformers.clear()
+        else:
+            self._transformers.pop(mapping_id, None)
+        self.stats["invalidations"] += 1
+
+    def __len__(self):
+        return len(self._transformers)
@@ -0,0 +1,114 @@
+"""Incremental parsers for batch ingest bodies.
+
+Both parsers consume an async iterator of byte chunks (e.g. Request.stream())
+and yield records as soon as they are complete, so a large upload is never
+held in memory as a whole.
+
+A JSON array element is only buffered until it is complete. One that turns
+out malformed is reported as soon as the data after the error arrives, and
+one larger than MAX_ELEMENT_CHARS is rejected, so a bad body can't make the
+parser re-scan an ever-growing tail.
+"""
+import codecs
+import json
+import os
+from typing import Any, AsyncIterator, Optional, Tuple
+
+# Largest single array element (in characters) buffered while it is incomplete
+MAX_ELEMENT_CHARS = int(os.environ.get("INGEST_MAX_ELEMENT_CHARS", str(1024 * 1024)))
+# A decode error this close to the end of the buffer may just be a truncated
+# literal, number or escape ("tru", "-2.5e", "\u00")
+_INCOMPLETE_TAIL = 9
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[Optional[Any], Optional[str]]]:
+    """Yield (record, None) per line, or (None, error) for a line that isn't valid JSON."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _decode_line(line)
+    if buffer.strip():
+        yield _decode_line(buffer)
+
+
+def _decode_line(line: bytes) -> Tuple[Optional[Any], Optional[str]]:
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        return None, f"Malformed JSON line: {e}"
+
+
+def _is_incomplete(error: json.JSONDecodeError, length: int) -> bool:
+    """True if decoding failed only because the buffer ends mid-element."""
+    return error.msg.startswith("Unterminated string") or length - error.pos <= _INCOMPLETE_TAIL
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes],
+                          max_element_chars: int = MAX_ELEMENT_CHARS) -> AsyncIterator[Tuple[Any, None]]:
+    """Yield (element, None) for each element of a top-level JSON array.
+
+    Raises ValueError if the body is not a well-formed array; elements yielded
+    before the error stand.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = finished = False
+    expect_value = True
+
+    def parse(final: bool):
+        nonlocal buffer, started, finished, expect_value
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos >= len(buffer) or finished:
+                break
+            char = buffer[pos]
+            if not started:
+                if char != "[":
+                    raise ValueError("Body must be a JSON array or NDJSON")
+                started = True
+                pos += 1
+            elif char == "]":
+                finished = True
+                pos += 1
+            elif char == ",":
+                if expect_value:
+                    raise ValueError("Unexpected ',' in JSON array")
+                expect_value = True
+                pos += 1
+            else:
+                if not expect_value:
+                    raise ValueError("Missing ',' between JSON array elements")
+                try:
+                    element, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    if final or not _is_incomplete(e, len(buffer)):
+                        raise ValueError(f"Malformed element in JSON array: {e}")
+                    end = None
+                # A bare number at the end of the buffer may still be growing
+                if end is None or (end == len(buffer) and not final):
+                    if len(buffer) - pos > max_element_chars:
+                        raise ValueError(f"JSON array element larger than {max_element_chars} characters")
+                    break  # element continues in the next chunk
+                yield element
+                expect_value = False
+                pos = end
+        buffer = buffer[pos:]
+
+    async for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        for element in parse(final=False):
+            yield element, None
+    buffer += text_decoder.decode(b"", final=True)
+    for element in parse(final=True):
+        yield element, None
+
+    if not finished:
+        raise ValueError("Unterminated JSON array")
+    if buffer.strip():
+        raise ValueError("Unexpected data after JSON array")
@@ -0,0 +1,193 @@
+"""Raw TCP line-protocol ingest for legacy serial-to-Ethernet gateways.
+
+Each reading is one newline-terminated line of key=value fields separated by
+spaces, tabs or commas:
+
+    device_id=philips_bed_01 ts=1760000000.5 HR=88 SpO2=97% NBP_SYS=120 NBP_DIA=80
+
+`device_id` (or `device`) is required; `device_type`/`type` and
+`ts`/`timestamp` (epoch seconds or ISO 8601) are optional. Every other field
+is raw monitor data and is mapped through the device's configured field
+mapping by UniversalMonitorProcessor, exactly as /monitor-data/ingest does.
+
+Fields are matched straight out of the connection's receive buffer, so lines
+are never sliced into separate objects. Parsed readings queue per connection
+and are processed in batches; when a connection's queue passes its high
+watermark the socket stops being read until the backlog drains, which pushes
+back on the gateway through TCP flow control. Nothing is written back.
+"""
+import asyncio
+import math
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+LINE_FIELD = re.compile(rb"([^\s,=]+)=([^\s,]*)")
+
+# A line longer than this without a newline is discarded
+MAX_LINE_BYTES = 64 * 1024
+
+line_stats = {
+    "connections": 0,
+    "active": 0,
+    "lines": 0,
+    "rejected_lines": 0,
+    "not_routed": 0,
+    "batch_errors": 0,
+    "pauses": 0,
+}
+
+
+def epoch_timestamp(seconds: float) -> datetime:
+    """Epoch seconds as a naive UTC datetime; ValueError for inf/nan or out-of-range values."""
+    try:
+        seconds = float(seconds)  # JSON/MessagePack ints can be too large for a float
+    except OverflowError as e:
+        raise ValueError(f"Timestamp out of range: {seconds!r}") from e
+    if not math.isfinite(seconds):
+        raise ValueError(f"Timestamp is not finite: {seconds!r}")
+    try:
+        return datetime.utcfromtimestamp(seconds)
+    except (OverflowError, OSError) as e:
+        raise ValueError(f"Timestamp out of range: {seconds!r}") from e
+
+
+def parse_line_timestamp(value: bytes) -> datetime:
+    """Epoch seconds or ISO 8601; ValueError for anything else, including inf/nan or out-of-range epochs."""
+    try:
+        seconds = float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.decode().replace("Z", "+00:00"))
+    return epoch_timestamp(seconds)
+
+
+def parse_line(buffer, start: int = 0, end: Optional[int] = None) -> Dict[str, Any]:
+    """Parse one key=value line from buffer[start:end] into a raw reading dict."""
+    if end is None:
+        end = len(buffer)
+    device_id = None
+    device_type = "unknown"
+    timestamp = None
+    data = {}
+    for key, value in LINE_FIELD.findall(buffer, start, end):
+        if key == b"device_id" or key == b"device":
+            device_id = value.decode()
+        elif key == b"device_type" or key == b"type":
+            device_type = value.decode()
+        elif key == b"ts" or key == b"timestamp":
+            timestamp = parse_line_timestamp(value)
+        else:
+            # Plain numbers skip the processor's unit-stripping path
+            try:
+                data[key.decode()] = float(value)
+            except ValueError:
+                data[key.decode()] = value.decode(errors="replace")
+    if not device_id:
+        raise ValueError("Line has no device_id")
+    if not data:
+        raise ValueError("Line has no vitals")
+    return {
+        "device_id": device_id,
+        "device_type": device_type,
+        "data": data,
+        "timestamp": timestamp or datetime.utcnow(),
+    }
+
+
+class LineIngestConnection(asyncio.Protocol):
+    """One gateway connection: parses lines as they arrive and feeds the processor in batches."""
+
+    def __init__(self, processor, batch_size: int, high_watermark: int):
+        self.processor = processor
+        self.batch_size = batch_size
+        self.high_watermark = high_watermark
+        self.low_watermark = high_watermark // 2
+        self.buffer = bytearray()
+        self.pending: List[Dict[str, Any]] = []
+        self.wake = asyncio.Event()
+        self.paused = False
+        self.closed = False
+        self.transport = None
+        self.worker = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        line_stats["connections"] += 1
+        line_stats["active"] += 1
+        self.worker = asyncio.create_task(self.process())
+
+    def data_received(self, data: bytes):
+        buffer = self.buffer
+        buffer += data
+        start = 0
+        while True:
+            newline = buffer.find(b"\n", start)
+            if newline < 0:
+                break
+            self.add_line(start, newline)
+            start = newline + 1
+        if start:
+            del buffer[:start]
+        if len(buffer) > MAX_LINE_BYTES:
+            line_stats["rejected_lines"] += 1
+            buffer.clear()
+
+        if self.pending:
+            self.wake.set()
+            if not self.paused and len(self.pending) >= self.high_watermark:
+                self.transport.pause_reading()
+                self.paused = True
+                line_stats["pauses"] += 1
+
+    def add_line(self, start: int, end: int):
+        if end - start <= 1:
+            return  # blank line
+        try:
+            self.pending.append(parse_line(self.buffer, start, end))
+        except (ValueError, OverflowError, OSError):
+            # A bad line is counted and skipped; it must never drop the connection
+            line_stats["rejected_lines"] += 1
+
+    def eof_received(self):
+        # A final line without a trailing newline still counts
+        if self.buffer.strip():
+            self.add_line(0, len(self.buffer))
+            self.buffer.clear()
+        return False
+
+    def connection_lost(self, exc):
+        self.closed = True
+        self.wake.set()
+        line_stats["active"] -= 1
+
+    async def process(self):
+        while True:
+            await self.wake.wait()
+            self.wake.clear()
+            while self.pending:
+                batch = self.pending[:self.batch_size]
+                del self.pending[:self.batch_size]
+                try:
+                    results = await self.processor.process_monitor_batch(batch)
+                    line_stats["lines"] += len(batch)
+                    line_stats["not_routed"] += sum(
+                        1 for result in results if result.get("status") not in ("success", "test_success")
+                    )
+                except Exception as e:
+                    print(f"❌ ERROR processing line-protocol batch: {e}")
+                    line_stats["batch_errors"] += 1
+                if self.paused and not self.closed and len(self.pending) <= self.low_watermark:
+                    self.transport.resume_reading()
+                    self.paused = False
+            if self.closed:
+                return
+
+
+async def start_line_ingest(processor, host: str, port: int, batch_size: int, high_watermark: int):
+    """Start the TCP listener; returns the asyncio server (close it on shutdown)."""
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(
+        lambda: LineIngestConnection(processor, batch_size, high_watermark), host, port
+    )
+    print(f"Line-protocol ingest listening on {host}:{server.sockets[0].getsockname()[1]}")
+    return server
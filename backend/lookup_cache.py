@@ -0,0 +1,122 @@
+"""In-process cache for rarely-changing lookups (hospitals, departments, users).
+
+`LookupCache.get(key, loader)` returns the cached value for `key`, or awaits
+`loader()` and caches its result. Each cache:
+
+- expires entries after `ttl_seconds`, as a safety net for writes made by
+  other instances or directly in Mongo;
+- holds at most `max_entries` and evicts the least recently used entry;
+- loads each key at most once at a time: concurrent misses for the same key
+  share one loader call (single flight) instead of all hitting Mongo.
+
+Services invalidate entries from their own write functions. A load that was in
+flight when an invalidation happened is returned to its callers but not cached,
+so it can't reinstate a value from before the write. None results (not found)
+are not cached, so a record created later is seen at once.
+
+Callers get a deep copy, so a router mutating a result can't corrupt the
+cache. `metrics()` reports hit rates for every cache.
+"""
+import asyncio
+import copy
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+LOOKUP_CACHE_TTL_SECONDS = float(os.environ.get("LOOKUP_CACHE_TTL_SECONDS", "60"))
+LOOKUP_CACHE_MAX_ENTRIES = int(os.environ.get("LOOKUP_CACHE_MAX_ENTRIES", "1000"))
+
+_caches: List["LookupCache"] = []
+
+
+class LookupCache:
+    def __init__(self, name: str, ttl_seconds: float = LOOKUP_CACHE_TTL_SECONDS,
+                 max_entries: int = LOOKUP_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Future] = {}  # key -> in-flight load task
+        # Bumped by every invalidation; a load only caches if it is unchanged
+        self._generation = 0
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "coalesced": 0, "expired": 0,
+                      "evictions": 0, "invalidations": 0, "load_errors": 0}
+        _caches.append(self)
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return copy.deepcopy(entry[1])
+            del self._entries[key]
+            self.stats["expired"] += 1
+        self.stats["misses"] += 1
+
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(key, loader))
+            self._loading[key] = loading
+        else:
+            self.stats["coalesced"] += 1
+        # The load runs in its own task and is shielded, so a cancelled caller
+        # doesn't cancel it for the others waiting on the same key
+        return copy.deepcopy(await asyncio.shield(loading))
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        generation = self._generation
+        self.stats["loads"] += 1
+        try:
+            value = await loader()
+        except Exception:
+            self.stats["load_errors"] += 1
+            raise
+        finally:
+            del self._loading[key]
+        if value is not None and generation == self._generation:
+            self._put(key, value)
+        return value
+
+    def _put(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Forget one key, or everything when no key is given."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+        self._generation += 1
+        self.stats["invalidations"] += 1
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]):
+        """Forget every entry whose value matches, e.g. a user by firebase_uid when it is keyed by email."""
+        for key, (_, value) in list(self._entries.items()):
+            if predicate(value):
+                del self._entries[key]
+        self._generation += 1
+        self.stats["invalidations"] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else None,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def metrics() -> Dict[str, Dict[str, Any]]:
+    """Metrics of every LookupCache, by name."""
+    return {cache.name: cache.metrics() for cache in _caches}
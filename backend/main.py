@@ -8,8 +8,9 @@ import traceback
 import os
 import sys
 from sklearn.base import BaseEstimator
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone
 
@@ -18,9 +19,17 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import monitor processor for real-time data support
 from monitor_processor import UniversalMonitorProcessor
+from broadcast_cadence import AdaptiveCadence
+from delta_frames import DeltaEncoder
+from broadcast_hub import BroadcastHub, Frame, RESYNC, sse_event
+from line_ingest import start_line_ingest
 
 # Import our modules with absolute imports
 import mongo_config
+import counters
+import db_indexes
+import lookup_cache
+from pagination import NEXT_CURSOR_HEADER
 import routers.hospitals as hospitals
 import routers.users as users
 import routers.patients as patients
@@ -84,6 +93,38 @@ THRESHOLDS = {
 # --- "Detective" AI Alarm Threshold ---
 AI_RISK_THRESHOLD = 70.0  # Trigger alarm if risk score is > 70%
 
+# --- Broadcast Cadence ---
+# Base tick of the broadcast loop. Acute patients (alarm or AI risk above
+# AI_RISK_THRESHOLD) go out on every tick, so lowering this only speeds up
+# the sick ones. In CSV mode the replay advances one window per tick.
+# Cadence only thins the delta stream (?mode=delta); the default full stream
+# stays a complete snapshot every tick.
+BROADCAST_INTERVAL_SECONDS = float(os.environ.get("BROADCAST_INTERVAL_SECONDS", "2"))
+ADAPTIVE_CADENCE = os.environ.get("ADAPTIVE_CADENCE", "true").lower() == "true"
+# Stable patients are re-sent at this slower interval...
+STABLE_PATIENT_INTERVAL_SECONDS = float(os.environ.get("STABLE_PATIENT_INTERVAL_SECONDS", "10"))
+# ...or as soon as a vital moves by more than its deadband
+VITAL_DEADBANDS = {"HR": 5.0, "RR": 3.0, "SpO₂": 2.0, "SBP": 10.0, "DBP": 8.0}
+
+# --- Delta Protocol (/ws?mode=delta) ---
+# Every Nth frame is a full keyframe so clients that dropped a frame resync
+DELTA_KEYFRAME_INTERVAL = int(os.environ.get("DELTA_KEYFRAME_INTERVAL", "30"))
+
+# --- Fan-out (/ws and /events) ---
+# Encoded frames kept for SSE Last-Event-ID resume (150 ticks = 5 min at 2 s)
+BROADCAST_HISTORY_FRAMES = int(os.environ.get("BROADCAST_HISTORY_FRAMES", "150"))
+# Frames a client may fall behind before it is resynced from a snapshot
+SUBSCRIBER_QUEUE_SIZE = int(os.environ.get("SUBSCRIBER_QUEUE_SIZE", "32"))
+SSE_KEEPALIVE_SECONDS = 15
+
+# --- Line-Protocol Ingest (legacy gateways, see line_ingest.py) ---
+# TCP listener for newline-delimited key=value readings; disabled unless a port is set
+LINE_INGEST_PORT = os.environ.get("LINE_INGEST_PORT")
+LINE_INGEST_HOST = os.environ.get("LINE_INGEST_HOST", "0.0.0.0")
+LINE_INGEST_BATCH_SIZE = int(os.environ.get("LINE_INGEST_BATCH_SIZE", "512"))
+# Readings queued per connection before we stop reading its socket
+LINE_INGEST_MAX_PENDING = int(os.environ.get("LINE_INGEST_MAX_PENDING", "4096"))
+
 # ---
 # 2. GLOBAL VARIABLES
 # ---
@@ -99,6 +140,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paged list endpoints return the next-page cursor in a header
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 @app.get("/")
@@ -124,6 +167,11 @@ async def health_check():
         ]
     }
 
+@app.get("/metrics/lookup-cache")
+async def lookup_cache_metrics():
+    """Hit rates of the hospital/department/user lookup caches"""
+    return lookup_cache.metrics()
+
 # Add request logging middleware
 @app.middleware("http")
 async def log_requests(request, call_next):
@@ -152,6 +200,10 @@ patient_data_by_window: Dict[int, List[Dict]] = {}
 max_window = 0
 # cache last known broadcast object for each patient
 last_known_by_patient: Dict[str, Dict[str, Any]] = {}
+# full patient list of the latest tick, sent to clients as they connect
+latest_snapshot: List[Dict[str, Any]] = []
+cadence = AdaptiveCadence(STABLE_PATIENT_INTERVAL_SECONDS, VITAL_DEADBANDS, AI_RISK_THRESHOLD)
+delta_encoder = DeltaEncoder(DELTA_KEYFRAME_INTERVAL)
 
 # Lazy loading flag for models
 vitals_model_loaded = False
@@ -471,26 +523,44 @@ def get_data_for_window(window: int) -> List[Dict[str, Any]]:
 # 4. WEBSOCKET & SERVER LIFECYCLE
 # ---
 
-class ConnectionManager:
-    """Manages all active WebSocket connections."""
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+manager = BroadcastHub(BROADCAST_HISTORY_FRAMES, SUBSCRIBER_QUEUE_SIZE)
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"Client connected. Total clients: {len(self.active_connections)}")
+# protocol -> (seq, encoded snapshot), so a reconnect storm encodes it once per tick
+_snapshot_cache: Dict[str, tuple] = {}
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-        print(f"Client disconnected. Total clients: {len(self.active_connections)}")
+def snapshot_message(protocol: str) -> Optional[str]:
+    """Full picture for a client that just connected or fell behind."""
+    cached = _snapshot_cache.get(protocol)
+    if cached and cached[0] == delta_encoder.seq:
+        return cached[1]
+    if protocol == "delta":
+        message = json.dumps(delta_encoder.keyframe())
+    else:
+        message = json.dumps(latest_snapshot) if latest_snapshot else None
+    _snapshot_cache[protocol] = (delta_encoder.seq, message)
+    return message
+
+async def broadcast_patients(all_patient_data: List[Dict[str, Any]]):
+    """Remember the full snapshot and push it; delta clients only get the patients due this tick."""
+    global latest_snapshot
+    latest_snapshot = all_patient_data
+
+    if ADAPTIVE_CADENCE:
+        cadence.prune(p["patient_id"] for p in all_patient_data)
+        outgoing = cadence.select(all_patient_data)
+    else:
+        outgoing = all_patient_data
 
-    async def broadcast(self, message: str):
-        """Sends a message to all connected clients."""
-        for connection in self.active_connections:
-            await connection.send_text(message)
+    # The delta state advances every tick so late joiners get a consistent keyframe
+    delta_frame = delta_encoder.encode(outgoing, [p["patient_id"] for p in all_patient_data])
 
-manager = ConnectionManager()
+    # Encoded once here; every WebSocket and SSE client shares these strings.
+    # Full-mode clients treat each list as the whole picture, so it is never thinned
+    manager.publish(Frame(
+        delta_encoder.seq,
+        json.dumps(all_patient_data) if all_patient_data else None,
+        json.dumps(delta_frame),
+    ))
 
 async def data_broadcast_loop():
     """The main server loop supporting both CSV mock data and real monitor data."""
@@ -501,7 +571,7 @@ async def data_broadcast_loop():
     if use_real_monitor_data and monitor_processor:
         # Real monitor data mode - get data from monitor processor
         while True:
-            await asyncio.sleep(2)
+            await asyncio.sleep(BROADCAST_INTERVAL_SECONDS)
 
             try:
                 # Get active monitored patients
@@ -522,8 +592,7 @@ async def data_broadcast_loop():
                         broadcast_list.append(patient_obj)
 
                 if broadcast_list:
-                    message = json.dumps(broadcast_list)
-                    await manager.broadcast(message)
+                    await broadcast_patients(broadcast_list)
 
             except Exception as e:
                 print(f"❌ ERROR in real monitor broadcast: {e}")
@@ -531,14 +600,13 @@ async def data_broadcast_loop():
         # CSV mock data mode (existing functionality)
         current_window = 0
         while True:
-            await asyncio.sleep(2)
+            await asyncio.sleep(BROADCAST_INTERVAL_SECONDS)
 
             try:
                 all_patient_data = get_data_for_window(current_window)
 
                 if all_patient_data:
-                    message = json.dumps(all_patient_data)
-                    await manager.broadcast(message)
+                    await broadcast_patients(all_patient_data)
 
             except Exception as e:
                 print(f"❌ ERROR broadcasting CSV data: {e}")
@@ -548,18 +616,97 @@ async def data_broadcast_loop():
             if current_window > max_window:
                 current_window = 0
 
+async def pump_websocket(websocket: WebSocket, subscriber):
+    """Forward queued frames to one WebSocket client."""
+    try:
+        while True:
+            frame = await subscriber.queue.get()
+            message = snapshot_message(subscriber.protocol) if frame is RESYNC else frame.payload(subscriber.protocol)
+            if message is not None:
+                await websocket.send_text(message)
+    except Exception:
+        # The receive loop in websocket_endpoint notices the disconnect and cleans up
+        pass
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    """The WebSocket endpoint that clients connect to."""
-    await manager.connect(websocket)
+    """The WebSocket endpoint that clients connect to.
+
+    `?mode=delta` switches the connection to delta frames (see delta_frames.py);
+    the default is the complete list of patient objects every tick.
+    """
+    protocol = "delta" if websocket.query_params.get("mode") == "delta" else "full"
+    await websocket.accept()
+    subscriber = manager.subscribe(protocol)
+    sender = None
     try:
+        # Stable patients may not be re-sent for a while, so start from the full picture
+        snapshot = snapshot_message(protocol)
+        if snapshot is not None:
+            await websocket.send_text(snapshot)
+        sender = asyncio.create_task(pump_websocket(websocket, subscriber))
         while True:
             await websocket.receive_text() # Just listen
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     except Exception as e:
         print(f"WebSocket error: {e}")
-        manager.disconnect(websocket)
+    finally:
+        if sender:
+            sender.cancel()
+        manager.unsubscribe(subscriber)
+
+@app.get("/events")
+async def events_endpoint(request: Request, mode: str = "full"):
+    """Server-Sent Events fallback for networks that strip WebSocket upgrades.
+
+    Carries exactly the same payloads as /ws (including `?mode=delta`), with the
+    broadcast sequence number as the event id. Reconnecting clients send
+    `Last-Event-ID` and get the frames they missed, or a snapshot if those
+    frames are no longer in the history.
+    """
+    protocol = "delta" if mode == "delta" else "full"
+    last_event_id = request.headers.get("last-event-id")
+
+    async def stream():
+        subscriber = manager.subscribe(protocol)
+
+        # Build the backlog before yielding so nothing published meanwhile is lost
+        backlog = None
+        if last_event_id and last_event_id.isdigit():
+            missed = manager.frames_since(int(last_event_id))
+            if missed is not None:
+                backlog = [chunk for chunk in (frame.sse(protocol) for frame in missed) if chunk]
+        if backlog is None:
+            snapshot = snapshot_message(protocol)
+            backlog = [sse_event(snapshot, delta_encoder.seq)] if snapshot else []
+
+        try:
+            yield "retry: 3000\n\n"
+            for chunk in backlog:
+                yield chunk
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if frame is RESYNC:
+                    snapshot = snapshot_message(protocol)
+                    if snapshot:
+                        yield sse_event(snapshot, delta_encoder.seq)
+                    continue
+                chunk = frame.sse(protocol)
+                if chunk:
+                    yield chunk
+        finally:
+            manager.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.on_event("startup")
 async def on_startup():
@@ -575,6 +722,38 @@ async def on_startup():
     except Exception as e:
         print("Mongo startup failed:", e)
 
+    # One processor for the whole app (routers get it via get_monitor_processor);
+    # created after Mongo so it picks up the connection
+    app.state.monitor_processor = UniversalMonitorProcessor()
+    if app.state.monitor_processor.mongo_client is not None:
+        try:
+            await db_indexes.ensure_indexes(app.state.monitor_processor.mongo_client)
+        except Exception as e:
+            print("Index setup failed:", e)
+        try:
+            await counters.seed_counters(app.state.monitor_processor.mongo_client, only_missing=True)
+        except Exception as e:
+            print("Counter seeding failed:", e)
+        try:
+            await app.state.monitor_processor.history_writer.ensure_indexes(app.state.monitor_processor.mongo_client)
+            await app.state.monitor_processor.unassigned.ensure_indexes(app.state.monitor_processor.mongo_client)
+        except Exception as e:
+            print("Ingest index setup failed:", e)
+        try:
+            await app.state.monitor_processor.unassigned.migrate_legacy(app.state.monitor_processor.mongo_client)
+        except Exception as e:
+            print("Unassigned device migration failed:", e)
+
+    app.state.line_ingest_server = None
+    if LINE_INGEST_PORT:
+        try:
+            app.state.line_ingest_server = await start_line_ingest(
+                app.state.monitor_processor, LINE_INGEST_HOST, int(LINE_INGEST_PORT),
+                LINE_INGEST_BATCH_SIZE, LINE_INGEST_MAX_PENDING
+            )
+        except Exception as e:
+            print("Line-protocol ingest failed to start:", e)
+
     # Load CSV / models lazily (NOT blocking)
     try:
         asyncio.create_task(init_background_services())
@@ -583,6 +762,21 @@ async def on_startup():
 
     print("Startup finished (server can accept traffic)")
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    server = getattr(app.state, "line_ingest_server", None)
+    if server is not None:
+        server.close()
+    # Drain buffered ingest writes before the Mongo client goes away
+    processor = getattr(app.state, "monitor_processor", None)
+    if processor is not None:
+        await processor.ordered.stop()
+    if processor is not None and processor.mongo_client is not None:
+        await processor.realtime_writer.stop()
+        await processor.history_writer.stop()
+        await processor.unassigned.stop()
+    await mongo_config.close_mongo_connection()
+
 # if __name__ == "__main__":
 #     port = int(os.environ.get("PORT", 8000)) # Default port
 #     disable_reload = os.environ.get("DISABLE_DEV_RELOAD", "false").lower() == "true"
@@ -611,11 +805,14 @@ async def init_background_services():
 
     await asyncio.sleep(1)  # let server start FIRST
 
+    # Warm the processor's model off the event loop so the first ingest doesn't pay for joblib.load
+    await asyncio.to_thread(app.state.monitor_processor.ensure_model_loaded)
+
     use_real_monitor_data = os.environ.get("USE_REAL_MONITOR_DATA", "false").lower() == "true"
 
     if use_real_monitor_data:
         print("Real monitor mode")
-        monitor_processor = UniversalMonitorProcessor()
+        monitor_processor = app.state.monitor_processor
     else:
         print("CSV mock mode")
         load_and_prepare_data()
@@ -1,13 +1,62 @@
-import re
 import os
+import time
 from typing import Dict, Any, List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 import joblib
 import numpy as np
 import pandas as pd
 from motor.motor_asyncio import AsyncIOMotorClient
 import mongo_config
 from bson import ObjectId
+from device_routing import DeviceRoutingTable
+from field_transform import TransformerCache, parse_vital_value
+from write_behind import RealtimeVitalsWriter
+from vitals_history import VitalsHistoryWriter
+from unassigned_devices import UnassignedDeviceTracker
+from rolling_features import RollingFeatureAggregator
+from ordered_ingest import OrderedIngestPipeline
+from dedup import DedupIndex
+
+# How long a resolved device route is trusted without an explicit invalidation
+DEVICE_ROUTE_TTL_SECONDS = float(os.environ.get("DEVICE_ROUTE_TTL_SECONDS", "300"))
+# realtime_vitals upserts are buffered and flushed in bulk this often...
+REALTIME_FLUSH_INTERVAL_SECONDS = float(os.environ.get("REALTIME_FLUSH_INTERVAL_SECONDS", "0.25"))
+# ...or as soon as this many patients have unflushed readings
+REALTIME_FLUSH_MAX_PENDING = int(os.environ.get("REALTIME_FLUSH_MAX_PENDING", "500"))
+# vitals_history keeps every reading in per-patient buckets of this many minutes...
+VITALS_HISTORY_BUCKET_MINUTES = int(os.environ.get("VITALS_HISTORY_BUCKET_MINUTES", "60"))
+# ...for this long after the bucket closes (TTL index)
+VITALS_HISTORY_RETENTION_DAYS = float(os.environ.get("VITALS_HISTORY_RETENTION_DAYS", "7"))
+VITALS_HISTORY_FLUSH_INTERVAL_SECONDS = float(os.environ.get("VITALS_HISTORY_FLUSH_INTERVAL_SECONDS", "1"))
+VITALS_HISTORY_FLUSH_MAX_PENDING = int(os.environ.get("VITALS_HISTORY_FLUSH_MAX_PENDING", "2000"))
+# Hard cap on readings held while Mongo is failing; the oldest are dropped beyond it
+VITALS_HISTORY_MAX_BUFFERED = int(os.environ.get("VITALS_HISTORY_MAX_BUFFERED", "100000"))
+# Readings are scored on rolling mean/std/min/max over this window, like the training data
+ROLLING_WINDOW_SECONDS = float(os.environ.get("ROLLING_WINDOW_SECONDS", "300"))
+# Readings dated further ahead of server time than this are rejected (clock skew, ms sent as s)
+MAX_FUTURE_SKEW_SECONDS = float(os.environ.get("MAX_FUTURE_SKEW_SECONDS", "30"))
+# Single readings are processed in order per device on this many worker queues
+INGEST_SHARDS = int(os.environ.get("INGEST_SHARDS", "16"))
+INGEST_SHARD_QUEUE_SIZE = int(os.environ.get("INGEST_SHARD_QUEUE_SIZE", "256"))
+# A (device_id, timestamp) seen again within this window is a retry and is not reprocessed
+DEDUP_WINDOW_SECONDS = float(os.environ.get("DEDUP_WINDOW_SECONDS", "120"))
+# Keys remembered per window generation (two generations are kept)
+DEDUP_MAX_ENTRIES = int(os.environ.get("DEDUP_MAX_ENTRIES", "100000"))
+# Unassigned devices: one status upsert per device per flush...
+UNASSIGNED_FLUSH_INTERVAL_SECONDS = float(os.environ.get("UNASSIGNED_FLUSH_INTERVAL_SECONDS", "2"))
+# ...plus up to this many raw samples per device per flush in a capped collection (0 bytes disables it)
+UNASSIGNED_SAMPLES_PER_FLUSH = int(os.environ.get("UNASSIGNED_SAMPLES_PER_FLUSH", "1"))
+UNASSIGNED_SAMPLE_MAX_BYTES = int(os.environ.get("UNASSIGNED_SAMPLE_MAX_BYTES", str(8 * 1024 * 1024)))
+UNASSIGNED_SAMPLE_MAX_DOCS = int(os.environ.get("UNASSIGNED_SAMPLE_MAX_DOCS", "10000"))
+
+# Basic device mapping used when there is no database to configure one
+DEFAULT_FIELD_MAPPING = {
+    "HR": "hr_mean",
+    "SpO2": "spo2_mean",
+    "NBP_SYS": "sbp_mean",
+    "NBP_DIA": "dbp_mean",
+    "RESP": "rr_mean"
+}
 
 class UniversalMonitorProcessor:
     def __init__(self):
@@ -19,6 +68,39 @@ class UniversalMonitorProcessor:
         self.model = None
         self.model_features = ["hr_mean", "spo2_mean", "sbp_mean", "dbp_mean"]
         self.model_loaded = False  # Lazy loading flag
+        # device_id -> patient, field mapping and display info (see device_routing.py)
+        self.routes = DeviceRoutingTable(DEVICE_ROUTE_TTL_SECONDS)
+        # Readings older than the patient's newest accepted one (the rolling window's
+        # last_seen, forgotten when the window is pruned) are dropped as stale
+        self.stale_dropped = 0
+        self.future_rejected = 0
+        self.dedup = DedupIndex(DEDUP_WINDOW_SECONDS, DEDUP_MAX_ENTRIES)
+        self.ordered = OrderedIngestPipeline(self.process_monitor_data, INGEST_SHARDS, INGEST_SHARD_QUEUE_SIZE)
+        # patient_id -> rolling vital windows (see rolling_features.py)
+        self.windows = RollingFeatureAggregator(ROLLING_WINDOW_SECONDS)
+        # mapping_id -> compiled field transformer (see field_transform.py)
+        self.transformers = TransformerCache()
+        self.realtime_writer = RealtimeVitalsWriter(
+            lambda: self.mongo_client.realtime_vitals,
+            REALTIME_FLUSH_INTERVAL_SECONDS,
+            REALTIME_FLUSH_MAX_PENDING
+        )
+        self.history_writer = VitalsHistoryWriter(
+            lambda: self.mongo_client.vitals_history,
+            VITALS_HISTORY_BUCKET_MINUTES,
+            VITALS_HISTORY_RETENTION_DAYS,
+            VITALS_HISTORY_FLUSH_INTERVAL_SECONDS,
+            VITALS_HISTORY_FLUSH_MAX_PENDING,
+            VITALS_HISTORY_MAX_BUFFERED
+        )
+        self.unassigned = UnassignedDeviceTracker(
+            lambda: self.mongo_client,
+            UNASSIGNED_FLUSH_INTERVAL_SECONDS,
+            REALTIME_FLUSH_MAX_PENDING,
+            UNASSIGNED_SAMPLES_PER_FLUSH,
+            UNASSIGNED_SAMPLE_MAX_BYTES,
+            UNASSIGNED_SAMPLE_MAX_DOCS
+        )
 
     def ensure_model_loaded(self):
         """Lazy load the vitals model only when needed."""
@@ -34,16 +116,18 @@ class UniversalMonitorProcessor:
     def load_model(self):
         """Load the AI model for vital analysis"""
         try:
-            BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            BASE_DIR = os.path.dirname(os.path.abspath(__file__))
             MODEL_FILE = os.path.join(BASE_DIR, "models/vitals_model_tuned.joblib")
             artifact = joblib.load(MODEL_FILE)
             self.model = artifact.get("model")
+            # Column order must match training, so take it from the artifact
+            self.model_features = artifact.get("features", self.model_features)
         except Exception as e:
             print(f"Warning: Could not load AI model: {e}")
             self.model = None
 
-    async def process_monitor_data(self, raw_data) -> Dict[str, Any]:
-        """Process any incoming monitor data"""
+    def standardize_raw_data(self, raw_data) -> Dict[str, Any]:
+        """Normalize a RawVitalData object or plain dict to {device_id, data, timestamp}"""
 
         # Handle both RawVitalData objects and plain dictionaries
         if hasattr(raw_data, 'device_id'):  # RawVitalData Pydantic object
@@ -53,76 +137,256 @@ class UniversalMonitorProcessor:
         else:  # Plain dictionary
             device_id = raw_data["device_id"]
             data = raw_data["data"]
-            timestamp = raw_data.get("timestamp", datetime.utcnow())
+            timestamp = raw_data.get("timestamp") or datetime.utcnow()
 
-        # Create a standardized raw_data dict for processing
-        standardized_raw_data = {
+        return {
             "device_id": device_id,
             "data": data,
             "timestamp": timestamp
         }
 
-        # If MongoDB is not available, do basic processing without database operations
-        if self.mongo_client is None:
-            return await self.process_without_database(standardized_raw_data)
+    async def submit_monitor_data(self, raw_data) -> Dict[str, Any]:
+        """process_monitor_data, in arrival order with other readings from the same device"""
+        device_id = raw_data.device_id if hasattr(raw_data, 'device_id') else raw_data["device_id"]
+        return await self.ordered.submit(device_id, raw_data)
+
+    async def process_monitor_data(self, raw_data) -> Dict[str, Any]:
+        """Process any incoming monitor data"""
 
-        # Find patient assignment for this device
-        assignment = await self.find_patient_assignment(device_id)
+        # Create a standardized raw_data dict for processing
+        standardized_raw_data = self.standardize_raw_data(raw_data)
 
-        if not assignment:
+        # Gateway retries are answered before any Mongo or model work
+        if self.is_duplicate(standardized_raw_data):
+            return self.duplicate_result(standardized_raw_data)
+
+        try:
+            # If MongoDB is not available, do basic processing without database operations
+            if self.mongo_client is None:
+                return await self.process_without_database(standardized_raw_data)
+
+            standardized_data, early_result = await self.prepare_vitals(standardized_raw_data)
+            if early_result is not None:
+                # Not accepted; a retry (e.g. once the device is assigned) is processed again
+                self.forget_reading(standardized_raw_data)
+                return early_result
+
+            # Run AI analysis
+            ai_result = await self.analyze_vitals(standardized_data)
+            standardized_data["ai_analysis"] = ai_result
+        except Exception:
+            self.forget_reading(standardized_raw_data)
+            raise
+
+        # Store for real-time display
+        try:
+            await self.store_real_time_data(standardized_data)
+        except Exception:
+            # Continue even if database storage fails, but let a retry store it
+            self.forget_reading(standardized_raw_data)
+
+        return self.success_result(standardized_data)
+
+    async def process_monitor_batch(self, raw_items: List[Any]) -> List[Dict[str, Any]]:
+        """Process many readings through the same pipeline as process_monitor_data.
+
+        Readings are routed and transformed one by one, then scored with a
+        single model call and stored with a single bulk write. Returns one
+        result per input, in order.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(raw_items)
+        to_score = []  # (index, standardized_data, standardized_raw_data)
+
+        try:
+            for index, raw_item in enumerate(raw_items):
+                standardized_raw_data = self.standardize_raw_data(raw_item)
+                if self.is_duplicate(standardized_raw_data):
+                    results[index] = self.duplicate_result(standardized_raw_data)
+                    continue
+                try:
+                    if self.mongo_client is None:
+                        standardized_data, early_result = self.prepare_without_database(standardized_raw_data)
+                    else:
+                        standardized_data, early_result = await self.prepare_vitals(standardized_raw_data)
+                except Exception:
+                    self.forget_reading(standardized_raw_data)
+                    raise
+                if early_result is not None:
+                    self.forget_reading(standardized_raw_data)
+                    results[index] = early_result
+                else:
+                    to_score.append((index, standardized_data, standardized_raw_data))
+
+            ai_results = self.score_vitals([standardized_data for _, standardized_data, _ in to_score])
+        except Exception:
+            # The whole batch fails; none of it was accepted
+            for _, _, standardized_raw_data in to_score:
+                self.forget_reading(standardized_raw_data)
+            raise
+
+        for (index, standardized_data, standardized_raw_data), ai_result in zip(to_score, ai_results):
+            standardized_data["ai_analysis"] = ai_result
+            if self.mongo_client is None:
+                results[index] = self.test_mode_result(standardized_data, standardized_raw_data)
+            else:
+                results[index] = self.success_result(standardized_data)
+
+        if self.mongo_client is not None and to_score:
+            try:
+                await self.store_real_time_batch([standardized_data for _, standardized_data, _ in to_score])
+            except Exception:
+                # Continue even if database storage fails, but let retries store them
+                for _, _, standardized_raw_data in to_score:
+                    self.forget_reading(standardized_raw_data)
+
+        return results
+
+    def is_duplicate(self, standardized_raw_data: Dict[str, Any]) -> bool:
+        """Check the reading's key and record it; forget_reading undoes that if it isn't accepted."""
+        return self.dedup.seen((standardized_raw_data["device_id"], standardized_raw_data["timestamp"]))
+
+    def forget_reading(self, standardized_raw_data: Dict[str, Any]):
+        self.dedup.forget((standardized_raw_data["device_id"], standardized_raw_data["timestamp"]))
+
+    def duplicate_result(self, standardized_raw_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "status": "duplicate",
+            "device_id": standardized_raw_data["device_id"],
+            "message": "Reading already received"
+        }
+
+    async def prepare_vitals(self, standardized_raw_data: Dict[str, Any]):
+        """Route and transform one reading.
+
+        Returns (standardized_data, None) when the reading is ready for scoring,
+        or (None, result) when it stops early (unassigned device, no mapping).
+        """
+        device_id = standardized_raw_data["device_id"]
+
+        # Resolve device -> patient, mapping and display info (no reads when cached)
+        route = await self.resolve_device_route(device_id)
+
+        if route["status"] == "unassigned":
             # No assignment found - this is new/unconfigured device
             try:
                 await self.store_unassigned_data(standardized_raw_data)
             except Exception:
                 # Continue even if database storage fails
                 pass
-            return {
+            return None, {
                 "status": "unassigned_device",
                 "device_id": device_id,
                 "message": "Device not assigned to any patient"
             }
 
-        # Get field mapping for this device type
-        mapping = await self.get_device_mapping(assignment["mapping_id"])
-
-        if not mapping:
-            return {
+        if route["status"] == "no_mapping":
+            return None, {
                 "status": "no_mapping",
                 "device_id": device_id,
                 "message": "No field mapping configured for device type"
             }
 
         # Transform raw data to model format
-        standardized_data = self.transform_data(data, mapping["field_mappings"])
+        standardized_data = self.transform_data(standardized_raw_data["data"], route["field_mappings"], route["mapping_id"])
 
         # Add patient info
-        patient_info = await self.get_patient_info(assignment["patient_id"])
+        patient_info = route["patient_info"]
         standardized_data.update({
-            "patient_id": str(assignment["patient_id"]),
+            "patient_id": route["patient_id"],
             "name": patient_info["name"],
             "room": patient_info.get("room", "Unknown"),
             "bed": patient_info.get("bed", "Unknown"),
-            "timestamp": timestamp.isoformat()
+            "timestamp": standardized_raw_data["timestamp"].isoformat()
         })
+        return self.accept_reading(standardized_data, standardized_raw_data)
+
+    def accept_reading(self, standardized_data: Dict[str, Any], raw_data: Dict[str, Any]):
+        """Drop a reading older than the patient's newest one, else attach its window features.
+
+        Returns (standardized_data, None), or (None, result) for a rejected reading.
+        A reading dated more than MAX_FUTURE_SKEW_SECONDS ahead of server time
+        is rejected before it can become the patient's newest, so one bad
+        clock can't make every later reading look stale.
+        No await happens between the check and the update, so concurrent
+        readings can't both pass it.
+        """
+        timestamp = raw_data["timestamp"]
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        reading_at = timestamp.timestamp()
+        patient_id = standardized_data["patient_id"]
+
+        if reading_at > time.time() + MAX_FUTURE_SKEW_SECONDS:
+            self.future_rejected += 1
+            print(f"⚠️ Rejected reading from {raw_data['device_id']} dated in the future: {timestamp.isoformat()} "
+                  f"({self.future_rejected} rejected so far)")
+            return None, {
+                "status": "future_timestamp",
+                "device_id": raw_data["device_id"],
+                "patient_id": patient_id,
+                "message": "Reading timestamp is ahead of server time"
+            }
 
-        # Run AI analysis
-        ai_result = await self.analyze_vitals(standardized_data)
-        standardized_data["ai_analysis"] = ai_result
+        latest = self.windows.last_seen(patient_id)
+        if latest is not None and reading_at < latest:
+            self.stale_dropped += 1
+            return None, {
+                "status": "stale",
+                "device_id": raw_data["device_id"],
+                "patient_id": patient_id,
+                "message": "Reading is older than the latest stored reading"
+            }
 
-        # Store for real-time display
-        try:
-            await self.store_real_time_data(standardized_data)
-        except Exception:
-            # Continue even if database storage fails
-            pass
+        # Rolling-window features, which the model scores instead of the raw reading
+        standardized_data["window_features"] = self.windows.update(patient_id, reading_at, standardized_data)
+        return standardized_data, None
 
+    def success_result(self, standardized_data: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "status": "success",
             "patient_id": standardized_data["patient_id"],
             "processed_vitals": standardized_data,
-            "ai_result": ai_result
+            "ai_result": standardized_data["ai_analysis"]
         }
 
+    async def resolve_device_route(self, device_id: str) -> Dict[str, Any]:
+        """Get routing info for a device from the routing table, loading it on a miss"""
+        route = self.routes.get(device_id)
+        if route is not None:
+            return route
+        try:
+            route = await self.load_device_route(device_id)
+        except Exception:
+            # Lookup failures are not cached; treat the device as unassigned for this reading
+            return {"status": "unassigned"}
+        self.routes.put(device_id, route)
+        return route
+
+    async def load_device_route(self, device_id: str) -> Dict[str, Any]:
+        """Resolve assignment, field mapping and patient display info from MongoDB"""
+        db = self.mongo_client
+        assignment = await db.device_assignments.find_one({"device_id": device_id, "is_active": True})
+        if not assignment:
+            return {"status": "unassigned"}
+
+        patient_id = str(assignment["patient_id"])
+        mapping_id = assignment.get("mapping_id")  # admin-created assignments have none
+        route = {"status": "no_mapping", "patient_id": patient_id, "mapping_id": str(mapping_id) if mapping_id else None}
+
+        mapping = None
+        if mapping_id and ObjectId.is_valid(mapping_id):
+            mapping = await db.device_mappings.find_one({"_id": ObjectId(mapping_id)})
+        if not mapping:
+            return route
+
+        patient = await db.patients.find_one({"_id": ObjectId(patient_id)}) if ObjectId.is_valid(patient_id) else None
+        route.update({
+            "status": "assigned",
+            "field_mappings": mapping["field_mappings"],
+            "patient_info": self.format_patient_info(patient_id, patient),
+        })
+        return route
+
     async def find_patient_assignment(self, device_id: str) -> Optional[Dict[str, Any]]:
         """Find which patient this device is assigned to"""
         if self.mongo_client is None:
@@ -150,111 +414,86 @@ class UniversalMonitorProcessor:
         try:
             collection = self.mongo_client.patients
             patient = await collection.find_one({"_id": ObjectId(patient_id)})
-            return {
-                "name": f"{patient.get('first_name', '')} {patient.get('last_name', '')}".strip() if patient else f"Patient {patient_id}",
-                "room": patient.get('room_number', 'Unknown') if patient else 'Unknown',
-                "bed": patient.get('bed_number', 'Unknown') if patient else 'Unknown'
-            }
+            return self.format_patient_info(patient_id, patient)
         except Exception:
             return {"name": f"Test Patient {patient_id}", "room": "Test Room", "bed": "Test Bed"}
 
-    def transform_data(self, raw_data: Dict[str, Any], field_mappings: Dict[str, str]) -> Dict[str, Any]:
-        """Transform any monitor data format to what our model expects"""
-
-        transformed = {}
-
-        # Map configured fields
-        for raw_field, model_field in field_mappings.items():
-            if raw_field in raw_data:
-                value = raw_data[raw_field]
-                transformed[model_field] = self.parse_vital_value(value)
+    def format_patient_info(self, patient_id: str, patient: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Display fields for a patient document (or a fallback when it is missing)"""
+        return {
+            "name": f"{patient.get('first_name', '')} {patient.get('last_name', '')}".strip() if patient else f"Patient {patient_id}",
+            "room": patient.get('room_number', 'Unknown') if patient else 'Unknown',
+            "bed": patient.get('bed_number', 'Unknown') if patient else 'Unknown'
+        }
 
-        # Ensure all model features exist (fill with None if missing)
-        for feature in self.model_features:
-            if feature not in transformed:
-                transformed[feature] = None
+    def transform_data(self, raw_data: Dict[str, Any], field_mappings: Dict[str, str], mapping_id: Optional[str] = None) -> Dict[str, Any]:
+        """Transform any monitor data format to what our model expects
 
-        return transformed
+        Mappings are compiled once per mapping_id and reused until the mapping
+        or the model's feature list changes. Missing features are filled with None.
+        """
+        return self.transformers.get(mapping_id, field_mappings, self.model_features)(raw_data)
 
     def parse_vital_value(self, value: Any) -> Optional[float]:
         """Parse vital sign value, handling different formats and units"""
-
-        if value is None or value == "":
-            return None
-
-        try:
-            # Handle string values with units
-            if isinstance(value, str):
-                # Remove common units: bpm, %, mmHg, /min, etc.
-                cleaned = re.sub(r'[^\d.-]', '', value.strip())
-                if cleaned:
-                    return float(cleaned)
-                return None
-
-            # Handle numeric values
-            elif isinstance(value, (int, float)):
-                return float(value)
-
-            # Handle other types
-            else:
-                return float(value)
-
-        except (ValueError, TypeError):
-            return None
+        return parse_vital_value(value)
 
     async def analyze_vitals(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Run AI analysis on the vitals"""
+        return self.score_vitals([data])[0]
+
+    def score_vitals(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run AI analysis on many readings with a single model call"""
+        if not rows:
+            return []
 
         # Lazy load model if needed
         self.ensure_model_loaded()
 
         if not self.model:
-            return {"error": "AI model not loaded"}
+            return [{"error": "AI model not loaded"} for _ in rows]
 
         try:
             # Prepare data for model
             model_input = []
-            for feature in self.model_features:
-                value = data.get(feature)
-                model_input.append(value if value is not None else 0)
+            for data in rows:
+                # Window summaries when available (see accept_reading), else the reading itself
+                features = data.get("window_features") or data
+                model_input.append([features.get(feature) if features.get(feature) is not None else 0 for feature in self.model_features])
 
             # Run prediction
-            model_input_df = pd.DataFrame([model_input], columns=self.model_features)
-            prediction_proba = self.model.predict_proba(model_input_df)[0]
-
-            risk_score = round(prediction_proba[1] * 100, 2)
-
-            return {
-                "risk_score_percent": risk_score,
-                "is_at_risk": risk_score > 70.0,
-                "prediction_confidence": prediction_proba
-            }
+            model_input_df = pd.DataFrame(model_input, columns=self.model_features)
+            prediction_probas = self.model.predict_proba(model_input_df)
+
+            results = []
+            for prediction_proba in prediction_probas:
+                risk_score = round(float(prediction_proba[1]) * 100, 2)
+                results.append({
+                    "risk_score_percent": risk_score,
+                    "is_at_risk": risk_score > 70.0,
+                    "prediction_confidence": prediction_proba.tolist()
+                })
+            return results
 
         except Exception as e:
-            return {"error": f"Analysis failed: {str(e)}"}
+            return [{"error": f"Analysis failed: {str(e)}"} for _ in rows]
 
     async def store_real_time_data(self, data: Dict[str, Any]):
         """Store processed data for real-time display"""
-        collection = self.mongo_client.realtime_vitals
+        # Keep only latest reading per patient; written behind in bulk (see write_behind.py)
+        self.realtime_writer.enqueue(data)
+        self.history_writer.enqueue(data)
 
-        # Keep only latest reading per patient
-        await collection.replace_one(
-            {"patient_id": data["patient_id"]},
-            data,
-            upsert=True
-        )
+    async def store_real_time_batch(self, rows: List[Dict[str, Any]]):
+        """Store many processed readings, keeping the latest per patient"""
+        for data in rows:
+            self.realtime_writer.enqueue(data)
+            self.history_writer.enqueue(data)
 
     async def store_unassigned_data(self, raw_data: Dict[str, Any]):
         """Store data from unassigned devices for later configuration"""
-        collection = self.mongo_client.unassigned_devices
-
-        await collection.insert_one({
-            "device_id": raw_data["device_id"],
-            "device_type": raw_data.get("device_type", "unknown"),
-            "raw_data": raw_data["data"],
-            "timestamp": raw_data["timestamp"],
-            "discovered_at": datetime.utcnow()
-        })
+        # One coalesced status document per device (see unassigned_devices.py)
+        self.unassigned.enqueue(raw_data)
 
     async def get_all_mappings(self) -> List[Dict[str, Any]]:
         """Get all configured device mappings"""
@@ -270,6 +509,8 @@ class UniversalMonitorProcessor:
         collection = self.mongo_client.device_mappings
         mapping_data["created_at"] = datetime.utcnow()
         result = await collection.insert_one(mapping_data)
+        self.routes.invalidate_mapping(str(result.inserted_id))
+        self.transformers.invalidate(str(result.inserted_id))
         return {"status": "success", "mapping_id": str(result.inserted_id)}
 
     async def create_device_assignment(self, assignment_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -291,27 +532,17 @@ class UniversalMonitorProcessor:
         assignment_data["created_at"] = datetime.utcnow()
 
         result = await collection.insert_one(assignment_data)
+        self.routes.invalidate(assignment_data["device_id"])
+        await self.unassigned.forget(assignment_data["device_id"])
         return {"status": "success", "assignment_id": str(result.inserted_id)}
 
-    async def get_unassigned_devices(self) -> List[Dict[str, Any]]:
-        """Get list of devices that sent data but aren't assigned"""
-        collection = self.mongo_client.unassigned_devices
-
-        # Group by device_id and get the latest data for each
-        pipeline = [
-            {"$sort": {"discovered_at": -1}},  # Most recent first
-            {"$group": {
-                "_id": "$device_id",
-                "latest_data": {"$first": "$$ROOT"}
-            }},
-            {"$replaceRoot": {"newRoot": "$latest_data"}}
-        ]
-
-        devices = []
-        async for device in collection.aggregate(pipeline):
-            device["_id"] = str(device["_id"])
-            devices.append(device)
-        return devices
+    async def get_unassigned_devices(self, limit: int = 200) -> List[Dict[str, Any]]:
+        """Get list of devices that sent data but aren't assigned, most recently seen first"""
+        return await self.unassigned.list_devices(limit)
+
+    async def get_unassigned_device_samples(self, device_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Recent raw readings kept for an unassigned device"""
+        return await self.unassigned.list_samples(device_id, limit)
 
     async def get_monitored_patients(self) -> Dict[str, Any]:
         """Get mapping of patient_ids to their device info for real-time monitoring"""
@@ -327,24 +558,26 @@ class UniversalMonitorProcessor:
 
     async def get_latest_patient_vitals(self, patient_id: str) -> Optional[Dict[str, Any]]:
         """Get the most recent vital data for a specific patient"""
+        # A reading still waiting in the write-behind buffer is newer than Mongo's copy
+        pending = self.realtime_writer.pending_for(patient_id)
+        if pending is not None:
+            return pending
         collection = self.mongo_client.realtime_vitals
         vitals = await collection.find_one({"patient_id": patient_id})
         return vitals
 
-    async def process_without_database(self, raw_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Process monitor data without database operations - for testing purposes"""
+    async def get_patient_vitals_history(self, patient_id: str, start: datetime, end: datetime, limit: int) -> List[Dict[str, Any]]:
+        """Stored readings for a patient in a time range (see vitals_history.py)"""
+        return await self.history_writer.query(patient_id, start, end, limit)
 
-        # Create a basic device mapping assuming common monitor format
-        default_mapping = {
-            "HR": "hr_mean",
-            "SpO2": "spo2_mean",
-            "NBP_SYS": "sbp_mean",
-            "NBP_DIA": "dbp_mean",
-            "RESP": "rr_mean"
-        }
+    def prepare_without_database(self, raw_data: Dict[str, Any]):
+        """Transform a reading with the default vendor mapping and a test patient
 
-        # Transform raw data to model format
-        standardized_data = self.transform_data(raw_data["data"], default_mapping)
+        Returns (standardized_data, None), or (None, result) for a stale reading.
+        """
+
+        # Transform raw data to model format, assuming common monitor format
+        standardized_data = self.transform_data(raw_data["data"], DEFAULT_FIELD_MAPPING, "default")
 
         # Add basic patient info (assume test patient)
         test_patient_names = {
@@ -363,16 +596,27 @@ class UniversalMonitorProcessor:
             "bed": bed,
             "timestamp": raw_data["timestamp"].isoformat()
         })
+        return self.accept_reading(standardized_data, raw_data)
 
-        # Run AI analysis if model is available
-        ai_result = await self.analyze_vitals(standardized_data)
-        standardized_data["ai_analysis"] = ai_result
-
+    def test_mode_result(self, standardized_data: Dict[str, Any], raw_data: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "status": "test_success",
             "message": "Processed in test mode (no database)",
             "patient_id": standardized_data["patient_id"],
             "processed_vitals": standardized_data,
-            "ai_result": ai_result,
+            "ai_result": standardized_data["ai_analysis"],
             "original_data": raw_data
         }
+
+    async def process_without_database(self, raw_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Process monitor data without database operations - for testing purposes"""
+
+        standardized_data, early_result = self.prepare_without_database(raw_data)
+        if early_result is not None:
+            return early_result
+
+        # Run AI analysis if model is available
+        ai_result = await self.analyze_vitals(standardized_data)
+        standardized_data["ai_analysis"] = ai_result
+
+        return self.test_mode_result(standardized_data, raw_data)
@@ -0,0 +1,73 @@
+"""Per-device ordered processing of single readings.
+
+Concurrent /monitor-data/ingest requests for the same device used to race
+through the processor, so readings could be scored and stored out of order.
+`OrderedIngestPipeline` hashes each reading's key (the device_id) onto one of
+a fixed number of asyncio worker queues: readings of one device are processed
+one after another in arrival order, while different devices spread over the
+shards and run concurrently.
+"""
+import asyncio
+import zlib
+from typing import Any, Awaitable, Callable, List
+
+
+class OrderedIngestPipeline:
+    def __init__(self, handler: Callable[[Any], Awaitable[Any]], shards: int, queue_size: int):
+        self.handler = handler
+        self.shards = shards
+        self.queue_size = queue_size
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        self.stats = {"submitted": 0, "processed": 0, "abandoned": 0, "max_shard_depth": 0}
+
+    def shard_for(self, key: str) -> int:
+        # crc32 rather than hash() so a device maps to the same shard across restarts
+        return zlib.crc32(key.encode()) % self.shards
+
+    def _ensure_started(self):
+        # Started lazily so the workers bind to the running event loop
+        if not self._workers:
+            self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in range(self.shards)]
+            self._workers = [asyncio.create_task(self._work(queue)) for queue in self._queues]
+
+    async def submit(self, key: str, item: Any) -> Any:
+        """Process `item` after everything submitted earlier with the same key; returns the handler's result."""
+        self._ensure_started()
+        queue = self._queues[self.shard_for(key)]
+        future = asyncio.get_running_loop().create_future()
+        await queue.put((item, future))  # waits while the shard is full
+        self.stats["submitted"] += 1
+        self.stats["max_shard_depth"] = max(self.stats["max_shard_depth"], queue.qsize())
+        return await future
+
+    async def _work(self, queue: asyncio.Queue):
+        while True:
+            item, future = await queue.get()
+            if future.done():
+                # The caller went away while the reading was queued
+                self.stats["abandoned"] += 1
+                continue
+            try:
+                result = await self.handler(item)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            self.stats["processed"] += 1
+
+    async def stop(self):
+        """Cancel the workers; readings still queued are abandoned."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def metrics(self):
+        return {
+            **self.stats,
+            "shards": self.shards,
+            "queued": sum(queue.qsize() for queue in self._queues),
+        }
@@ -0,0 +1,141 @@
+"""Keyset pagination for the list endpoints.
+
+List endpoints accept `?limit=&after=`. A page is fetched with the list's own
+filter plus "sort key greater than the last row of the previous page", sorted
+on keys that are indexed (see db_indexes.py) and always end in _id, so each
+page costs one bounded index range scan however many records the hospital has.
+
+Responses stay plain JSON arrays; when there are more rows the opaque cursor
+for the next page is returned in the X-Next-Cursor header. The cursor is the
+last row's sort-key values as base64url-encoded extended JSON, so ObjectIds
+and datetimes round-trip exactly. Without `limit` and `after` an endpoint
+returns the whole list as before.
+"""
+import base64
+import os
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from bson import json_util
+from fastapi import HTTPException, Query, Response
+
+from projection import is_subpath, project_paths
+
+PAGE_DEFAULT_LIMIT = int(os.environ.get("PAGE_DEFAULT_LIMIT", "100"))
+PAGE_MAX_LIMIT = int(os.environ.get("PAGE_MAX_LIMIT", "500"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+Sort = Sequence[Tuple[str, int]]
+
+
+class PageRequest(NamedTuple):
+    limit: int
+    after: Optional[Dict[str, Any]]  # decoded cursor: {"k": sort fields, "v": their values}
+
+
+class Page(NamedTuple):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(sort: Sort, document: Dict[str, Any]) -> str:
+    fields = [field for field, _ in sort]
+    raw = json_util.dumps({"k": fields, "v": [document.get(field) for field in fields]})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        decoded = json_util.loads(raw)
+    except Exception:
+        raise ValueError("Malformed cursor")
+    if not isinstance(decoded, dict) or not isinstance(decoded.get("k"), list) or not isinstance(decoded.get("v"), list) \
+            or len(decoded["k"]) != len(decoded["v"]):
+        raise ValueError("Malformed cursor")
+    return decoded
+
+
+def page_params(
+    limit: Optional[int] = Query(None, ge=1, le=PAGE_MAX_LIMIT, description="Page size; enables pagination"),
+    after: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+) -> Optional[PageRequest]:
+    """FastAPI dependency: None when the caller wants the whole list."""
+    if limit is None and after is None:
+        return None
+    try:
+        decoded = decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    return PageRequest(limit or PAGE_DEFAULT_LIMIT, decoded)
+
+
+def after_filter(sort: Sort, values: List[Any]) -> Dict[str, Any]:
+    """Rows strictly after `values` in `sort` order: (a > x) or (a == x and b > y) or ..."""
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        branch = {sort[j][0]: values[j] for j in range(i)}
+        branch[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        branches.append(branch)
+    return {"$or": branches}
+
+
+async def find_page(collection, filter: Dict[str, Any], sort: Sort, page: Optional[PageRequest],
+                    fields: Optional[Sequence[str]] = None) -> Page:
+    """One page of `collection.find(filter)` in `sort` order, or everything when `page` is None.
+
+    With `fields` only those fields (and _id) are fetched; see projection.py.
+    """
+    projection = None
+    if fields is not None:
+        # Sort keys are fetched too so the next cursor can be built, then dropped.
+        # A sort key replaces requested sub-paths of itself, which would
+        # otherwise collide with it in the projection
+        projection = {field: 1 for field in fields}
+        for key, _ in sort:
+            if any(is_subpath(key, field) for field in fields):
+                continue
+            for field in [field for field in projection if is_subpath(field, key)]:
+                del projection[field]
+            projection[key] = 1
+
+    if page is None:
+        items = await collection.find(filter, projection).sort(list(sort)).to_list(length=None)
+        return Page(strip_unrequested(items, sort, fields), None)
+
+    query = filter
+    if page.after is not None:
+        if page.after["k"] != [field for field, _ in sort]:
+            raise HTTPException(status_code=400, detail="Pagination cursor belongs to a different list")
+        query = {"$and": [filter, after_filter(sort, page.after["v"])]}
+
+    # One extra row tells whether there is a next page
+    items = await collection.find(query, projection).sort(list(sort)).limit(page.limit + 1).to_list(length=page.limit + 1)
+    if len(items) <= page.limit:
+        return Page(strip_unrequested(items, sort, fields), None)
+    items = items[:page.limit]
+    next_cursor = encode_cursor(sort, items[-1])
+    return Page(strip_unrequested(items, sort, fields), next_cursor)
+
+
+def strip_unrequested(items: List[Dict[str, Any]], sort: Sort, fields: Optional[Sequence[str]]) -> List[Dict[str, Any]]:
+    """Remove sort keys that were only fetched for the cursor, keeping any requested sub-paths of them."""
+    if fields is None:
+        return items
+    for key, _ in sort:
+        if key == "_id" or any(is_subpath(key, field) for field in fields):
+            continue
+        wanted = [field[len(key) + 1:] for field in fields if is_subpath(field, key)]
+        for item in items:
+            value = item.pop(key, None)
+            if wanted:
+                projected = project_paths(value, wanted)
+                if projected is not None:
+                    item[key] = projected
+    return items
+
+
+def paginated(response: Response, page: Page) -> List[Dict[str, Any]]:
+    """Response body for a page; the next cursor goes in a header so the body stays a plain list."""
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+    return page.items
@@ -0,0 +1,90 @@
+"""`?fields=` projections for the list endpoints.
+
+A list endpoint called with `?fields=first_name,last_name,room_number` only
+fetches those fields from Mongo (plus `_id`), instead of whole documents.
+`summary` expands to a compact predefined set for the collection, e.g. what
+the patient sidebar shows, and can be combined with other fields:
+`?fields=summary,phone`. Without `fields` the full documents are returned.
+
+Mongo rejects a projection holding both a path and one of its sub-paths
+(`name` and `name.first`), so a sub-path of a requested field is dropped: the
+parent already returns it.
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, Query
+
+# Compact field sets for list views
+SUMMARY_FIELDS = {
+    "patients": ["id", "first_name", "last_name", "room_number", "bed_number", "department_id", "is_active"],
+    "users": ["firebase_uid", "display_name", "email", "role", "department_id"],
+    "departments": ["name", "hospital_id", "head_uid"],
+    "appointments": ["patient_id", "user_id", "title", "appointment_date", "duration_minutes", "status", "room"],
+}
+
+MAX_FIELDS = 50
+FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z0-9_]+)*$")
+
+
+def parse_fields(value: Optional[str], collection: str) -> Optional[List[str]]:
+    """'summary,phone' -> the collection's summary fields plus phone; None means all fields."""
+    if value is None or not value.strip():
+        return None
+    fields: List[str] = []
+    for name in (part.strip() for part in value.split(",")):
+        if not name:
+            continue
+        expanded = SUMMARY_FIELDS[collection] if name == "summary" else [name]
+        for field in expanded:
+            if not FIELD_NAME.match(field):
+                raise ValueError(f"Invalid field name: {field}")
+            if field not in fields:
+                fields.append(field)
+    fields = [field for field in fields if not any(is_subpath(field, other) for other in fields if other != field)]
+    if len(fields) > MAX_FIELDS:
+        raise ValueError(f"At most {MAX_FIELDS} fields can be requested")
+    return fields or None
+
+
+def is_subpath(path: str, parent: str) -> bool:
+    """True if `path` is `parent` or lies inside it ('name.first' in 'name')."""
+    return path == parent or path.startswith(parent + ".")
+
+
+def project_paths(value: Any, paths: Sequence[str]) -> Any:
+    """`value` cut down to the dotted `paths`, as a Mongo projection would; None when nothing is left."""
+    if isinstance(value, list):
+        return [projected for projected in (project_paths(item, paths) for item in value) if projected is not None]
+    if not isinstance(value, dict):
+        return None
+    by_head: Dict[str, List[str]] = {}
+    for path in paths:
+        head, _, rest = path.partition(".")
+        by_head.setdefault(head, []).append(rest)
+    result = {}
+    for head, rests in by_head.items():
+        if head not in value:
+            continue
+        if "" in rests:
+            result[head] = value[head]
+        else:
+            projected = project_paths(value[head], rests)
+            if projected is not None:
+                result[head] = projected
+    return result
+
+
+def fields_param(collection: str) -> Callable[..., Optional[List[str]]]:
+    """FastAPI dependency parsing `?fields=` for a list of `collection` documents."""
+    def dependency(
+        fields: Optional[str] = Query(
+            None,
+            description=f"Comma-separated fields to return; 'summary' = {', '.join(SUMMARY_FIELDS[collection])}",
+        ),
+    ) -> Optional[List[str]]:
+        try:
+            return parse_fields(fields, collection)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return dependency
@@ -0,0 +1,73 @@
+"""Shared Mongo access for the service modules.
+
+Each service reads and writes its collection through a `Repository`, so the
+query patterns live in one place:
+
+- a mutation is one `find_one_and_update(..., return_document=AFTER)` that
+  returns the updated document (or None when nothing matched), instead of
+  find_one -> update_one -> find_one;
+- every document leaving the layer goes through `serialize`, which turns its
+  ObjectId `_id` into a string, so routers can return it as JSON.
+
+benchmarks/bench_mutations.py measures round-trips and latency per mutation.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument
+
+import mongo_config
+from pagination import Page, PageRequest, Sort, find_page
+
+
+def serialize(document: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Convert the ObjectId _id to a string for JSON serialization (in place)."""
+    if document is not None and isinstance(document.get("_id"), ObjectId):
+        document["_id"] = str(document["_id"])
+    return document
+
+
+class Repository:
+    def __init__(self, collection_name: str):
+        self.collection_name = collection_name
+
+    @property
+    def collection(self) -> AsyncIOMotorCollection:
+        return mongo_config.get_database()[self.collection_name]
+
+    async def insert(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        result = await self.collection.insert_one(document)
+        document["_id"] = result.inserted_id
+        return serialize(document)
+
+    async def insert_many(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        result = await self.collection.insert_many(documents)
+        for document, inserted_id in zip(documents, result.inserted_ids):
+            document["_id"] = inserted_id
+            serialize(document)
+        return documents
+
+    async def find_one(self, filter: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return serialize(await self.collection.find_one(filter))
+
+    async def find_page(self, filter: Dict[str, Any], sort: Sort, page: Optional[PageRequest] = None,
+                        fields: Optional[List[str]] = None) -> Page:
+        result = await find_page(self.collection, filter, sort, page, fields)
+        for document in result.items:
+            serialize(document)
+        return result
+
+    async def update(self, filter: Dict[str, Any], changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """$set `changes` (stamping updated_at) on the first match; returns it updated, or None."""
+        updated = await self.collection.find_one_and_update(
+            filter,
+            {"$set": {**changes, "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER,
+        )
+        return serialize(updated)
+
+    async def delete(self, filter: Dict[str, Any]) -> bool:
+        result = await self.collection.delete_one(filter)
+        return result.deleted_count > 0
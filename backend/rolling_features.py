@@ -0,0 +1,140 @@
+"""Per-patient rolling-window vital features for real monitor mode.
+
+The vitals model was trained on windowed summaries (HR_mean, HR_std, HR_min,
+HR_max, ... in data/summary_features*.csv), while monitors send instantaneous
+readings. `RollingFeatureAggregator` keeps, for every patient and vital, the
+readings of the last `window_seconds` and turns each new reading into the
+window's mean/std/min/max:
+
+- mean and variance come from Welford accumulators that are updated as a
+  reading enters and reverse-updated as it leaves the window;
+- min and max come from monotonic deques.
+
+Every update is O(1) amortized; history is never rescanned.
+"""
+import math
+from collections import deque
+from typing import Deque, Dict, Optional, Sequence, Tuple
+
+# Standardized reading fields the windows are built from ("hr_mean" -> hr_*)
+WINDOW_VITALS = ("hr", "spo2", "sbp", "dbp", "rr")
+
+# Sweep for idle patients once per this many updates
+PRUNE_EVERY = 1024
+
+
+class RollingStat:
+    """Sliding-window mean/std/min/max of one vital."""
+
+    __slots__ = ("values", "count", "mean", "m2", "mins", "maxs")
+
+    def __init__(self):
+        self.values: Deque[Tuple[float, float]] = deque()
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.mins: Deque[Tuple[float, float]] = deque()  # increasing values
+        self.maxs: Deque[Tuple[float, float]] = deque()  # decreasing values
+
+    def add(self, t: float, value: float):
+        self.values.append((t, value))
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        while self.mins and self.mins[-1][1] >= value:
+            self.mins.pop()
+        self.mins.append((t, value))
+        while self.maxs and self.maxs[-1][1] <= value:
+            self.maxs.pop()
+        self.maxs.append((t, value))
+
+    def expire(self, cutoff: float):
+        """Drop readings taken before `cutoff`."""
+        values = self.values
+        while values and values[0][0] < cutoff:
+            _, value = values.popleft()
+            self.count -= 1
+            if self.count == 0:
+                self.mean = self.m2 = 0.0
+                continue
+            delta = value - self.mean
+            self.mean -= delta / self.count
+            self.m2 -= delta * (value - self.mean)
+        while self.mins and self.mins[0][0] < cutoff:
+            self.mins.popleft()
+        while self.maxs and self.maxs[0][0] < cutoff:
+            self.maxs.popleft()
+
+    def push(self, t: float, value: Optional[float], cutoff: float) -> Optional[Tuple[float, float, float, float]]:
+        """add() (unless value is None or NaN), expire() and summary() in one call."""
+        if value is not None and value == value:
+            self.add(t, float(value))
+        if self.values and self.values[0][0] < cutoff:
+            self.expire(cutoff)
+        return self.summary()
+
+    def summary(self) -> Optional[Tuple[float, float, float, float]]:
+        """(mean, std, min, max); std is the sample std like pandas, 0 for one reading."""
+        if not self.count:
+            return None
+        variance = self.m2 / (self.count - 1) if self.count > 1 else 0.0
+        return self.mean, math.sqrt(max(variance, 0.0)), self.mins[0][1], self.maxs[0][1]
+
+
+class RollingFeatureAggregator:
+    """patient_id -> rolling window per vital."""
+
+    def __init__(self, window_seconds: float, vitals: Sequence[str] = WINDOW_VITALS):
+        self.window_seconds = window_seconds
+        self.vitals = tuple(vitals)
+        # (vital, mean, std, min, max feature names); readings carry the vital under its mean name
+        self._names = tuple(
+            (vital, f"{vital}_mean", f"{vital}_std", f"{vital}_min", f"{vital}_max") for vital in self.vitals
+        )
+        self._patients: Dict[str, Dict[str, RollingStat]] = {}
+        self._last_seen: Dict[str, float] = {}
+        self._updates = 0
+
+    def update(self, patient_id: str, t: float, reading: Dict[str, Optional[float]]) -> Dict[str, Optional[float]]:
+        """Add one standardized reading taken at epoch seconds `t`; return the window features.
+
+        Features are named like the training data, lowercased: hr_mean,
+        hr_std, hr_min, hr_max, ... A vital with no reading in the window maps
+        to None.
+        """
+        stats = self._patients.get(patient_id)
+        if stats is None:
+            stats = self._patients[patient_id] = {vital: RollingStat() for vital in self.vitals}
+        # Late readings are treated as current so each window stays time-ordered
+        t = max(t, self._last_seen.get(patient_id, t))
+        self._last_seen[patient_id] = t
+        cutoff = t - self.window_seconds
+
+        features: Dict[str, Optional[float]] = {}
+        for vital, mean_name, std_name, min_name, max_name in self._names:
+            summary = stats[vital].push(t, reading.get(mean_name), cutoff)
+            if summary is None:
+                features[mean_name] = features[std_name] = features[min_name] = features[max_name] = None
+            else:
+                features[mean_name], features[std_name], features[min_name], features[max_name] = summary
+
+        self._updates += 1
+        if self._updates % PRUNE_EVERY == 0:
+            self.prune(t)
+        return features
+
+    def last_seen(self, patient_id: str) -> Optional[float]:
+        """Time of the patient's newest reading, or None if the patient isn't tracked."""
+        return self._last_seen.get(patient_id)
+
+    def prune(self, now: float):
+        """Forget patients with no reading inside the window."""
+        cutoff = now - self.window_seconds
+        for patient_id, last_seen in list(self._last_seen.items()):
+            if last_seen < cutoff:
+                del self._last_seen[patient_id]
+                del self._patients[patient_id]
+
+    def __len__(self):
+        return len(self._patients)
@@ -4,6 +4,8 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 import mongo_config
+from monitor_processor import UniversalMonitorProcessor
+from routers.monitor_data import get_monitor_processor
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -168,7 +170,10 @@ async def quick_admit_patient(patient: QuickAdmitModel) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Failed to admit patient: {str(e)}")
 
 @router.post("/assign-monitor-auto")
-async def auto_assign_monitor(assignment: AutoAssignModel) -> Dict[str, Any]:
+async def auto_assign_monitor(
+    assignment: AutoAssignModel,
+    processor: UniversalMonitorProcessor = Depends(get_monitor_processor)
+) -> Dict[str, Any]:
     """Automatically assign the best available monitor to patient."""
     try:
         db = mongo_config.get_database()
@@ -211,6 +216,8 @@ async def auto_assign_monitor(assignment: AutoAssignModel) -> Dict[str, Any]:
         }
 
         await device_assignments_collection.insert_one(assignment_doc)
+        processor.routes.invalidate(selected_device["device_id"])
+        await processor.unassigned.forget(selected_device["device_id"])
 
         return {
             "status": "success",
@@ -227,7 +234,10 @@ async def auto_assign_monitor(assignment: AutoAssignModel) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Auto-assignment failed: {str(e)}")
 
 @router.post("/assign-monitor-specific")
-async def manual_assign_monitor(assignment: ManualAssignModel) -> Dict[str, Any]:
+async def manual_assign_monitor(
+    assignment: ManualAssignModel,
+    processor: UniversalMonitorProcessor = Depends(get_monitor_processor)
+) -> Dict[str, Any]:
     """Manually assign a specific monitor to patient."""
     try:
         db = mongo_config.get_database()
@@ -254,6 +264,8 @@ async def manual_assign_monitor(assignment: ManualAssignModel) -> Dict[str, Any]
         }
 
         await device_assignments_collection.insert_one(assignment_doc)
+        processor.routes.invalidate(assignment.device_id)
+        await processor.unassigned.forget(assignment.device_id)
 
         return {
             "status": "success",
@@ -268,7 +280,10 @@ async def manual_assign_monitor(assignment: ManualAssignModel) -> Dict[str, Any]
         raise HTTPException(status_code=500, detail=f"Manual assignment failed: {str(e)}")
 
 @router.post("/reassign-monitor")
-async def reassign_monitor(reassignment: ReassignModel) -> Dict[str, Any]:
+async def reassign_monitor(
+    reassignment: ReassignModel,
+    processor: UniversalMonitorProcessor = Depends(get_monitor_processor)
+) -> Dict[str, Any]:
     """Reassign monitor from one patient to another."""
     try:
         db = mongo_config.get_database()
@@ -307,6 +322,7 @@ async def reassign_monitor(reassignment: ReassignModel) -> Dict[str, Any]:
         }
 
         await device_assignments_collection.insert_one(new_assignment)
+        processor.routes.invalidate(reassignment.old_device_id)
 
         return {
             "status": "success",
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 # Import with absolute imports
 from models import AppointmentCreate
 import appointment_service
+from pagination import PageRequest, page_params, paginated
+from projection import fields_param
 
 router = APIRouter(prefix="/appointments", tags=["appointments"])
 
@@ -22,28 +24,34 @@ async def get_appointment(appointment_id: str):
     return appointment
 
 @router.get("/hospital/{hospital_id}", response_model=List[Dict[str, Any]])
-async def get_appointments_by_hospital(hospital_id: str):
+async def get_appointments_by_hospital(hospital_id: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                                       fields: Optional[List[str]] = Depends(fields_param("appointments"))):
     """Get all appointments for a hospital"""
-    return await appointment_service.get_appointments_by_hospital(hospital_id)
+    return paginated(response, await appointment_service.get_appointments_by_hospital(hospital_id, page, fields))
 
 @router.get("/patient/{patient_id}", response_model=List[Dict[str, Any]])
-async def get_appointments_by_patient(patient_id: str):
+async def get_appointments_by_patient(patient_id: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                                      fields: Optional[List[str]] = Depends(fields_param("appointments"))):
     """Get all appointments for a patient"""
-    return await appointment_service.get_appointments_by_patient(patient_id)
+    return paginated(response, await appointment_service.get_appointments_by_patient(patient_id, page, fields))
 
 @router.get("/user/{user_id}", response_model=List[Dict[str, Any]])
-async def get_appointments_by_user(user_id: str):
+async def get_appointments_by_user(user_id: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                                   fields: Optional[List[str]] = Depends(fields_param("appointments"))):
     """Get all appointments for a user (doctor/nurse)"""
-    return await appointment_service.get_appointments_by_user(user_id)
+    return paginated(response, await appointment_service.get_appointments_by_user(user_id, page, fields))
 
 @router.get("/hospital/{hospital_id}/date-range", response_model=List[Dict[str, Any]])
 async def get_appointments_by_date_range(
     hospital_id: str,
+    response: Response,
     start_date: datetime = Query(..., description="Start date for the range"),
-    end_date: datetime = Query(..., description="End date for the range")
+    end_date: datetime = Query(..., description="End date for the range"),
+    page: Optional[PageRequest] = Depends(page_params),
+    fields: Optional[List[str]] = Depends(fields_param("appointments"))
 ):
     """Get appointments within a date range for a hospital"""
-    return await appointment_service.get_appointments_by_date_range(hospital_id, start_date, end_date)
+    return paginated(response, await appointment_service.get_appointments_by_date_range(hospital_id, start_date, end_date, page, fields))
 
 @router.put("/{appointment_id}", response_model=Dict[str, Any])
 async def update_appointment(
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Response
+from typing import List, Dict, Any, Optional
 
 # Import with absolute imports
 from models import DepartmentCreate
 import department_service
+from pagination import PageRequest, page_params, paginated
+from projection import fields_param
 
 router = APIRouter(prefix="/departments", tags=["departments"])
 
@@ -21,9 +23,10 @@ async def get_department(department_id: str):
     return department
 
 @router.get("/hospital/{hospital_id}", response_model=List[Dict[str, Any]])
-async def get_departments_by_hospital(hospital_id: str):
+async def get_departments_by_hospital(hospital_id: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                                      fields: Optional[List[str]] = Depends(fields_param("departments"))):
     """Get all departments for a hospital"""
-    return await department_service.get_departments_by_hospital(hospital_id)
+    return paginated(response, await department_service.get_departments_by_hospital(hospital_id, page, fields))
 
 @router.put("/{department_id}", response_model=Dict[str, Any])
 async def update_department(
@@ -48,11 +51,13 @@ async def assign_department_head(
     return department
 
 @router.get("/{department_id}/users", response_model=List[Dict[str, Any]])
-async def get_department_users(department_id: str):
+async def get_department_users(department_id: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                               fields: Optional[List[str]] = Depends(fields_param("users"))):
     """Get all users assigned to a department"""
-    return await department_service.get_department_users(department_id)
+    return paginated(response, await department_service.get_department_users(department_id, page, fields))
 
 @router.get("/{department_id}/patients", response_model=List[Dict[str, Any]])
-async def get_department_patients(department_id: str):
+async def get_department_patients(department_id: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                                  fields: Optional[List[str]] = Depends(fields_param("patients"))):
     """Get all patients assigned to a department"""
-    return await department_service.get_department_patients(department_id)
+    return paginated(response, await department_service.get_department_patients(department_id, page, fields))
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Response
+from typing import List, Dict, Any, Optional
 
 # Import with absolute imports
 from models import HospitalCreate
 import hospital_service
+from pagination import PageRequest, page_params, paginated
+from projection import fields_param
 
 router = APIRouter(prefix="/hospitals", tags=["hospitals"])
 
@@ -45,21 +47,25 @@ async def update_hospital(
     return hospital
 
 @router.get("/{hospital_id}/users", response_model=List[Dict[str, Any]])
-async def get_hospital_users(hospital_id: str):
+async def get_hospital_users(hospital_id: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                             fields: Optional[List[str]] = Depends(fields_param("users"))):
     """Get all users for a hospital"""
-    return await hospital_service.get_hospital_users(hospital_id)
+    return paginated(response, await hospital_service.get_hospital_users(hospital_id, page, fields))
 
 @router.get("/{hospital_id}/patients", response_model=List[Dict[str, Any]])
-async def get_hospital_patients(hospital_id: str):
+async def get_hospital_patients(hospital_id: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                                fields: Optional[List[str]] = Depends(fields_param("patients"))):
     """Get all patients for a hospital"""
-    return await hospital_service.get_hospital_patients(hospital_id)
+    return paginated(response, await hospital_service.get_hospital_patients(hospital_id, page, fields))
 
 @router.get("/{hospital_id}/departments", response_model=List[Dict[str, Any]])
-async def get_hospital_departments(hospital_id: str):
+async def get_hospital_departments(hospital_id: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                                   fields: Optional[List[str]] = Depends(fields_param("departments"))):
     """Get all departments for a hospital"""
-    return await hospital_service.get_hospital_departments(hospital_id)
+    return paginated(response, await hospital_service.get_hospital_departments(hospital_id, page, fields))
 
 @router.get("/{hospital_id}/appointments", response_model=List[Dict[str, Any]])
-async def get_hospital_appointments(hospital_id: str):
+async def get_hospital_appointments(hospital_id: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                                    fields: Optional[List[str]] = Depends(fields_param("appointments"))):
     """Get all appointments for a hospital"""
-    return await hospital_service.get_hospital_appointments(hospital_id)
+    return paginated(response, await hospital_service.get_hospital_appointments(hospital_id, page, fields))
@@ -1,13 +1,57 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import Dict, Any, List
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Request, Query, WebSocket, WebSocketDisconnect
+from starlette.requests import HTTPConnection
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
+import asyncio
+import hmac
 import json
+import os
+
+try:
+    import msgpack
+except ImportError:  # binary frames on /stream are rejected without it
+    msgpack = None
 
 from monitor_processor import UniversalMonitorProcessor
+from ingest_parsing import iter_json_array, iter_ndjson
+from line_ingest import epoch_timestamp, line_stats
+from admission import AdmissionController, AdmissionRejected
 
 router = APIRouter(prefix="/monitor-data", tags=["monitor-data"])
 
+# Records processed (scored and written) together by /ingest-batch and /stream
+BATCH_CHUNK_SIZE = 256
+# Shared secret devices present in their /stream hello frame; unset leaves it open like /ingest
+INGEST_DEVICE_TOKEN = os.environ.get("INGEST_DEVICE_TOKEN")
+STREAM_HELLO_TIMEOUT_SECONDS = 10
+# Frames read ahead of processing per connection; when full we stop reading the socket
+STREAM_QUEUE_SIZE = int(os.environ.get("STREAM_QUEUE_SIZE", "1024"))
+
+# Admission control for the HTTP ingest endpoints (see admission.py)
+INGEST_MAX_IN_FLIGHT = int(os.environ.get("INGEST_MAX_IN_FLIGHT", "32"))
+INGEST_MAX_QUEUE = int(os.environ.get("INGEST_MAX_QUEUE", "256"))
+INGEST_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("INGEST_QUEUE_TIMEOUT_SECONDS", "5"))
+INGEST_RETRY_AFTER_SECONDS = int(os.environ.get("INGEST_RETRY_AFTER_SECONDS", "1"))
+
+admission = AdmissionController(
+    INGEST_MAX_IN_FLIGHT, INGEST_MAX_QUEUE, INGEST_QUEUE_TIMEOUT_SECONDS, INGEST_RETRY_AFTER_SECONDS
+)
+
+stream_stats = {"connections": 0, "active": 0, "frames": 0, "rejected_frames": 0, "auth_failures": 0}
+
+def get_monitor_processor(request: HTTPConnection) -> UniversalMonitorProcessor:
+    """The application-scoped processor, so the model is loaded once and caches are shared.
+
+    main.on_startup creates it after MongoDB is connected; apps that skip
+    startup (tests, benchmarks) get one created on first use.
+    """
+    processor = getattr(request.app.state, "monitor_processor", None)
+    if processor is None:
+        processor = UniversalMonitorProcessor()
+        request.app.state.monitor_processor = processor
+    return processor
+
 class DeviceDataMapping(BaseModel):
     name: str
     device_type: str
@@ -21,24 +65,121 @@ class RawVitalData(BaseModel):
     timestamp: datetime = None
     data: Dict[str, Any]  # Raw vital data in any format
     device_type: str = "unknown"
+    priority: str = "normal"  # "critical" is admitted ahead of queued readings
+
+def is_critical(request: Request, raw_data: RawVitalData = None) -> bool:
+    """Critical via the reading's priority field or an X-Ingest-Priority: critical header"""
+    if raw_data is not None and raw_data.priority == "critical":
+        return True
+    return request.headers.get("x-ingest-priority", "").lower() == "critical"
+
+def shed_response(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code=429, detail=e.reason, headers={"Retry-After": str(int(e.retry_after))})
 
 # Universal data ingestion endpoint
 @router.post("/ingest")
-async def ingest_monitor_data(raw_data: RawVitalData):
+async def ingest_monitor_data(raw_data: RawVitalData, request: Request, processor: UniversalMonitorProcessor = Depends(get_monitor_processor)):
     """Universal endpoint that accepts vital data from ANY ICU monitor"""
 
     if raw_data.timestamp is None:
         raw_data.timestamp = datetime.utcnow()
 
-    # Process through universal pipeline
-    processor = UniversalMonitorProcessor()
-    result = await processor.process_monitor_data(raw_data)
+    # Process through universal pipeline, within the ingest admission limits
+    try:
+        async with admission.admit(is_critical(request, raw_data)):
+            result = await processor.submit_monitor_data(raw_data)
+    except AdmissionRejected as e:
+        raise shed_response(e)
 
     return result
 
+def summarize_batch_result(index: int, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact per-record status for batch responses"""
+    summary = {"index": index, "status": result.get("status")}
+    for key in ("device_id", "patient_id", "message", "error"):
+        if result.get(key) is not None:
+            summary[key] = result[key]
+    ai_result = result.get("ai_result") or {}
+    if "risk_score_percent" in ai_result:
+        summary["risk_score_percent"] = ai_result["risk_score_percent"]
+        summary["is_at_risk"] = ai_result["is_at_risk"]
+    return summary
+
+# Batch ingestion endpoint for gateways relaying many beds
+@router.post("/ingest-batch")
+async def ingest_monitor_batch(request: Request, processor: UniversalMonitorProcessor = Depends(get_monitor_processor)):
+    """Accept many readings in one request: a JSON array of RawVitalData, or an
+    NDJSON body (Content-Type: application/x-ndjson) with one reading per line.
+
+    The body is parsed as it streams in and processed in chunks with one model
+    call and one bulk write each. Returns a status per record, in input order.
+    A whole batch takes one admission slot; send X-Ingest-Priority: critical
+    to have it admitted ahead of queued requests.
+    """
+    try:
+        async with admission.admit(is_critical(request)):
+            return await process_ingest_batch(request, processor)
+    except AdmissionRejected as e:
+        raise shed_response(e)
+
+async def process_ingest_batch(request: Request, processor: UniversalMonitorProcessor) -> Dict[str, Any]:
+    """Parse and process an /ingest-batch body (admission already granted)"""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonl" in content_type:
+        records = iter_ndjson(request.stream())
+    else:
+        records = iter_json_array(request.stream())
+
+    results: List[Dict[str, Any]] = []
+    pending: List[tuple] = []  # (index, RawVitalData)
+    count = 0
+
+    async def flush():
+        processed = await processor.process_monitor_batch([raw_data for _, raw_data in pending])
+        results.extend(summarize_batch_result(index, result) for (index, _), result in zip(pending, processed))
+        pending.clear()
+
+    parse_error = None
+    try:
+        async for record, error in records:
+            index = count
+            count += 1
+            if error is None:
+                try:
+                    raw_data = RawVitalData(**record)
+                except Exception as e:
+                    error = f"Invalid reading: {e}"
+            if error is not None:
+                results.append({"index": index, "status": "error", "error": error})
+                continue
+
+            if raw_data.timestamp is None:
+                raw_data.timestamp = datetime.utcnow()
+            pending.append((index, raw_data))
+            if len(pending) >= BATCH_CHUNK_SIZE:
+                await flush()
+    except ValueError as e:
+        # A broken JSON array can't be resynchronized; keep what was parsed
+        parse_error = str(e)
+
+    if pending:
+        await flush()
+    results.sort(key=lambda r: r["index"])
+
+    failed = sum(1 for r in results if r["status"] == "error")
+    response = {
+        "status": "partial" if parse_error or failed else "success",
+        "received": count,
+        "failed": failed,
+        "results": results,
+    }
+    if parse_error:
+        response["error"] = parse_error
+    return response
+
 # Test endpoint that accepts any JSON
 @router.post("/test-ingest")
-async def test_ingest_monitor_data(data: Dict[str, Any]):
+async def test_ingest_monitor_data(data: Dict[str, Any], request: Request, processor: UniversalMonitorProcessor = Depends(get_monitor_processor)):
     """Test endpoint for trying different monitor data formats"""
 
     # Create RawVitalData from free-form JSON
@@ -46,11 +187,15 @@ async def test_ingest_monitor_data(data: Dict[str, Any]):
         device_id=data.get("device_id", "test_device"),
         timestamp=data.get("timestamp", datetime.utcnow()),
         data=data.get("data", data),  # Allow data at root level too
-        device_type=data.get("device_type", "unknown")
+        device_type=data.get("device_type", "unknown"),
+        priority=data.get("priority", "normal")
     )
 
-    processor = UniversalMonitorProcessor()
-    result = await processor.process_monitor_data(raw_data)
+    try:
+        async with admission.admit(is_critical(request, raw_data)):
+            result = await processor.submit_monitor_data(raw_data)
+    except AdmissionRejected as e:
+        raise shed_response(e)
 
     return {
         "status": "success",
@@ -58,30 +203,226 @@ async def test_ingest_monitor_data(data: Dict[str, Any]):
         "original_data": data
     }
 
+def decode_stream_message(message: Dict[str, Any]) -> Any:
+    """Decode a WebSocket message: text frames are JSON, binary frames MessagePack"""
+    if message.get("text") is not None:
+        try:
+            return json.loads(message["text"])
+        except ValueError as e:
+            raise ValueError(f"Malformed JSON frame: {e}")
+    if msgpack is None:
+        raise ValueError("MessagePack frames are not supported by this server")
+    try:
+        return msgpack.unpackb(message.get("bytes") or b"", raw=False, timestamp=3)
+    except Exception as e:
+        raise ValueError(f"Malformed MessagePack frame: {e}")
+
+def parse_stream_timestamp(value: Any) -> datetime:
+    """Frame timestamps may be ISO strings, epoch seconds or MessagePack timestamps"""
+    if value is None:
+        return datetime.utcnow()
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)):
+        # Same guards as the line protocol: inf/nan or out-of-range epochs are a ValueError
+        return epoch_timestamp(value)
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    raise ValueError("Invalid timestamp")
+
+def stream_reading(frame: Any, device: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a /stream frame into the raw reading dict the processor accepts.
+
+    Frames carry just {"data": {...}} plus optional "timestamp" and "seq";
+    device_id and device_type come from the hello frame unless a gateway
+    overrides them per frame.
+    """
+    if not isinstance(frame, dict) or not isinstance(frame.get("data"), dict):
+        raise ValueError("Frame must be an object with a 'data' object")
+    return {
+        "device_id": str(frame.get("device_id") or device["device_id"]),
+        "device_type": frame.get("device_type") or device["device_type"],
+        "data": frame["data"],
+        "timestamp": parse_stream_timestamp(frame.get("timestamp")),
+    }
+
+async def authenticate_stream(websocket: WebSocket) -> Optional[Dict[str, Any]]:
+    """Wait for the hello frame; returns the device, or None after closing the socket"""
+    try:
+        message = await asyncio.wait_for(websocket.receive(), STREAM_HELLO_TIMEOUT_SECONDS)
+        if message["type"] == "websocket.disconnect":
+            return None
+        hello = decode_stream_message(message)
+    except (asyncio.TimeoutError, ValueError):
+        hello = None
+
+    if not isinstance(hello, dict) or hello.get("type") != "hello" or not hello.get("device_id"):
+        stream_stats["auth_failures"] += 1
+        await websocket.close(code=1008, reason="Expected hello frame with device_id")
+        return None
+    if INGEST_DEVICE_TOKEN and not hmac.compare_digest(str(hello.get("token", "")).encode(), INGEST_DEVICE_TOKEN.encode()):
+        stream_stats["auth_failures"] += 1
+        await websocket.close(code=1008, reason="Invalid device token")
+        return None
+
+    return {
+        "device_id": str(hello["device_id"]),
+        "device_type": hello.get("device_type", "unknown"),
+        "ack": bool(hello.get("ack", False)),
+    }
+
+# Persistent ingest channel for high-frequency devices and gateways
+@router.websocket("/stream")
+async def stream_monitor_data(websocket: WebSocket, processor: UniversalMonitorProcessor = Depends(get_monitor_processor)):
+    """Authenticate once, then push readings over one connection.
+
+    The first frame is {"type": "hello", "device_id", "device_type"?, "token"?, "ack"?}.
+    Every later frame is one reading, {"data": {...}, "timestamp"?, "seq"?}, as
+    JSON text or a MessagePack binary frame. Readings go through the same
+    pipeline as /ingest, batched when they arrive faster than they are
+    processed. With "ack": true every frame is answered with
+    {"type": "ack", "seq", "status", ...}; rejected frames always get
+    {"type": "error", "seq", "error"}.
+    """
+    await websocket.accept()
+    device = await authenticate_stream(websocket)
+    if device is None:
+        return
+    await websocket.send_json({"type": "ready", "device_id": device["device_id"], "ack": device["ack"]})
+
+    stream_stats["connections"] += 1
+    stream_stats["active"] += 1
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+
+    async def read_frames():
+        count = 0
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                count += 1
+                # Blocks while the queue is full, which stops us reading and pushes back on the device
+                await queue.put((count, message))
+        finally:
+            await queue.put(None)
+
+    reader = asyncio.create_task(read_frames())
+    try:
+        closed = False
+        while not closed:
+            items = [await queue.get()]
+            while not queue.empty() and len(items) < BATCH_CHUNK_SIZE:
+                items.append(queue.get_nowait())
+
+            readings: List[Tuple[Any, Dict[str, Any]]] = []
+            for item in items:
+                if item is None:
+                    closed = True
+                    break
+                seq, message = item
+                try:
+                    frame = decode_stream_message(message)
+                    if isinstance(frame, dict) and frame.get("seq") is not None:
+                        seq = frame["seq"]
+                    readings.append((seq, stream_reading(frame, device)))
+                except (ValueError, TypeError) as e:
+                    stream_stats["rejected_frames"] += 1
+                    await websocket.send_json({"type": "error", "seq": seq, "error": str(e)})
+
+            if not readings:
+                continue
+            stream_stats["frames"] += len(readings)
+            processed = await processor.process_monitor_batch([reading for _, reading in readings])
+            if device["ack"]:
+                for (seq, _), result in zip(readings, processed):
+                    summary = summarize_batch_result(seq, result)
+                    summary["seq"] = summary.pop("index")
+                    await websocket.send_json({"type": "ack", **summary})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+        stream_stats["active"] -= 1
+
+@router.get("/metrics")
+async def get_ingest_metrics(processor: UniversalMonitorProcessor = Depends(get_monitor_processor)):
+    """Ingest pipeline counters: device routing cache and write-behind buffers"""
+    return {
+        "device_routes": {**processor.routes.stats, "size": len(processor.routes)},
+        "field_transformers": {**processor.transformers.stats, "size": len(processor.transformers)},
+        "rolling_windows": {"patients": len(processor.windows), "window_seconds": processor.windows.window_seconds},
+        "realtime_writer": processor.realtime_writer.metrics(),
+        "history_writer": processor.history_writer.metrics(),
+        "unassigned_devices": processor.unassigned.metrics(),
+        "stream": dict(stream_stats),
+        "line_protocol": dict(line_stats),
+        "admission": admission.metrics(),
+        "ordering": {
+            **processor.ordered.metrics(),
+            "stale_dropped": processor.stale_dropped,
+            "future_rejected": processor.future_rejected,
+            "patients_tracked": len(processor.windows),
+        },
+        "dedup": {**processor.dedup.stats, "size": len(processor.dedup)},
+    }
+
+@router.get("/history/{patient_id}")
+async def get_patient_vitals_history(
+    patient_id: str,
+    start: datetime = None,
+    end: datetime = None,
+    limit: int = Query(5000, ge=1, le=50000),
+    processor: UniversalMonitorProcessor = Depends(get_monitor_processor)
+):
+    """Stored readings for a patient between start and end (UTC; default: the last hour)"""
+    if processor.mongo_client is None:
+        raise HTTPException(status_code=503, detail="Vitals history requires MongoDB")
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(hours=1)
+    # Buckets are stored as naive UTC
+    if end.tzinfo is not None:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    if start.tzinfo is not None:
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    readings = await processor.get_patient_vitals_history(patient_id, start, end, limit)
+    return {"patient_id": patient_id, "start": start.isoformat(), "end": end.isoformat(), "count": len(readings), "readings": readings}
+
 @router.get("/supported-devices")
-async def get_supported_devices():
+async def get_supported_devices(processor: UniversalMonitorProcessor = Depends(get_monitor_processor)):
     """Get list of configured device types and their mappings"""
-    processor = UniversalMonitorProcessor()
     mappings = await processor.get_all_mappings()
     return mappings
 
 @router.post("/device-mappings")
-async def create_device_mapping(mapping: DeviceDataMapping):
+async def create_device_mapping(mapping: DeviceDataMapping, processor: UniversalMonitorProcessor = Depends(get_monitor_processor)):
     """Create a new device field mapping"""
-    processor = UniversalMonitorProcessor()
     result = await processor.create_device_mapping(mapping.dict())
     return result
 
 @router.post("/device-assignments")
-async def create_device_assignment(assignment: Dict[str, Any]):
+async def create_device_assignment(assignment: Dict[str, Any], processor: UniversalMonitorProcessor = Depends(get_monitor_processor)):
     """Assign a device to a patient"""
-    processor = UniversalMonitorProcessor()
     result = await processor.create_device_assignment(assignment)
     return result
 
 @router.get("/unassigned-devices")
-async def get_unassigned_devices():
+async def get_unassigned_devices(
+    limit: int = Query(200, ge=1, le=1000),
+    processor: UniversalMonitorProcessor = Depends(get_monitor_processor)
+):
     """Get list of devices that sent data but aren't assigned to patients"""
-    processor = UniversalMonitorProcessor()
-    devices = await processor.get_unassigned_devices()
+    devices = await processor.get_unassigned_devices(limit)
     return devices
+
+@router.get("/unassigned-devices/{device_id}/samples")
+async def get_unassigned_device_samples(
+    device_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    processor: UniversalMonitorProcessor = Depends(get_monitor_processor)
+):
+    """Recent raw readings sampled from an unassigned device"""
+    samples = await processor.get_unassigned_device_samples(device_id, limit)
+    return samples
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Response
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 # Import with absolute imports
 from models import PatientCreate
 import patient_service
+from pagination import PageRequest, page_params, paginated
+from projection import fields_param
 
 router = APIRouter(prefix="/patients", tags=["patients"])
 
@@ -22,14 +24,16 @@ async def get_patient(patient_id: str):
     return patient
 
 @router.get("/hospital/{hospital_id}", response_model=List[Dict[str, Any]])
-async def get_patients_by_hospital(hospital_id: str):
+async def get_patients_by_hospital(hospital_id: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                                   fields: Optional[List[str]] = Depends(fields_param("patients"))):
     """Get all patients for a hospital"""
-    return await patient_service.get_patients_by_hospital(hospital_id)
+    return paginated(response, await patient_service.get_patients_by_hospital(hospital_id, page, fields))
 
 @router.get("/department/{department_id}", response_model=List[Dict[str, Any]])
-async def get_patients_by_department(department_id: str):
+async def get_patients_by_department(department_id: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                                     fields: Optional[List[str]] = Depends(fields_param("patients"))):
     """Get all patients for a department"""
-    return await patient_service.get_patients_by_department(department_id)
+    return paginated(response, await patient_service.get_patients_by_department(department_id, page, fields))
 
 @router.put("/{patient_id}", response_model=Dict[str, Any])
 async def update_patient(
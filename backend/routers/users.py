@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException, Depends, Response
+from typing import List, Dict, Any, Optional
 
 # Import with absolute imports
 from models import UserCreate
 import user_service
+from pagination import PageRequest, page_params, paginated
+from projection import fields_param
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -53,14 +55,16 @@ async def deactivate_user(firebase_uid: str):
     return {"message": "User deactivated successfully"}
 
 @router.get("/hospital/{hospital_id}/role/{role}", response_model=List[Dict[str, Any]])
-async def get_users_by_hospital_and_role(hospital_id: str, role: str):
+async def get_users_by_hospital_and_role(hospital_id: str, role: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                                         fields: Optional[List[str]] = Depends(fields_param("users"))):
     """Get users by hospital and role"""
-    return await user_service.get_users_by_hospital_and_role(hospital_id, role)
+    return paginated(response, await user_service.get_users_by_hospital_and_role(hospital_id, role, page, fields))
 
 @router.get("/hospital/{hospital_id}/staff", response_model=List[Dict[str, Any]])
-async def get_hospital_staff(hospital_id: str):
+async def get_hospital_staff(hospital_id: str, response: Response, page: Optional[PageRequest] = Depends(page_params),
+                             fields: Optional[List[str]] = Depends(fields_param("users"))):
     """Get all staff (doctors and nurses) for a hospital"""
-    return await user_service.get_hospital_staff(hospital_id)
+    return paginated(response, await user_service.get_hospital_staff(hospital_id, page, fields))
 
 @router.put("/{firebase_uid}/department/{department_id}", response_model=Dict[str, Any])
 async def assign_user_to_department(
@@ -0,0 +1,214 @@
+"""Bounded tracking of devices that send data before they are assigned.
+
+Each unassigned device has exactly one document in unassigned_device_status,
+keyed by device_id:
+
+    {"_id": device_id, "device_id", "device_type", "raw_data", "timestamp",
+     "first_seen", "last_seen", "count"}
+
+Readings are coalesced in a write-behind buffer, so a chatty device costs one
+upsert per flush, not one insert per reading. A few raw readings per device
+and flush can also be kept in unassigned_device_samples, a capped collection,
+so the whole feature has a fixed storage ceiling however many readings
+arrive.
+
+Before this, every reading was inserted into unassigned_devices. At startup
+`migrate_legacy` folds that collection into one status document per device
+and renames it out of the way, so devices already listed stay listed.
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from write_behind import WriteBehindBuffer
+
+STATUS_COLLECTION = "unassigned_device_status"
+SAMPLES_COLLECTION = "unassigned_device_samples"
+# One document per reading, written before the status collection existed
+LEGACY_COLLECTION = "unassigned_devices"
+
+
+class UnassignedDeviceTracker(WriteBehindBuffer):
+    """Coalesces unassigned-device readings into one status upsert per device per flush."""
+
+    def __init__(self, get_database: Callable[[], Any], flush_interval: float, max_pending: int,
+                 samples_per_flush: int, sample_max_bytes: int, sample_max_docs: int):
+        super().__init__(get_database, flush_interval, max_pending)
+        # Sampling is off when there is no room for it
+        self.samples_per_flush = samples_per_flush if sample_max_bytes > 0 else 0
+        self.sample_max_bytes = sample_max_bytes
+        self.sample_max_docs = sample_max_docs
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self.stats["coalesced"] = 0
+
+    def enqueue(self, raw_data: Dict[str, Any]):
+        """Record one reading from an unassigned device."""
+        now = datetime.utcnow()
+        device_id = raw_data["device_id"]
+        entry = self._pending.get(device_id)
+        if entry is None:
+            entry = self._pending[device_id] = {"count": 0, "first_seen": now, "samples": []}
+        else:
+            self.stats["coalesced"] += 1
+        entry.update({
+            "device_type": raw_data.get("device_type", "unknown"),
+            "raw_data": raw_data["data"],
+            "timestamp": raw_data["timestamp"],
+            "last_seen": now,
+        })
+        entry["count"] += 1
+        if len(entry["samples"]) < self.samples_per_flush:
+            entry["samples"].append({
+                "device_id": device_id,
+                "device_type": entry["device_type"],
+                "raw_data": raw_data["data"],
+                "timestamp": raw_data["timestamp"],
+                "discovered_at": now,
+            })
+        self._entry_added()
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def _take_batch(self):
+        batch, self._pending = self._pending, {}
+        return batch
+
+    def _restore_batch(self, batch):
+        for device_id, entry in batch.items():
+            newer = self._pending.get(device_id)
+            if newer is None:
+                self._pending[device_id] = entry
+            else:
+                newer["count"] += entry["count"]
+                newer["first_seen"] = entry["first_seen"]
+                newer["samples"] = (entry["samples"] + newer["samples"])[:self.samples_per_flush]
+
+    async def _write_batch(self, db, batch) -> int:
+        operations = []
+        samples = []
+        for device_id, entry in batch.items():
+            operations.append(UpdateOne(
+                {"_id": device_id},
+                {
+                    "$set": {
+                        "device_id": device_id,
+                        "device_type": entry["device_type"],
+                        "raw_data": entry["raw_data"],
+                        "timestamp": entry["timestamp"],
+                        "last_seen": entry["last_seen"],
+                    },
+                    "$inc": {"count": entry["count"]},
+                    "$setOnInsert": {"first_seen": entry["first_seen"]},
+                },
+                upsert=True
+            ))
+            samples.extend(entry["samples"])
+        await db[STATUS_COLLECTION].bulk_write(operations, ordered=False)
+        if samples:
+            await db[SAMPLES_COLLECTION].insert_many(samples, ordered=False)
+        return len(operations)
+
+    async def ensure_indexes(self, db):
+        """Index the admin listing and create the capped sample collection."""
+        await db[STATUS_COLLECTION].create_index([("last_seen", DESCENDING)], name="last_seen_desc")
+        if self.sample_max_bytes > 0:
+            try:
+                await db.create_collection(
+                    SAMPLES_COLLECTION, capped=True, size=self.sample_max_bytes, max=self.sample_max_docs
+                )
+            except CollectionInvalid:
+                pass  # already exists
+            await db[SAMPLES_COLLECTION].create_index(
+                [("device_id", DESCENDING), ("discovered_at", DESCENDING)], name="device_recent"
+            )
+
+    async def migrate_legacy(self, db) -> int:
+        """Fold the legacy per-reading collection into status documents; returns devices migrated.
+
+        The legacy collection is renamed first, so only one instance migrates
+        it and a restart doesn't count its readings twice. It is kept under the
+        new name (unassigned_devices_migrated_<time>) to be dropped once reviewed.
+        """
+        if LEGACY_COLLECTION not in await db.list_collection_names(filter={"name": LEGACY_COLLECTION}):
+            return 0
+        migrated_name = f"{LEGACY_COLLECTION}_migrated_{datetime.utcnow():%Y%m%d%H%M%S}"
+        try:
+            await db[LEGACY_COLLECTION].rename(migrated_name)
+        except OperationFailure:
+            return 0  # another instance got there first
+
+        pipeline = [
+            {"$sort": {"discovered_at": ASCENDING}},
+            {"$group": {
+                "_id": "$device_id",
+                "count": {"$sum": 1},
+                "first_seen": {"$min": "$discovered_at"},
+                "last_seen": {"$max": "$discovered_at"},
+                "latest": {"$last": "$$ROOT"},
+            }},
+        ]
+        devices = [device async for device in db[migrated_name].aggregate(pipeline, allowDiskUse=True)
+                   if device["_id"] is not None]
+        assigned = set()
+        if devices:
+            cursor = db.device_assignments.find({"device_id": {"$in": [device["_id"] for device in devices]}, "is_active": True})
+            assigned = {assignment["device_id"] async for assignment in cursor}
+
+        operations = []
+        for device in devices:
+            if device["_id"] in assigned:
+                continue
+            latest = device["latest"]
+            operations.append(UpdateOne(
+                {"_id": device["_id"]},
+                {
+                    # A device that reported since the deploy already has newer data
+                    "$setOnInsert": {
+                        "device_id": device["_id"],
+                        "device_type": latest.get("device_type", "unknown"),
+                        "raw_data": latest.get("raw_data"),
+                        "timestamp": latest.get("timestamp"),
+                    },
+                    "$inc": {"count": device["count"]},
+                    "$min": {"first_seen": device["first_seen"]},
+                    "$max": {"last_seen": device["last_seen"]},
+                },
+                upsert=True
+            ))
+        if operations:
+            await db[STATUS_COLLECTION].bulk_write(operations, ordered=False)
+        print(f"Migrated {len(operations)} unassigned devices from {LEGACY_COLLECTION} (now {migrated_name})")
+        return len(operations)
+
+    async def list_devices(self, limit: int) -> List[Dict[str, Any]]:
+        """Most recently seen unassigned devices first."""
+        devices = []
+        cursor = self.get_collection()[STATUS_COLLECTION].find().sort("last_seen", DESCENDING).limit(limit)
+        async for device in cursor:
+            # Older clients read the latest row's discovered_at
+            device["discovered_at"] = device["last_seen"]
+            devices.append(device)
+        return devices
+
+    async def list_samples(self, device_id: str, limit: int) -> List[Dict[str, Any]]:
+        """Newest sampled raw readings of one device."""
+        samples = []
+        cursor = self.get_collection()[SAMPLES_COLLECTION].find({"device_id": device_id}).sort("discovered_at", DESCENDING).limit(limit)
+        async for sample in cursor:
+            sample["_id"] = str(sample["_id"])
+            samples.append(sample)
+        return samples
+
+    async def forget(self, device_id: str):
+        """Drop a device's status once it has been assigned."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        # Under the flush lock, so a flush already writing the device (or
+        # restoring it after a failed write) can't recreate it after the delete
+        async with self._flush_lock:
+            self._pending.pop(device_id, None)
+            await self.get_collection()[STATUS_COLLECTION].delete_one({"_id": device_id})
@@ -1,20 +1,25 @@
-from motor.motor_asyncio import AsyncIOMotorCollection
-import mongo_config
 from models import User, UserCreate
 from auth_utils import get_password_hash
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from bson import ObjectId
+from pagination import Page, PageRequest
+from repository import Repository
+from lookup_cache import LookupCache
 
-async def get_users_collection() -> AsyncIOMotorCollection:
-    """Get users collection"""
-    db = mongo_config.get_database()
-    return db.users
+# List order; unique so it can be paged by keyset (indexed in db_indexes.py)
+USER_SORT = [("_id", 1)]
+
+user_repository = Repository("users")
+# get_user_by_email (called by get_current_user on every authenticated request);
+# the writes below are keyed by firebase_uid, so they invalidate by value
+user_cache = LookupCache("users_by_email")
+
+def invalidate_user(firebase_uid: str):
+    user_cache.invalidate_where(lambda user: user.get("firebase_uid") == firebase_uid)
 
 async def create_user(user: UserCreate) -> Dict[str, Any]:
     """Create a new user"""
-    collection = await get_users_collection()
-
     # Hash the password
     hashed_password = get_password_hash(user.password)
 
@@ -34,122 +39,56 @@ async def create_user(user: UserCreate) -> Dict[str, Any]:
     }
 
     # Insert user document
-    result = await collection.insert_one(user_data)
-    user_data['_id'] = result.inserted_id
-    return user_data
+    return await user_repository.insert(user_data)
 
 async def get_user_by_firebase_uid(firebase_uid: str) -> Optional[Dict[str, Any]]:
     """Get user by Firebase UID"""
-    collection = await get_users_collection()
-    user = await collection.find_one({"firebase_uid": firebase_uid})
-    if user:
-        # Convert ObjectId to string for JSON serialization
-        user['_id'] = str(user['_id'])
-    return user
+    return await user_repository.find_one({"firebase_uid": firebase_uid})
 
 async def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     """Get user by MongoDB document ID"""
-    collection = await get_users_collection()
-    user = await collection.find_one({"_id": ObjectId(user_id)})
-    return user
+    return await user_repository.find_one({"_id": ObjectId(user_id)})
 
 async def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
     """Get user by email"""
-    collection = await get_users_collection()
-    user = await collection.find_one({"email": email})
-    return user
+    return await user_cache.get(email, lambda: user_repository.find_one({"email": email}))
 
-async def get_users_by_hospital_and_role(hospital_id: str, role: str) -> List[Dict[str, Any]]:
+async def get_users_by_hospital_and_role(hospital_id: str, role: str, page: Optional[PageRequest] = None, fields: Optional[List[str]] = None) -> Page:
     """Get users by hospital and role"""
-    collection = await get_users_collection()
-    cursor = collection.find({
+    return await user_repository.find_page({
         "hospital_id": hospital_id,
         "role": role,
         "is_active": True
-    })
-    users = await cursor.to_list(length=None)
-    # Convert ObjectId to string for JSON serialization
-    for user in users:
-        user['_id'] = str(user['_id'])
-    return users
+    }, USER_SORT, page, fields)
 
 async def update_user(firebase_uid: str, user_update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     """Update user information"""
-    collection = await get_users_collection()
-
-    # Check if user exists
-    existing_user = await collection.find_one({"firebase_uid": firebase_uid})
-    if not existing_user:
-        return None
-
-    # Update data
     update_data = {k: v for k, v in user_update.items() if v is not None}
-    update_data['updated_at'] = datetime.utcnow()
-
-    await collection.update_one(
-        {"firebase_uid": firebase_uid},
-        {"$set": update_data}
-    )
-
-    # Return updated document
-    updated_user = await collection.find_one({"firebase_uid": firebase_uid})
-    if updated_user:
-        # Convert ObjectId to string for JSON serialization
-        updated_user['_id'] = str(updated_user['_id'])
+    updated_user = await user_repository.update({"firebase_uid": firebase_uid}, update_data)
+    invalidate_user(firebase_uid)
     return updated_user
 
 async def deactivate_user(firebase_uid: str) -> bool:
     """Deactivate a user (soft delete)"""
-    collection = await get_users_collection()
-
-    # First check if user exists
-    user = await collection.find_one({"firebase_uid": firebase_uid})
+    user = await user_repository.update({"firebase_uid": firebase_uid}, {"is_active": False})
+    invalidate_user(firebase_uid)
     if not user:
         print(f"User {firebase_uid} not found for deactivation")
         return False
 
-    print(f"Deactivating user {firebase_uid}: {user.get('email', 'unknown email')}")
+    print(f"Deactivated user {firebase_uid}: {user.get('email', 'unknown email')}")
+    return True
 
-    result = await collection.update_one(
-        {"firebase_uid": firebase_uid},
-        {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
-    )
-
-    print(f"Deactivation result: modified_count = {result.modified_count}")
-
-    # Verify the update
-    updated_user = await collection.find_one({"firebase_uid": firebase_uid})
-    if updated_user:
-        print(f"User is_active after update: {updated_user.get('is_active', 'not set')}")
-
-    return result.modified_count > 0
-
-async def get_hospital_staff(hospital_id: str) -> List[Dict[str, Any]]:
+async def get_hospital_staff(hospital_id: str, page: Optional[PageRequest] = None, fields: Optional[List[str]] = None) -> Page:
     """Get all staff (doctors and nurses) for a hospital"""
-    collection = await get_users_collection()
-    cursor = collection.find({
+    return await user_repository.find_page({
         "hospital_id": hospital_id,
         "role": {"$in": ["doctor", "nurse"]},
         "is_active": True
-    })
-    users = await cursor.to_list(length=None)
-    # Convert ObjectId to string for JSON serialization
-    for user in users:
-        user['_id'] = str(user['_id'])
-    return users
+    }, USER_SORT, page, fields)
 
 async def assign_user_to_department(firebase_uid: str, department_id: str) -> Optional[Dict[str, Any]]:
     """Assign a user to a department"""
-    collection = await get_users_collection()
-
-    result = await collection.update_one(
-        {"firebase_uid": firebase_uid},
-        {"$set": {"department_id": department_id, "updated_at": datetime.utcnow()}}
-    )
-
-    if result.modified_count > 0:
-        # Return updated document
-        updated_user = await collection.find_one({"firebase_uid": firebase_uid})
-        return updated_user
-
-    return None
+    updated_user = await user_repository.update({"firebase_uid": firebase_uid}, {"department_id": department_id})
+    invalidate_user(firebase_uid)
+    return updated_user
@@ -0,0 +1,199 @@
+"""Time-bucketed vitals history with TTL retention.
+
+Every processed reading is kept in the vitals_history collection, grouped into
+one document per patient per bucket (VITALS_HISTORY_BUCKET_MINUTES):
+
+    {
+        "patient_id": "...",
+        "bucket_start": datetime,   # bucket boundary, UTC
+        "bucket_end": datetime,     # TTL index expires the bucket this long after it closes
+        "count": 3,
+        "first_ts": datetime, "last_ts": datetime,
+        "t": [0.5, 1.5, 2.5],       # seconds since bucket_start
+        "dev": ["m1", "m1", "m2"],  # device that sent each reading
+        "hr": [...], "spo2": [...], "sbp": [...], "dbp": [...], "rr": [...], "risk": [...]
+    }
+
+Readings are appended with `$push: {$each}` from a write-behind buffer, so a
+flush is one upsert per open bucket however many readings arrived. A range
+query reads a handful of bucket documents off the (patient_id, bucket_start)
+index instead of one document per reading, newest first, and stops once it
+has enough readings.
+
+While Mongo is unreachable, failed batches go back into the buffer. At most
+`max_buffered` readings are held; past that the oldest are dropped (counted in
+the `dropped` stat) so an outage can't exhaust memory.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+
+from write_behind import WriteBehindBuffer
+
+# Bucket array name -> field of the processed reading
+SAMPLE_FIELDS = {
+    "hr": "hr_mean",
+    "spo2": "spo2_mean",
+    "sbp": "sbp_mean",
+    "dbp": "dbp_mean",
+    "rr": "rr_mean",
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+# Buckets fetched per round-trip by `query`; it usually needs only the newest few
+QUERY_BATCH_BUCKETS = 4
+
+
+def reading_time(data: Dict[str, Any]) -> datetime:
+    """The reading's timestamp as a naive UTC datetime (how Mongo stores dates)."""
+    timestamp = data.get("timestamp")
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    elif not isinstance(timestamp, datetime):
+        timestamp = datetime.utcnow()
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+class VitalsHistoryWriter(WriteBehindBuffer):
+    """Buffers readings per (patient, bucket) and appends them to bucket documents in bulk."""
+
+    def __init__(self, get_collection: Callable[[], Any], bucket_minutes: int, retention_days: float,
+                 flush_interval: float, max_pending: int, max_buffered: int):
+        super().__init__(get_collection, flush_interval, max_pending)
+        self.bucket_seconds = int(bucket_minutes * 60)
+        self.retention_seconds = int(retention_days * 86400)
+        self.max_buffered = max_buffered
+        self._pending: Dict[Tuple[str, datetime], List[Tuple[datetime, Dict[str, Any]]]] = {}
+        self._pending_count = 0
+        self.stats["dropped"] = 0
+
+    def bucket_start(self, timestamp: datetime) -> datetime:
+        seconds = int((timestamp - EPOCH).total_seconds())
+        return EPOCH + timedelta(seconds=seconds - seconds % self.bucket_seconds)
+
+    def enqueue(self, data: Dict[str, Any]):
+        """Queue one processed reading for its patient's bucket."""
+        timestamp = reading_time(data)
+        key = (data["patient_id"], self.bucket_start(timestamp))
+        self._pending.setdefault(key, []).append((timestamp, data))
+        self._pending_count += 1
+        self._enforce_cap()
+        self._entry_added()
+
+    def pending_count(self) -> int:
+        return self._pending_count
+
+    def _take_batch(self):
+        batch, self._pending, self._pending_count = self._pending, {}, 0
+        return batch
+
+    def _restore_batch(self, batch):
+        for key, samples in batch.items():
+            self._pending[key] = samples + self._pending.get(key, [])
+            self._pending_count += len(samples)
+        self._enforce_cap()
+
+    def _enforce_cap(self):
+        """Drop the oldest readings, oldest buckets first, once more than max_buffered are held.
+
+        Trims to 90% of the cap so a sustained outage doesn't re-sort the
+        buckets on every reading.
+        """
+        if self._pending_count <= self.max_buffered:
+            return
+        excess = self._pending_count - self.max_buffered * 9 // 10
+        dropped = 0
+        for key in sorted(self._pending, key=lambda k: k[1]):
+            samples = self._pending[key]
+            if len(samples) <= excess - dropped:
+                dropped += len(samples)
+                del self._pending[key]
+            else:
+                del samples[:excess - dropped]
+                dropped = excess
+            if dropped >= excess:
+                break
+        self._pending_count -= dropped
+        self.stats["dropped"] += dropped
+        print(f"⚠️ Vitals history buffer over {self.max_buffered} readings; dropped the oldest {dropped}")
+
+    async def _write_batch(self, collection, batch) -> int:
+        operations = []
+        for (patient_id, bucket_start), samples in batch.items():
+            times = [timestamp for timestamp, _ in samples]
+            push = {"t": {"$each": [round((timestamp - bucket_start).total_seconds(), 3) for timestamp in times]}}
+            push["dev"] = {"$each": [data.get("device_id") for _, data in samples]}
+            for name, field in SAMPLE_FIELDS.items():
+                push[name] = {"$each": [data.get(field) for _, data in samples]}
+            push["risk"] = {"$each": [(data.get("ai_analysis") or {}).get("risk_score_percent") for _, data in samples]}
+            operations.append(UpdateOne(
+                {"patient_id": patient_id, "bucket_start": bucket_start},
+                {
+                    "$push": push,
+                    "$inc": {"count": len(samples)},
+                    "$min": {"first_ts": min(times)},
+                    "$max": {"last_ts": max(times)},
+                    "$setOnInsert": {"bucket_end": bucket_start + timedelta(seconds=self.bucket_seconds)},
+                },
+                upsert=True
+            ))
+        await collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    async def ensure_indexes(self, db, collection_name: str = "vitals_history"):
+        """Range-scan index plus the TTL index that enforces retention."""
+        collection = db[collection_name]
+        await collection.create_index(
+            [("patient_id", ASCENDING), ("bucket_start", ASCENDING)], unique=True, name="patient_bucket"
+        )
+        try:
+            await collection.create_index("bucket_end", expireAfterSeconds=self.retention_seconds, name="bucket_end_ttl")
+        except OperationFailure:
+            # Index exists with another retention; change it in place
+            await db.command("collMod", collection_name, index={
+                "name": "bucket_end_ttl", "expireAfterSeconds": self.retention_seconds
+            })
+
+    async def query(self, patient_id: str, start: datetime, end: datetime, limit: int) -> List[Dict[str, Any]]:
+        """The latest `limit` readings for a patient in [start, end], oldest first, including unflushed ones."""
+        # Unflushed and in-flight readings are collected before the find, so a
+        # flush landing meanwhile shows up twice rather than not at all. Copies
+        # are merged on (device, timestamp to the millisecond stored in buckets)
+        samples: Dict[Tuple[Any, float], Tuple[datetime, Dict[str, Any]]] = {}
+
+        def add(device_id, timestamp: datetime, sample: Dict[str, Any]):
+            samples.setdefault((device_id, round((timestamp - EPOCH).total_seconds(), 3)), (timestamp, sample))
+
+        for batch in (self._pending, self._in_flight or {}):
+            for (pending_patient, _), pending in batch.items():
+                if pending_patient != patient_id:
+                    continue
+                for timestamp, data in pending:
+                    if start <= timestamp <= end:
+                        sample = {field: data.get(field) for field in SAMPLE_FIELDS.values()}
+                        sample["risk_score_percent"] = (data.get("ai_analysis") or {}).get("risk_score_percent")
+                        add(data.get("device_id"), timestamp, sample)
+
+        cursor = self.get_collection().find(
+            {"patient_id": patient_id, "bucket_start": {"$gte": self.bucket_start(start), "$lte": end}}
+        ).sort("bucket_start", DESCENDING).batch_size(QUERY_BATCH_BUCKETS)
+        async for bucket in cursor:
+            bucket_start = bucket["bucket_start"]
+            devices = bucket.get("dev") or []  # absent in buckets written before it was recorded
+            for i, offset in enumerate(bucket.get("t", [])):
+                timestamp = bucket_start + timedelta(seconds=offset)
+                if start <= timestamp <= end:
+                    sample = {field: bucket[name][i] for name, field in SAMPLE_FIELDS.items()}
+                    sample["risk_score_percent"] = bucket["risk"][i]
+                    add(devices[i] if i < len(devices) else None, timestamp, sample)
+            # Older buckets can't add anything newer than what is already collected
+            if sum(1 for timestamp, _ in samples.values() if timestamp >= bucket_start) >= limit:
+                break
+
+        ordered = sorted(samples.values(), key=lambda s: s[0])
+        return [{"timestamp": timestamp.isoformat(), **sample} for timestamp, sample in ordered[-limit:]]
@@ -0,0 +1,165 @@
+"""Write-behind buffers that keep Mongo writes off the ingest path.
+
+Ingest hands processed readings to a buffer's `enqueue`; a background task
+writes what has accumulated in one bulk_write every `flush_interval` seconds,
+or sooner once `max_pending` entries are waiting.
+
+`RealtimeVitalsWriter` keeps only the latest reading per patient for the
+realtime_vitals collection; vitals_history.VitalsHistoryWriter builds on the
+same base to append every reading to history buckets.
+"""
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional
+
+from pymongo import ReplaceOne
+
+
+class WriteBehindBuffer(ABC):
+    """Background flush loop, drain-on-stop and flush metrics.
+
+    Subclasses hold the pending entries and implement `pending_count`,
+    `_take_batch`, `_write_batch` and `_restore_batch`; one that misses any
+    of them fails when it is instantiated, not inside the flush loop.
+    """
+
+    def __init__(self, get_collection: Callable[[], Any], flush_interval: float, max_pending: int):
+        self.get_collection = get_collection
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        # The batch being written; readers still see it until the write succeeds or it is restored
+        self._in_flight = None
+        self._stopping = False
+        self.stats = {
+            "enqueued": 0,
+            "flushes": 0,
+            "documents_written": 0,
+            "flush_errors": 0,
+            "last_flush_ms": None,
+            "max_flush_ms": 0.0,
+        }
+
+    @abstractmethod
+    def pending_count(self) -> int:
+        """Number of entries waiting to be flushed."""
+
+    @abstractmethod
+    def _take_batch(self):
+        """Detach and return everything pending."""
+
+    @abstractmethod
+    async def _write_batch(self, collection, batch) -> int:
+        """Write a detached batch; returns the number of documents written."""
+
+    @abstractmethod
+    def _restore_batch(self, batch):
+        """Put a batch whose write failed back in front of newer entries."""
+
+    def _entry_added(self):
+        self.stats["enqueued"] += 1
+        self._ensure_started()
+        if self.pending_count() >= self.max_pending:
+            self._wake.set()
+
+    def _ensure_started(self):
+        # Started lazily so the writer binds to the running event loop
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write everything pending in one bulk_write."""
+        if not self.pending_count():
+            return
+        async with self._flush_lock:
+            batch = self._in_flight = self._take_batch()
+            started = time.perf_counter()
+            try:
+                written = await self._write_batch(self.get_collection(), batch)
+            except Exception as e:
+                print(f"❌ ERROR flushing {type(self).__name__}: {e}")
+                self.stats["flush_errors"] += 1
+                self._restore_batch(batch)
+                return
+            finally:
+                self._in_flight = None
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stats["flushes"] += 1
+            self.stats["documents_written"] += written
+            self.stats["last_flush_ms"] = round(elapsed_ms, 2)
+            self.stats["max_flush_ms"] = round(max(self.stats["max_flush_ms"], elapsed_ms), 2)
+
+    async def stop(self):
+        """Stop the background task and drain whatever is still pending."""
+        if self._task is not None:
+            # Let an in-flight flush finish rather than cancelling it mid-write
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        if self.pending_count():
+            if self._flush_lock is None:
+                self._flush_lock = asyncio.Lock()
+            await self.flush()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": self.pending_count()}
+
+
+class RealtimeVitalsWriter(WriteBehindBuffer):
+    """Latest reading per patient for realtime_vitals; older unflushed readings are dropped."""
+
+    def __init__(self, get_collection: Callable[[], Any], flush_interval: float, max_pending: int):
+        super().__init__(get_collection, flush_interval, max_pending)
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self.stats["coalesced"] = 0
+
+    def enqueue(self, data: Dict[str, Any]):
+        """Queue the latest reading for a patient, replacing any unflushed one."""
+        patient_id = data["patient_id"]
+        if patient_id in self._pending:
+            self.stats["coalesced"] += 1
+        self._pending[patient_id] = data
+        self._entry_added()
+
+    def pending_for(self, patient_id: str) -> Optional[Dict[str, Any]]:
+        """A reading that has been accepted but not flushed yet (or is being flushed), if any."""
+        data = self._pending.get(patient_id)
+        if data is None and self._in_flight is not None:
+            data = self._in_flight.get(patient_id)
+        return data
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def _take_batch(self):
+        batch, self._pending = self._pending, {}
+        return batch
+
+    async def _write_batch(self, collection, batch) -> int:
+        await collection.bulk_write(
+            [ReplaceOne({"patient_id": patient_id}, data, upsert=True) for patient_id, data in batch.items()],
+            ordered=False
+        )
+        return len(batch)
+
+    def _restore_batch(self, batch):
+        # Keep any newer reading that arrived while the write was failing
+        for patient_id, data in batch.items():
+            self._pending.setdefault(patient_id, data)
@@ -1,7 +1,30 @@
 import { useState, useEffect } from 'react';
-import { WebSocketMessage, ServerPatientData } from '@/types/patientData';
+import { WebSocketMessage, ServerPatientData, PatientFrame } from '@/types/patientData';
 import { useRole } from '@/hooks/useRole';
 
+// Fold a delta frame's changes into the current patients and drop removed ones
+const applyDelta = (prev: WebSocketMessage, frame: PatientFrame): WebSocketMessage => {
+  const changes = new Map(frame.patients.map((p) => [p.patient_id, p]));
+  const removed = new Set(frame.removed ?? []);
+  const merged = prev
+    .filter((p) => !removed.has(p.patient_id))
+    .map((p) => {
+      const change = changes.get(p.patient_id);
+      if (!change) return p;
+      changes.delete(p.patient_id);
+      const { removed_fields: removedFields = [], ...fields } = change;
+      const patient: Record<string, unknown> = { ...p, ...fields, vitals: { ...p.vitals, ...fields.vitals } };
+      const vitals = patient.vitals as Record<string, unknown>;
+      for (const field of removedFields) {
+        if (field.startsWith('vitals.')) delete vitals[field.slice('vitals.'.length)];
+        else delete patient[field];
+      }
+      return patient as unknown as ServerPatientData;
+    });
+  // Patients first seen in a delta are sent whole
+  return merged.concat(Array.from(changes.values()) as ServerPatientData[]);
+};
+
 const useWebSocket = (url: string) => {
   const [data, setData] = useState<WebSocketMessage | null>(null);
   const [filteredData, setFilteredData] = useState<WebSocketMessage | null>(null);
@@ -13,6 +36,8 @@ const useWebSocket = (url: string) => {
     if (typeof window === 'undefined') return;
 
     const ws = new WebSocket(url);
+    // Sequence number of the last applied frame; null until a keyframe arrives
+    let lastSeq: number | null = null;
 
     ws.onopen = () => {
       console.log('WebSocket connected');
@@ -20,8 +45,23 @@ const useWebSocket = (url: string) => {
 
     ws.onmessage = (event) => {
       try {
-        const messageData = JSON.parse(event.data) as WebSocketMessage;
+        const messageData = JSON.parse(event.data) as WebSocketMessage | PatientFrame;
         console.log('WebSocket received data:', messageData);
+        if (!Array.isArray(messageData)) {
+          if (messageData.type === 'keyframe') {
+            lastSeq = messageData.seq;
+            setData(messageData.patients as ServerPatientData[]);
+          } else if (lastSeq !== null && messageData.seq === lastSeq + 1) {
+            lastSeq = messageData.seq;
+            setData((prev) => applyDelta(prev ?? [], messageData));
+          } else if (lastSeq !== null && messageData.seq > lastSeq) {
+            // A frame went missing; deltas only make sense on top of it, so wait for the next keyframe
+            console.warn(`WebSocket frame gap (${lastSeq} -> ${messageData.seq}), waiting for keyframe`);
+            lastSeq = null;
+          }
+          return;
+        }
+        // Plain lists (default protocol) are a complete snapshot every tick
         setData(messageData);
       } catch (e) {
         console.error('Failed to parse WebSocket message:', e);
@@ -53,7 +53,8 @@ const Index = () => {
 
   const { role } = useRole();
 
-  const WEBSOCKET_URL = import.meta.env.DEV ? 'ws://localhost:8000/ws' : (import.meta.env.VITE_API_URL.replace('http://', 'ws://').replace('https://', 'wss://') + "/ws");
+  // Delta frames: full keyframes plus per-tick changes, including discharged patients
+  const WEBSOCKET_URL = (import.meta.env.DEV ? 'ws://localhost:8000/ws' : (import.meta.env.VITE_API_URL.replace('http://', 'ws://').replace('https://', 'wss://') + "/ws")) + "?mode=delta";
   const { data: wsData, error: wsError } = useWebSocket(WEBSOCKET_URL);
 
   useEffect(() => {
@@ -43,4 +43,18 @@ export interface PatientNote {
   timestamp: Date;
 }
 
-export type WebSocketMessage = ServerPatientData[];
\ No newline at end of file
+export type WebSocketMessage = ServerPatientData[];
+
+// Frames of the /ws?mode=delta protocol (backend/delta_frames.py). A keyframe
+// carries every patient; a delta only the changed fields (and changed vitals)
+// of each patient, plus the patient_ids that are no longer monitored. Fields a
+// patient no longer has are listed in removed_fields ("alarms", "vitals.SpO₂").
+export type PatientChange = Partial<ServerPatientData> & { patient_id: string; removed_fields?: string[] };
+
+export interface PatientFrame {
+  type: "keyframe" | "delta";
+  seq: number;
+  ts: string;
+  patients: PatientChange[];
+  removed?: string[];
+}
\ No newline at end of file